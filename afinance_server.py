@@ -1,456 +1,531 @@
 import json
 import asyncio
+import contextvars
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+
+if __name__ == "__main__":
+    # Serve through the lightweight front end: it answers the MCP handshake, list_tools and
+    # list_prompts at once and imports this module (pandas, yfinance) only for the data tools
+    from server_app import main
+    asyncio.run(main())
+    raise SystemExit
+
+import numpy as np
 import pandas as pd
 import time
-from datetime import datetime, timedelta
 
 import mcp.types as types
-from mcp.server import Server
-import mcp.server.stdio
-
-# Import yfinance for US market data
-import yfinance as yf
 
 from dotenv import load_dotenv
 load_dotenv()
 
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('yfinance_server.log')
-    ]
+from cache import CACHE_SWEEP_INTERVAL, DataCache, make_key
+from derived_metrics import PRICE_HISTORY_PERIOD, PRICE_METRICS
+from dispatch import Dispatcher
+from fundamentals_store import FUNDAMENTALS_SWEEP_INTERVAL, STATEMENT_TYPES, FundamentalsStore, report_date
+from history_store import HistoryStore, adjustments_changed, page_before, period_covers, period_start, slice_period
+from indicators import DEFAULT_INDICATORS, compute_indicator, indicator_label, parse_indicator, summarize
+from logging_config import new_request_id, request_context
+from metrics import METRICS_INTERVAL, METRICS_TEXTFILE, CallTimer, Metrics, current_call, timed, write_textfile
+from portfolio import close_matrix, portfolio_analytics
+from profiling import Profiler
+from providers import get_provider
+from ratelimit import RateLimiter, is_rate_limited
+from resilience import Resilience, is_transient
+from resampling import DAILY_DERIVED, reduce_bars
+from screener import FundamentalsTable, compile_query, quote_snapshot, run_screen
+from serialization import (
+    DEFAULT_RESPONSE_FORMAT,
+    HISTORY_PAGE_SIZE,
+    RESPONSE_FORMATS,
+    decode_cursor,
+    encode_cursor,
+    format_dates,
+    history_columns,
+    history_records,
+    render,
+    statement_to_dict,
 )
+from singleflight import SingleFlight, normalize_arguments
+
 logger = logging.getLogger(__name__)
+# One record per tool call with its request id, latency and payload size
+access_logger = logging.getLogger(f"{__name__}.access")
+
+# Market data backend: live yfinance, or recorded fixtures (YF_DATA_PROVIDER=fixture)
+provider = get_provider()
+
+# Blocking yfinance calls run here so they never stall the event loop
+dispatcher = Dispatcher()
+
+# Data cache keyed by (symbol, dataset, params) with per-dataset TTLs
+data_cache = DataCache()
+
+# OHLCV bars persisted across restarts
+history_store = HistoryStore()
 
+# Identical concurrent tool calls, and concurrent cache misses, share one execution
+tool_flight = SingleFlight()
+upstream_flight = SingleFlight()
 
-# Create server
-server = Server("yfinance-server")
+# Normalized statements per (symbol, period_end), re-pulled only when a new report is out
+fundamentals_store = FundamentalsStore(check_interval=data_cache.ttl_for("fundamentals"))
 
-# Ticker cache with expiration
-ticker_cache = {}
-CACHE_EXPIRY_HOURS = 24  # Cache tickers for 24 hours
+# One row of screener fields per symbol, built from the warehouse and evaluated column-wise
+screener_table = FundamentalsTable(fundamentals_store)
+
+# Fire-and-forget refreshes, referenced here so they are not garbage collected mid-flight
+background_tasks = set()
+
+# Periodic sweeps started by start() and cancelled by shutdown()
+service_tasks: List[asyncio.Task] = []
+
+# Retries, deadlines and circuit breaker shared by every upstream call
+resilience = Resilience()
+
+# Token bucket every upstream call draws from, queueing interactive calls ahead of bulk ones
+rate_limiter = RateLimiter()
+
+# Per-tool latency, phase, error and payload metrics
+metrics = Metrics()
+
+# Sampled cProfile/tracemalloc captures of tool executions (off unless YF_PROFILE_SAMPLE_RATE > 0)
+profiler = Profiler()
+
+# Sources answered from expired data during the current tool call: {source: age in seconds}
+stale_data: contextvars.ContextVar = contextvars.ContextVar("stale_data", default=None)
 
 def get_ticker_yfinance(symbol: str):
-    """Get yfinance ticker object with caching"""
-    global ticker_cache
-    
+    """Get ticker object from the data provider with caching"""
     symbol = symbol.upper()
-    current_time = datetime.now()
     
-    # Check if ticker exists in cache and is not expired
-    if symbol in ticker_cache:
-        cached_ticker, cache_time = ticker_cache[symbol]
-        if current_time - cache_time < timedelta(hours=CACHE_EXPIRY_HOURS):
-            logger.info(f"Using cached ticker for {symbol}")
-            return cached_ticker
-        else:
-            logger.info(f"Cache expired for {symbol}, fetching new ticker")
-            del ticker_cache[symbol]
+    found, ticker = data_cache.get(symbol, "ticker")
+    if found:
+        logger.debug("Using cached ticker for %s", symbol)
+        return ticker
     
     # Create new ticker and cache it
-    logger.info(f"Creating new ticker for {symbol}...")
-    start_time = time.time()
+    start_time = time.perf_counter()
+    ticker = provider.ticker(symbol)
+    logger.debug("Created ticker for %s in %.3fs", symbol, time.perf_counter() - start_time)
     
-    ticker = yf.Ticker(symbol)
+    data_cache.put(symbol, "ticker", ticker)
     
-    end_time = time.time()
-    logger.info(f"Ticker creation for {symbol} took {end_time - start_time:.2f} seconds")
+    return ticker
+
+async def call_upstream(tool: str, func, *args):
+    """Run a blocking upstream call on the pool under the shared rate limit, with retries, the tool's deadline and the circuit breaker"""
+    deadline = dispatcher.timeouts.get(tool, dispatcher.default_timeout)
     
-    # Cache the ticker with current timestamp
-    ticker_cache[symbol] = (ticker, current_time)
+    async def attempt():
+        try:
+            return await dispatcher.run_in_slot(tool, func, *args)
+        except Exception as e:
+            if is_rate_limited(e):
+                logger.warning("Upstream rate limit hit by %s; pausing requests for %.0fs", tool, rate_limiter.cooldown)
+                rate_limiter.throttle()
+            raise
     
-    return ticker
+    with timed("upstream"):
+        return await resilience.call(attempt, deadline, admit=lambda: rate_limiter.acquire(tool), slot=lambda: dispatcher.slot(tool))
+
+def mark_stale(source: str, age: float):
+    """Record that the current tool call is answering from expired data"""
+    resilience.stale_served += 1
+    served = stale_data.get()
+    if served is not None:
+        served[source] = round(age)
+
+async def fetch_data(tool: str, symbol: str, dataset: str, loader, params: Optional[Dict[str, Any]] = None):
+    """Get a dataset from the cache, loading it on the thread pool on a miss"""
+    found, value = data_cache.get(symbol, dataset, params)
+    if found:
+        return value
+    
+    async def load():
+        value = await call_upstream(tool, loader)
+        data_cache.put(symbol, dataset, value, params)
+        return value
+    
+    # Concurrent misses for the same key share one upstream fetch
+    try:
+        return await upstream_flight.do(make_key(symbol, dataset, params), load)
+    except Exception as e:
+        found, value, age = data_cache.get_stale(symbol, dataset, params) if is_transient(e) else (False, None, 0)
+        if not found:
+            raise
+        logger.warning("Serving stale %s for %s (%.0fs old): %s", dataset, symbol, age, e)
+        mark_stale(f"{dataset}:{symbol}", age)
+        return value
 
+async def fetch_bars(tool: str, ticker, kind: str, **kwargs) -> pd.DataFrame:
+    """Fetch bars upstream as one rate-limited request and count it as a full, head or tail fetch"""
+    bars = await call_upstream(tool, lambda: ticker.history(**kwargs))
+    history_store.record_fetch(kind, len(bars))
+    return bars
 
+async def load_history(tool: str, ticker, symbol: str, period: str, interval: str) -> pd.DataFrame:
+    """Get history from the local bar series, fetching only the bars missing upstream
 
-def clear_expired_cache():
-    """Clear expired cache entries"""
-    global ticker_cache
-    current_time = datetime.now()
-    expired_symbols = []
+    Every upstream fetch takes its own rate-limit token; store reads and
+    writes run on the pool.
+    """
+    stored, meta = await dispatcher.run(tool, history_store.load, symbol, interval)
     
-    for symbol, (ticker, cache_time) in ticker_cache.items():
-        if current_time - cache_time >= timedelta(hours=CACHE_EXPIRY_HOURS):
-            expired_symbols.append(symbol)
+    async def save(fresh: pd.DataFrame, stored_period: Optional[str] = None) -> pd.DataFrame:
+        return await dispatcher.run(tool, lambda: slice_period(history_store.append(symbol, interval, fresh, stored_period), period))
     
-    for symbol in expired_symbols:
-        del ticker_cache[symbol]
-        logger.info(f"Cleared expired cache for {symbol}")
+    if stored is None or stored.empty:
+        logger.info("No stored %s history for %s, fetching %s", interval, symbol, period)
+        fresh = await fetch_bars(tool, ticker, "full", period=period, interval=interval)
+        if fresh.empty:
+            return fresh
+        return await save(fresh, period)
+    
+    if not period_covers(meta.get("period"), period):
+        head_start = period_start(period, stored.index.tz)
+        if head_start is None:
+            # Trading-day and max periods have no calendar start to backfill from
+            fresh = await fetch_bars(tool, ticker, "full", period=period, interval=interval)
+            return await save(fresh, period)
+        
+        # Backfill only the bars older than the stored series
+        head = await fetch_bars(tool, ticker, "head", start=head_start, end=stored.index[0], interval=interval)
+        stored = await dispatcher.run(tool, history_store.append, symbol, interval, head, period, refreshed=False)
+        meta = await dispatcher.run(tool, history_store.meta, symbol, interval)
+    
+    if time.time() - meta.get("fetched_at", 0) < data_cache.ttl_for("history"):
+        return slice_period(stored, period)
+    
+    # Re-read the last two stored bars so adjustments can be checked on a stable bar
+    tail_start = stored.index[-2] if len(stored) > 1 else stored.index[-1]
+    fresh = await fetch_bars(tool, ticker, "tail", start=tail_start, interval=interval)
+    if adjustments_changed(stored, fresh):
+        logger.info("Adjusted prices changed for %s %s, refetching %s", symbol, interval, meta["period"])
+        fresh = await fetch_bars(tool, ticker, "full", period=meta["period"], interval=interval)
+        if fresh.empty:
+            return slice_period(stored, period)
+        await dispatcher.run(tool, history_store.write, symbol, interval, fresh, meta["period"])
+        return slice_period(await dispatcher.run(tool, history_store.read, symbol, interval), period)
+    
+    return await save(fresh)
 
-def get_cache_stats():
-    """Get cache statistics"""
-    current_time = datetime.now()
-    active_cache = 0
-    expired_cache = 0
+async def refresh_fundamentals(tool: str, symbol: str) -> bool:
+    """Re-pull a symbol's statements into the warehouse if its last report date changed; returns whether it did"""
+    ticker = get_ticker_yfinance(symbol)
+    info = await fetch_data(tool, symbol, "info", lambda: ticker.info)
+    report = report_date(info)
+    if fundamentals_store.is_current(symbol, report):
+        fundamentals_store.mark_checked(symbol, quote_snapshot(info))
+        return False
     
-    for symbol, (ticker, cache_time) in ticker_cache.items():
-        if current_time - cache_time < timedelta(hours=CACHE_EXPIRY_HOURS):
-            active_cache += 1
-        else:
-            expired_cache += 1
+    logger.info("Pulling statements for %s (last report %s)", symbol, report)
+    statements = await asyncio.gather(*[
+        call_upstream(tool, getattr, ticker, statement) for statement in STATEMENT_TYPES
+    ])
+    fundamentals_store.update(symbol, dict(zip(STATEMENT_TYPES, statements)), report, quote_snapshot(info))
+    await dispatcher.run(tool, fundamentals_store.flush)
+    return True
+
+def shared_refresh(tool: str, symbol: str):
+    """Refresh through upstream_flight so concurrent checks of one symbol share a pull"""
+    return upstream_flight.do(("fundamentals", symbol), lambda: refresh_fundamentals(tool, symbol))
+
+def log_refresh_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background refresh failed: %s", task.exception())
+
+def refresh_in_background(awaitable):
+    """Run a refresh without making the current request wait for it"""
+    # A fresh context keeps the refresh from marking the current response stale
+    task = contextvars.Context().run(asyncio.ensure_future, awaitable)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    task.add_done_callback(log_refresh_error)
+
+async def load_fundamentals(tool: str):
+    """Read the fundamentals warehouse on the pool the first time it is needed, not on the event loop"""
+    if not fundamentals_store.loaded:
+        await dispatcher.run(tool, fundamentals_store.load)
+
+async def ensure_fundamentals(tool: str, symbols: List[str]) -> Dict[str, str]:
+    """Load symbols missing from the warehouse and re-check stale ones in the background; returns load errors"""
+    await load_fundamentals(tool)
+    for symbol in symbols:
+        if fundamentals_store.check_due(symbol):
+            refresh_in_background(shared_refresh("fundamentals_refresh", symbol))
+    
+    missing = [symbol for symbol in symbols if not fundamentals_store.has(symbol)]
+    results = await asyncio.gather(*[shared_refresh(tool, symbol) for symbol in missing], return_exceptions=True)
+    return {symbol: str(result) for symbol, result in zip(missing, results) if isinstance(result, Exception)}
+
+async def shared_history(tool: str, symbol: str, period: str, interval: str) -> pd.DataFrame:
+    """Load history through upstream_flight so concurrent requests for one series share a fetch
+
+    If upstream is failing, the stored series is served instead.
+    """
+    ticker = get_ticker_yfinance(symbol)
+    try:
+        return await upstream_flight.do(
+            ("history", symbol, interval, period),
+            lambda: load_history(tool, ticker, symbol, period, interval)
+        )
+    except Exception as e:
+        if not is_transient(e):
+            raise
+        stored, fetched_at = await dispatcher.run(
+            tool, lambda: (history_store.read(symbol, interval), history_store.fetched_at(symbol, interval))
+        )
+        if stored is None or stored.empty:
+            raise
+        age = time.time() - (fetched_at or 0)
+        if age >= data_cache.ttl_for("history"):
+            logger.warning("Serving stored %s history for %s (%.0fs old): %s", interval, symbol, age, e)
+            mark_stale(f"history:{symbol}:{interval}", age)
+        return slice_period(stored, period)
+
+async def ensure_price_history(tool: str, symbols: List[str]) -> Dict[str, str]:
+    """Load daily bars for price-based screener fields, topping up stale series in the background; returns load errors"""
+    # fetched_at reads meta.json for series not seen yet, so check them all in one pool call
+    fetched = await dispatcher.run(tool, lambda: [history_store.fetched_at(symbol, "1d") for symbol in symbols])
+    now = time.time()
+    missing = []
+    for symbol, fetched_at in zip(symbols, fetched):
+        if fetched_at is None:
+            missing.append(symbol)
+        elif now - fetched_at >= data_cache.ttl_for("history"):
+            refresh_in_background(shared_history("fundamentals_refresh", symbol, PRICE_HISTORY_PERIOD, "1d"))
     
-    stats = {
-        "active_cache_entries": active_cache,
-        "expired_cache_entries": expired_cache,
-        "total_cache_entries": len(ticker_cache),
-        "cache_expiry_hours": CACHE_EXPIRY_HOURS
+    results = await asyncio.gather(*[
+        shared_history(tool, symbol, PRICE_HISTORY_PERIOD, "1d") for symbol in missing
+    ], return_exceptions=True)
+    return {symbol: str(result) for symbol, result in zip(missing, results) if isinstance(result, Exception)}
+
+async def fundamentals_refresher():
+    """Periodically re-check every stored symbol so reads rarely wait on upstream"""
+    while True:
+        await asyncio.sleep(FUNDAMENTALS_SWEEP_INTERVAL)
+        await load_fundamentals("fundamentals_refresh")
+        due = fundamentals_store.due_symbols()
+        if due:
+            results = await asyncio.gather(*[shared_refresh("fundamentals_refresh", symbol) for symbol in due], return_exceptions=True)
+            pulled = sum(1 for result in results if result is True)
+            failed = sum(1 for result in results if isinstance(result, Exception))
+            logger.info("Fundamentals sweep checked %d symbols: %d re-pulled, %d failed", len(due), pulled, failed)
+        await dispatcher.run("fundamentals_refresh", fundamentals_store.flush, True)
+
+def indicator_values(symbol: str, hist: pd.DataFrame, period: str, interval: str, name: str, params: Tuple[float, ...]) -> Dict[str, np.ndarray]:
+    """Compute one indicator over a symbol's bars, memoized until the stored bars change"""
+    key = {
+        "period": period,
+        "interval": interval,
+        "indicator": indicator_label(name, params),
+        "bars": (len(hist), int(hist.index.asi8[-1]), history_store.fetched_at(symbol, interval)),
+    }
+    found, values = data_cache.get(symbol, "indicators", key)
+    if not found:
+        values = compute_indicator(hist, name, params, interval)
+        data_cache.put(symbol, "indicators", values, key)
+    return values
+
+def indicator_report(symbol: str, hist: pd.DataFrame, period: str, interval: str, specs: List[Tuple[str, Tuple[float, ...]]], points: int) -> Dict[str, Any]:
+    """Latest values (and optionally trailing series) of every requested indicator for one symbol"""
+    dates = format_dates(hist.index[-points:]) if points > 1 else []
+    return {
+        "date": format_dates(hist.index[-1:])[0],
+        "close": float(hist["Close"].iloc[-1]),
+        "indicators": {
+            indicator_label(name, params): summarize(indicator_values(symbol, hist, period, interval, name, params), points, dates)
+            for name, params in specs
+        },
     }
-    logger.debug(f"Cache stats: {stats}")
+
+def last_two_closes(closes: pd.DataFrame) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """Get the (last, previous) non-missing close of every column in one pass"""
+    if closes.empty:
+        return {}
+    values = closes.to_numpy(dtype="float64")
+    valid = ~np.isnan(values)
+    rows = np.arange(len(values))[:, None]
+    columns = np.arange(values.shape[1])
+    last_pos = np.where(valid, rows, -1).max(axis=0)
+    prev_pos = np.where(valid & (rows < last_pos), rows, -1).max(axis=0)
+    last = np.where(last_pos >= 0, values[last_pos.clip(0), columns], np.nan)
+    prev = np.where(prev_pos >= 0, values[prev_pos.clip(0), columns], np.nan)
+    return {
+        str(symbol): (None if np.isnan(last_close) else float(last_close), None if np.isnan(prev_close) else float(prev_close))
+        for symbol, last_close, prev_close in zip(closes.columns, last, prev)
+    }
+
+def download_quotes(symbols: List[str]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Get last price and previous close for all symbols from one bulk download"""
+    frame = provider.download(symbols, period="5d", interval="1d")
+    if frame is None or frame.empty:
+        return {}
+    closes = frame["Close"]
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(symbols[0])
+    return {
+        symbol: {"current_price": last, "previous_close": previous}
+        for symbol, (last, previous) in last_two_closes(closes).items()
+        if last is not None
+    }
+
+def download_closes(symbols: List[str], period: str, interval: str) -> pd.DataFrame:
+    """Get a close matrix aligned on bar dates for all symbols from one bulk download"""
+    return close_matrix(provider.download(symbols, period=period, interval=interval), symbols)
+
+def get_cache_stats():
+    """Get cache statistics"""
+    stats = data_cache.stats()
+    stats["history_store"] = history_store.stats()
+    stats["fundamentals_store"] = fundamentals_store.stats()
+    stats["screener_table"] = screener_table.stats()
+    stats["upstream"] = resilience.stats()
+    stats["rate_limiter"] = rate_limiter.stats()
+    stats["provider"] = {"name": provider.name, **provider.stats()}
+    stats["single_flight"] = {
+        "tool_calls": tool_flight.stats(),
+        "upstream": upstream_flight.stats(),
+    }
+    logger.debug("Cache stats: %s", stats)
     return stats
 
+def server_metrics_text() -> str:
+    """Tool metrics plus cache, rate limiter and upstream gauges in the Prometheus text format"""
+    cache = data_cache.stats()
+    limiter = rate_limiter.stats()
+    upstream = resilience.stats()
+    gauges = {
+        "yf_cache_lookups_total": ("Data cache lookups by result", [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])]),
+        "yf_cache_entries": ("Data cache entries", [({}, cache["total_cache_entries"])]),
+        "yf_rate_limiter_queue_depth": ("Upstream calls waiting for a rate limit token", [
+            ({"priority": priority}, depth) for priority, depth in limiter["queue_depth"].items()
+        ]),
+        "yf_rate_limiter_wait_seconds_max": ("Longest rate limit wait", [
+            ({"priority": priority}, waits["max_wait_ms"] / 1000) for priority, waits in limiter["waits"].items()
+        ]),
+        "yf_upstream_retries_total": ("Upstream call retries", [({}, upstream["retries"])]),
+        "yf_upstream_circuit_open": ("1 while the upstream circuit breaker is open", [
+            ({}, int(upstream["circuit_breaker"]["state"] == "open"))
+        ]),
+    }
+    http = provider.stats().get("http")
+    if http:
+        gauges["yf_http_connections_total"] = ("HTTP requests by whether they opened a connection", [
+            ({"connection": "new"}, http["new_connections"]), ({"connection": "reused"}, http["reused_connections"])
+        ])
+    return metrics.prometheus(gauges)
+
+def text_response(result: Dict[str, Any], fmt: str) -> List[types.TextContent]:
+    """Wrap a tool result as MCP text content in the requested format, flagging any stale data in it"""
+    served = stale_data.get()
+    if served:
+        result = {**result, "stale": True, "stale_age_seconds": dict(served)}
+    with timed("serialize"):
+        text = render(result, fmt)
+    return [types.TextContent(type="text", text=text)]
+
 def df_to_json(df: pd.DataFrame) -> str:
     """Convert DataFrame to JSON string"""
     if df.empty:
         return json.dumps({"error": "No data available"})
     return df.to_json(orient='records', indent=2)
 
-@server.list_prompts()
-async def list_prompts() -> List[types.Prompt]:
-    """List available prompt templates for stock analysis"""
-    return [
-        types.Prompt(
-            name="stock_analysis",
-            description="Get comprehensive analysis for a US stock",
-            arguments=[
-                types.PromptArgument(
-                    name="symbol",
-                    description="Stock ticker symbol (e.g., AAPL, GOOGL, MSFT)",
-                    required=True
-                )
-            ]
-        ),
-        types.Prompt(
-            name="market_comparison",
-            description="Compare multiple US stocks",
-            arguments=[
-                types.PromptArgument(
-                    name="symbols",
-                    description="Comma-separated stock symbols (e.g., AAPL,GOOGL,MSFT)",
-                    required=True
-                )
-            ]
-        ),
-        types.Prompt(
-            name="sp500_analysis",
-            description="Analyze S&P 500 index and major components",
-            arguments=[
-                types.PromptArgument(
-                    name="timeframe",
-                    description="Analysis timeframe (e.g., 1mo, 3mo, 1y)",
-                    required=False
-                )
-            ]
+async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextContent]:
+    """Handle tool calls, coalescing identical concurrent requests, and record their metrics"""
+    start_time = time.perf_counter()
+    context_token = request_context.set({"request_id": new_request_id(), "tool": name})
+    metrics.begin(name)
+    result, call = [], None
+    try:
+        if name == "clear_cache":
+            result, call = await execute_tool(name, arguments)
+        else:
+            key = (name, normalize_arguments(arguments))
+            result, call = await tool_flight.do(key, lambda: execute_tool(name, arguments))
+        return result
+    finally:
+        elapsed = time.perf_counter() - start_time
+        payload = sum(len(content.text.encode("utf-8")) for content in result)
+        error = call.error if call is not None else "CancelledError"
+        metrics.end(name, elapsed, payload, error)
+        access_logger.info(
+            "%s %s in %.1f ms, %d bytes", name, error or "ok", elapsed * 1000, payload,
+            extra={"elapsed_ms": round(elapsed * 1000, 2), "bytes": payload, "error": error}
         )
-    ]
+        request_context.reset(context_token)
 
-@server.get_prompt()
-async def get_prompt(name: str, arguments: Dict[str, str] | None) -> types.GetPromptResult:
-    """Get specific prompt template"""
-    
-    if name == "stock_analysis":
-        symbol = arguments.get("symbol", "AAPL") if arguments else "AAPL"
-        
-        return types.GetPromptResult(
-            description=f"Comprehensive analysis for {symbol}",
-            messages=[
-                types.PromptMessage(
-                    role="user",
-                    content=types.TextContent(
-                        type="text",
-                        text=f"Please provide a comprehensive analysis of {symbol} including:\n\n" +
-                            "- Current stock information (price, market cap, P/E ratio)\n" +
-                            "- Financial statements (income statement, balance sheet, cash flow)\n" +
-                            "- Recent earnings data\n" +
-                            "- Dividend history (if applicable)\n" +
-                            "- Recent news and analyst recommendations\n" +
-                            "- Year-to-date performance"
-                    )
-                )
-            ]
-        )
-    
-    elif name == "market_comparison":
-        symbols = arguments.get("symbols", "AAPL,GOOGL,MSFT") if arguments else "AAPL,GOOGL,MSFT"
-        symbol_list = [s.strip() for s in symbols.split(',')]
-        
-        return types.GetPromptResult(
-            description=f"Compare stocks: {symbols}",
-            messages=[
-                types.PromptMessage(
-                    role="user",
-                    content=types.TextContent(
-                        type="text",
-                        text=f"Please compare these stocks: {', '.join(symbol_list)}\n\n" +
-                            "Include comparison of:\n" +
-                            "- Current prices and market caps\n" +
-                            "- P/E ratios and valuation metrics\n" +
-                            "- Dividend yields\n" +
-                            "- Year-to-date performance\n" +
-                            "- Financial health indicators\n" +
-                            "- Recent news sentiment"
-                    )
-                )
-            ]
-        )
-    
-    elif name == "sp500_analysis":
-        timeframe = arguments.get("timeframe", "1y") if arguments else "1y"
-        
-        return types.GetPromptResult(
-            description=f"S&P 500 analysis over {timeframe}",
-            messages=[
-                types.PromptMessage(
-                    role="user",
-                    content=types.TextContent(
-                        type="text",
-                        text=f"Please analyze the S&P 500 index (^GSPC) over the past {timeframe}:\n\n" +
-                            "- Historical price performance\n" +
-                            "- Current level and trends\n" +
-                            "- Major gainers and losers (if available)\n" +
-                            "- Recent market news\n" +
-                            "- Key support and resistance levels"
-                    )
-                )
-            ]
-        )
-    
-    else:
-        raise ValueError(f"Unknown prompt: {name}")
-
-@server.list_tools()
-async def list_tools() -> List[types.Tool]:
-    return [
-        types.Tool(
-            name="get_stock_info",
-            description="Get comprehensive stock information for US stocks including current price, market cap, P/E ratios, and key financial metrics",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "symbol": {
-                        "type": "string", 
-                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT, TSLA, ^GSPC for S&P 500)"
-                    }
-                },
-                "required": ["symbol"]
-            }
-        ),
-        types.Tool(
-            name="get_historical_data",
-            description="Get historical stock price data with flexible time periods and intervals",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "symbol": {
-                        "type": "string", 
-                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT)"
-                    },
-                    "period": {
-                        "type": "string",
-                        "description": "Time period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max",
-                        "default": "1mo"
-                    },
-                    "interval": {
-                        "type": "string",
-                        "description": "Data interval: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo",
-                        "default": "1d"
-                    }
-                },
-                "required": ["symbol"]
-            }
-        ),
-        types.Tool(
-            name="get_financials",
-            description="Get financial statements (income statement, balance sheet, cash flow) for US companies",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "symbol": {
-                        "type": "string", 
-                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT)"
-                    },
-                    "quarterly": {
-                        "type": "boolean",
-                        "description": "Get quarterly data if true, annual if false",
-                        "default": False
-                    }
-                },
-                "required": ["symbol"]
-            }
-        ),
-        types.Tool(
-            name="get_earnings",
-            description="Get earnings data (annual and quarterly) for US companies",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "symbol": {
-                        "type": "string", 
-                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT)"
-                    }
-                },
-                "required": ["symbol"]
-            }
-        ),
-        types.Tool(
-            name="get_dividends",
-            description="Get dividend payment history for US stocks",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "symbol": {
-                        "type": "string", 
-                        "description": "US stock ticker symbol (e.g., AAPL, MSFT, JNJ)"
-                    }
-                },
-                "required": ["symbol"]
-            }
-        ),
-        types.Tool(
-            name="get_splits",
-            description="Get stock split history for US stocks",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "symbol": {
-                        "type": "string", 
-                        "description": "US stock ticker symbol (e.g., AAPL, TSLA, NVDA)"
-                    }
-                },
-                "required": ["symbol"]
-            }
-        ),
-        types.Tool(
-            name="get_news",
-            description="Get recent news articles for a US stock",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "symbol": {
-                        "type": "string", 
-                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT)"
-                    },
-                    "count": {
-                        "type": "integer",
-                        "description": "Number of news articles to return (default: 10)",
-                        "default": 10
-                    }
-                },
-                "required": ["symbol"]
-            }
-        ),
-        types.Tool(
-            name="get_recommendations",
-            description="Get analyst recommendations and ratings for US stocks",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "symbol": {
-                        "type": "string", 
-                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT)"
-                    }
-                },
-                "required": ["symbol"]
-            }
-        ),
-        types.Tool(
-            name="search_stocks",
-            description="Search for US stocks by company name or ticker symbol",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Search query - company name or ticker (e.g., 'Apple', 'MSFT', 'Tesla')"
-                    },
-                    "limit": {
-                        "type": "integer",
-                        "description": "Maximum number of results (default: 10)",
-                        "default": 10
-                    }
-                },
-                "required": ["query"]
-            }
-        ),
-        types.Tool(
-            name="get_multiple_quotes",
-            description="Get current quotes for multiple US stocks at once",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "symbols": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "List of US stock ticker symbols (e.g., ['AAPL', 'GOOGL', 'MSFT'])"
-                    }
-                },
-                "required": ["symbols"]
-            }
-        ),
-        types.Tool(
-            name="get_cache_stats",
-            description="Get ticker cache statistics and performance info",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        ),
-        types.Tool(
-            name="clear_cache",
-            description="Clear all cached ticker objects (use when you want fresh data)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "symbol": {
-                        "type": "string",
-                        "description": "Optional: specific symbol to clear from cache. If not provided, clears all cache."
-                    }
-                },
-                "required": []
-            }
-        )
-    ]
+async def execute_tool(name: str, arguments: Dict[str, Any]) -> Tuple[List[types.TextContent], CallTimer]:
+    """Run a tool under a phase timer; returns its response and the timer"""
+    call = CallTimer(name)
+    token = current_call.set(call)
+    capture = profiler.start(name, arguments)
+    try:
+        return await handle_tool(name, arguments), call
+    finally:
+        if capture is not None:
+            profiler.stop(capture)
+        current_call.reset(token)
+        metrics.record_execution(call)
+        if capture is not None:
+            path = await dispatcher.run("profiling", profiler.write, capture)
+            logger.info("Profiled %s (%.0f ms) to %s.prof", name, capture.seconds * 1000, path)
 
-@server.call_tool()
-async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextContent]:
+async def handle_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextContent]:
     """Handle tool calls"""
+    fmt = arguments.get("format", DEFAULT_RESPONSE_FORMAT)
+    stale_data.set({})
     try:
+        if fmt not in RESPONSE_FORMATS:
+            raise ValueError(f"Unknown format: {fmt} (expected one of {', '.join(RESPONSE_FORMATS)})")
+        
         # Handle cache management tools first
         if name == "get_cache_stats":
+            await load_fundamentals(name)
             stats = get_cache_stats()
-            return [types.TextContent(type="text", text=json.dumps(stats, indent=2))]
+            return text_response(stats, fmt)
+        
+        elif name == "get_server_metrics":
+            if arguments.get("prometheus"):
+                return [types.TextContent(type="text", text=server_metrics_text())]
+            return text_response(metrics.snapshot(), fmt)
+        
+        elif name == "set_profiling":
+            sample_rate = arguments.get("sample_rate")
+            profiler.configure(None if sample_rate is None else float(sample_rate), arguments.get("tools"))
+            logger.info("Profiling sample rate %s for %s", profiler.sample_rate, profiler.tools or "all tools")
+            return text_response(profiler.stats(), fmt)
         
         elif name == "clear_cache":
-            global ticker_cache
             symbol = arguments.get("symbol")
             
             if symbol:
                 symbol = symbol.upper()
-                if symbol in ticker_cache:
-                    del ticker_cache[symbol]
-                    result = {"message": f"Cleared cache for {symbol}"}
+                # Clearing deletes and rewrites files, so it runs on the pool
+                cleared = data_cache.invalidate(symbol) + await dispatcher.run(
+                    name, lambda: history_store.clear(symbol) + fundamentals_store.clear(symbol)
+                )
+                if cleared:
+                    result = {"message": f"Cleared cache for {symbol} ({cleared} entries)"}
                 else:
                     result = {"message": f"No cache found for {symbol}"}
             else:
-                cache_count = len(ticker_cache)
-                ticker_cache.clear()
+                cache_count = data_cache.invalidate() + await dispatcher.run(
+                    name, lambda: history_store.clear() + fundamentals_store.clear()
+                )
                 result = {"message": f"Cleared all cache ({cache_count} entries)"}
             
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            return text_response(result, fmt)
         
         # Handle yfinance tools
         elif name == "get_stock_info":
             symbol = arguments["symbol"].upper()
-            clear_expired_cache()
             ticker = get_ticker_yfinance(symbol)
-            info = ticker.info
+            info = await fetch_data(name, symbol, "info", lambda: ticker.info)
             
             result = {
                 "symbol": symbol,
@@ -481,72 +556,93 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextCont
                 "website": info.get("website"),
                 "business_summary": (info.get("businessSummary", "")[:500] + "..." if info.get("businessSummary") else "")
             }
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            return text_response(result, fmt)
         
         elif name == "get_historical_data":
             symbol = arguments["symbol"].upper()
             period = arguments.get("period", "1mo")
             interval = arguments.get("interval", "1d")
+            resample = arguments.get("resample")
+            points = arguments.get("points")
+            if points is not None and (isinstance(points, bool) or not isinstance(points, int) or points < 3):
+                raise ValueError(f"points must be an integer of at least 3, got {points!r}")
+            page_size = min(max(int(arguments.get("page_size", HISTORY_PAGE_SIZE)), 1), HISTORY_PAGE_SIZE)
+            request = {"symbol": symbol, "period": period, "interval": interval, "resample": resample, "points": points}
+            # The first page holds the newest bars; each cursor steps back from the oldest bar sent,
+            # so bars appended meanwhile don't shift later pages
+            before = None
+            if arguments.get("cursor"):
+                before = decode_cursor(arguments["cursor"], **request).get("before")
+                if not isinstance(before, int):
+                    raise ValueError("Invalid cursor")
             
-            clear_expired_cache()
-            ticker = get_ticker_yfinance(symbol)
-            hist = ticker.history(period=period, interval=interval)
+            # Weekly and monthly bars come from stored daily bars when those already span the period
+            source_interval = interval
+            if resample is None and interval in DAILY_DERIVED:
+                daily = await dispatcher.run(name, history_store.meta, symbol, "1d")
+                if period_covers(daily.get("period"), period):
+                    source_interval, resample = "1d", interval
+            
+            hist = await shared_history(name, symbol, period, source_interval)
             
             if hist.empty:
-                return [types.TextContent(type="text", text=json.dumps({"error": f"No data found for {symbol}"}, indent=2))]
-            
-            data = []
-            for date, row in hist.iterrows():
-                data.append({
-                    "date": date.strftime("%Y-%m-%d"),
-                    "open": float(row["Open"]),
-                    "high": float(row["High"]),
-                    "low": float(row["Low"]),
-                    "close": float(row["Close"]),
-                    "volume": int(row["Volume"]) if "Volume" in row else 0,
-                })
+                return text_response({"error": f"No data found for {symbol}"}, fmt)
             
+            source_bars = len(hist)
+            if resample or points:
+                hist = await dispatcher.run(name, reduce_bars, hist, source_interval, resample, points)
+            
+            # Only the requested page is ever converted and serialized
+            page, more = page_before(hist, before, page_size)
+            dates = format_dates(page.index[[0, -1]]) if len(page) else [None, None]
+            columnar = fmt in ("columnar", "csv")
             result = {
                 "symbol": symbol,
                 "period": period,
                 "interval": interval,
-                "data": data,
-                "count": len(data)
+                "data": history_columns(page) if columnar else history_records(page),
+                "count": len(page),
+                "total": len(hist),
+                "start": dates[0],
+                "end": dates[-1],
+                "next_cursor": encode_cursor({**request, "before": int(page.index.asi8[0])}) if more else None
             }
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            if len(hist) != source_bars or source_interval != interval:
+                result["source_interval"] = source_interval
+                result["source_bars"] = source_bars
+            return text_response(result, fmt)
         
         elif name == "get_financials":
             symbol = arguments["symbol"].upper()
             quarterly = arguments.get("quarterly", False)
             
-            clear_expired_cache()
-            ticker = get_ticker_yfinance(symbol)
+            failed = await ensure_fundamentals(name, [symbol])
+            if failed:
+                raise RuntimeError(failed[symbol])
             
-            if quarterly:
-                income_stmt = ticker.quarterly_income_stmt
-                balance_sheet = ticker.quarterly_balance_sheet
-                cash_flow = ticker.quarterly_cashflow
-            else:
-                income_stmt = ticker.income_stmt
-                balance_sheet = ticker.balance_sheet
-                cash_flow = ticker.cashflow
+            prefix = "quarterly_" if quarterly else ""
+            income_stmt = fundamentals_store.statement(symbol, f"{prefix}income_stmt")
+            balance_sheet = fundamentals_store.statement(symbol, f"{prefix}balance_sheet")
+            cash_flow = fundamentals_store.statement(symbol, f"{prefix}cashflow")
             
             result = {
                 "symbol": symbol,
                 "quarterly": quarterly,
-                "income_statement": income_stmt.to_dict() if not income_stmt.empty else {},
-                "balance_sheet": balance_sheet.to_dict() if not balance_sheet.empty else {},
-                "cash_flow": cash_flow.to_dict() if not cash_flow.empty else {}
+                "income_statement": statement_to_dict(income_stmt),
+                "balance_sheet": statement_to_dict(balance_sheet),
+                "cash_flow": statement_to_dict(cash_flow)
             }
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2, default=str))]
+            return text_response(result, fmt)
         
         elif name == "get_earnings":
             symbol = arguments["symbol"].upper()
-            clear_expired_cache()
-            ticker = get_ticker_yfinance(symbol)
             
-            annual_income = ticker.income_stmt
-            quarterly_income = ticker.quarterly_income_stmt
+            # Reads the same warehouse statements as get_financials
+            failed = await ensure_fundamentals(name, [symbol])
+            if failed:
+                raise RuntimeError(failed[symbol])
+            annual_income = fundamentals_store.statement(symbol, "income_stmt")
+            quarterly_income = fundamentals_store.statement(symbol, "quarterly_income_stmt")
             
             result = {
                 "symbol": symbol,
@@ -571,13 +667,12 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextCont
                         quarterly_earnings[str(date.date() if hasattr(date, 'date') else date)] = float(value) if pd.notna(value) else None
                     result["quarterly_earnings"] = quarterly_earnings
             
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            return text_response(result, fmt)
         
         elif name == "get_dividends":
             symbol = arguments["symbol"].upper()
-            clear_expired_cache()
             ticker = get_ticker_yfinance(symbol)
-            dividends = ticker.dividends
+            dividends = await fetch_data(name, symbol, "dividends", lambda: ticker.dividends)
             
             if dividends.empty:
                 result = {"symbol": symbol, "dividends": [], "message": "No dividend data available"}
@@ -590,13 +685,12 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextCont
                     })
                 result = {"symbol": symbol, "dividends": dividend_data, "count": len(dividend_data)}
             
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            return text_response(result, fmt)
         
         elif name == "get_splits":
             symbol = arguments["symbol"].upper()
-            clear_expired_cache()
             ticker = get_ticker_yfinance(symbol)
-            splits = ticker.splits
+            splits = await fetch_data(name, symbol, "splits", lambda: ticker.splits)
             
             if splits.empty:
                 result = {"symbol": symbol, "splits": [], "message": "No split data available"}
@@ -609,15 +703,14 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextCont
                     })
                 result = {"symbol": symbol, "splits": split_data, "count": len(split_data)}
             
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            return text_response(result, fmt)
         
         elif name == "get_news":
             symbol = arguments["symbol"].upper()
             count = arguments.get("count", 10)
             
-            clear_expired_cache()
             ticker = get_ticker_yfinance(symbol)
-            news = ticker.news
+            news = await fetch_data(name, symbol, "news", lambda: ticker.news)
             
             if not news:
                 result = {"symbol": symbol, "news": [], "message": "No news available"}
@@ -633,13 +726,12 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextCont
                     })
                 result = {"symbol": symbol, "news": news_data, "count": len(news_data)}
             
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            return text_response(result, fmt)
         
         elif name == "get_recommendations":
             symbol = arguments["symbol"].upper()
-            clear_expired_cache()
             ticker = get_ticker_yfinance(symbol)
-            recommendations = ticker.recommendations
+            recommendations = await fetch_data(name, symbol, "recommendations", lambda: ticker.recommendations)
             
             if recommendations is None or recommendations.empty:
                 result = {"symbol": symbol, "recommendations": [], "message": "No recommendations available"}
@@ -656,14 +748,17 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextCont
                     })
                 result = {"symbol": symbol, "recommendations": rec_data, "count": len(rec_data)}
             
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            return text_response(result, fmt)
         
         elif name == "search_stocks":
             query = arguments["query"]
             limit = arguments.get("limit", 10)
             
-            search_obj = yf.Search(query, max_results=limit)
-            search_results = search_obj.quotes
+            search_results = await fetch_data(
+                name, query, "search",
+                lambda: provider.search(query, max_results=limit),
+                {"limit": limit}
+            )
             
             if not search_results:
                 result = {"query": query, "results": [], "message": "No results found"}
@@ -680,53 +775,204 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextCont
                     })
                 result = {"query": query, "results": results, "count": len(results)}
             
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            return text_response(result, fmt)
         
         elif name == "get_multiple_quotes":
             symbols = [s.upper() for s in arguments["symbols"]]
-            tickers = yf.Tickers(" ".join(symbols))
+            include_fundamentals = arguments.get("include_fundamentals", False)
             
-            results = {}
+            # Prices for every symbol come from one bulk download of recent daily bars
+            prices = {}
+            missing = []
             for symbol in symbols:
+                found, quote = data_cache.get(symbol, "quote")
+                if found:
+                    prices[symbol] = quote
+                else:
+                    missing.append(symbol)
+            if missing:
                 try:
-                    ticker = tickers.tickers[symbol]
-                    info = ticker.info
-                    results[symbol] = {
-                        "symbol": symbol,
-                        "name": info.get("longName", ""),
-                        "current_price": info.get("currentPrice", 0.0),
-                        "previous_close": info.get("previousClose", 0.0),
-                        "change": info.get("currentPrice", 0.0) - info.get("previousClose", 0.0),
-                        "change_percent": ((info.get("currentPrice", 0.0) - info.get("previousClose", 0.0)) / info.get("previousClose", 1.0)) * 100,
-                        "market_cap": info.get("marketCap"),
-                        "trailing_pe": info.get("trailingPE"),
-                        "forward_pe": info.get("forwardPE")
-                    }
+                    downloaded = await call_upstream(name, download_quotes, missing)
                 except Exception as e:
-                    results[symbol] = {"error": f"Failed to get data for {symbol}: {str(e)}"}
+                    logger.warning("Bulk quote download failed, falling back to per-symbol info: %s", e)
+                    downloaded = {}
+                for symbol, quote in downloaded.items():
+                    data_cache.put(symbol, "quote", quote)
+                    prices[symbol] = quote
+            
+            # Per-symbol info is only needed for fundamentals or symbols the download missed
+            async def fetch_info(symbol: str):
+                ticker = get_ticker_yfinance(symbol)
+                return await fetch_data(name, symbol, "info", lambda: ticker.info)
+            
+            info_symbols = [symbol for symbol in dict.fromkeys(symbols) if include_fundamentals or symbol not in prices]
+            infos = await asyncio.gather(*[fetch_info(symbol) for symbol in info_symbols], return_exceptions=True)
+            info_by_symbol = dict(zip(info_symbols, infos))
+            
+            results = {}
+            for symbol in symbols:
+                info = info_by_symbol.get(symbol, {})
+                if isinstance(info, Exception):
+                    if symbol not in prices:
+                        results[symbol] = {"error": f"Failed to get data for {symbol}: {str(info)}"}
+                        continue
+                    info = {}
+                
+                quote = prices.get(symbol) or {
+                    "current_price": info.get("currentPrice", 0.0),
+                    "previous_close": info.get("previousClose", 0.0),
+                }
+                current_price = quote["current_price"]
+                previous_close = quote["previous_close"]
+                has_change = current_price is not None and previous_close
+                results[symbol] = {
+                    "symbol": symbol,
+                    "name": info.get("longName", ""),
+                    "current_price": current_price,
+                    "previous_close": previous_close,
+                    "change": current_price - previous_close if has_change else None,
+                    "change_percent": (current_price - previous_close) / previous_close * 100 if has_change else None,
+                    "market_cap": info.get("marketCap"),
+                    "trailing_pe": info.get("trailingPE"),
+                    "forward_pe": info.get("forwardPE")
+                }
+                if not include_fundamentals:
+                    for field in ("name", "market_cap", "trailing_pe", "forward_pe"):
+                        del results[symbol][field]
             
             result = {"symbols": symbols, "quotes": results, "count": len(symbols)}
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            return text_response(result, fmt)
+        
+        elif name == "get_indicators":
+            symbols = list(dict.fromkeys(s.upper() for s in arguments["symbols"]))
+            specs = [parse_indicator(spec) for spec in arguments.get("indicators") or DEFAULT_INDICATORS]
+            period = arguments.get("period", "1y")
+            interval = arguments.get("interval", "1d")
+            points = min(max(int(arguments.get("points", 1)), 1), HISTORY_PAGE_SIZE)
+            
+            histories = await asyncio.gather(*[
+                shared_history(name, symbol, period, interval) for symbol in symbols
+            ], return_exceptions=True)
+            
+            results = {}
+            failed = {}
+            for symbol, hist in zip(symbols, histories):
+                if isinstance(hist, Exception):
+                    failed[symbol] = str(hist)
+                elif hist.empty:
+                    failed[symbol] = "No data found"
+                else:
+                    results[symbol] = await dispatcher.run(name, indicator_report, symbol, hist, period, interval, specs, points)
+            
+            result = {"period": period, "interval": interval, "results": results, "count": len(results)}
+            if failed:
+                result["failed_symbols"] = failed
+            return text_response(result, fmt)
+        
+        elif name == "get_portfolio_analytics":
+            symbols = list(dict.fromkeys(s.upper() for s in arguments["symbols"]))
+            period = arguments.get("period", "1y")
+            interval = arguments.get("interval", "1d")
+            benchmark = (arguments.get("benchmark", "^GSPC") or "").upper() or None
+            weights = {symbol.upper(): float(weight) for symbol, weight in (arguments.get("weights") or {}).items()}
+            columns = list(dict.fromkeys(symbols + ([benchmark] if benchmark else [])))
+            
+            # One bulk download for the whole set, cached under the sorted symbol list
+            closes = await fetch_data(
+                name, ",".join(sorted(columns)), "closes",
+                lambda: download_closes(columns, period, interval),
+                {"period": period, "interval": interval}
+            )
+            
+            result = await dispatcher.run(
+                name, portfolio_analytics, closes, symbols, benchmark, interval,
+                float(arguments.get("risk_free_rate", 0)), weights
+            )
+            result["period"] = period
+            result["interval"] = interval
+            missing = [symbol for symbol in columns if closes.reindex(columns=[symbol])[symbol].isna().all()]
+            if missing:
+                result["missing_symbols"] = missing
+            return text_response(result, fmt)
+        
+        elif name == "run_screener":
+            query = arguments["query"]
+            sort_by = arguments.get("sort_by")
+            
+            # Reject malformed queries before loading any data
+            inputs = compile_query(query).inputs
+            if sort_by:
+                inputs = inputs | compile_query(sort_by).inputs
+            
+            await load_fundamentals(name)
+            symbols = [s.upper() for s in arguments.get("symbols") or []] or provider.symbols() or fundamentals_store.symbols()
+            if not symbols:
+                raise ValueError("symbols is required: the data provider cannot list a universe to screen")
+            symbols = list(dict.fromkeys(symbols))
+            
+            # Only symbols missing from the warehouse wait on the data provider
+            failed = await ensure_fundamentals(name, symbols)
+            # Daily bars are only needed when the query reads price-derived fields
+            uses_prices = bool(inputs & set(PRICE_METRICS))
+            if uses_prices:
+                failed.update(await ensure_price_history(name, symbols))
+            
+            # Building the table reads stored bars from disk, so it runs on the pool with the screen itself
+            result = await dispatcher.run(name, lambda: run_screen(
+                screener_table.frame(symbols, history_store if uses_prices else None),
+                query,
+                sort_by=sort_by,
+                ascending=arguments.get("ascending", False),
+                limit=arguments.get("limit", 50),
+            ))
+            if failed:
+                result["failed_symbols"] = failed
+            return text_response(result, fmt)
         
         else:
             raise ValueError(f"Unknown tool: {name}")
                 
     except Exception as e:
-        import traceback
+        logger.error("%s failed: %s: %s", name, type(e).__name__, e, exc_info=not is_transient(e))
+        call = current_call.get()
+        if call is not None:
+            call.error = type(e).__name__
         error_msg = {
             "error": str(e),
-            "traceback": traceback.format_exc()
+            "error_type": type(e).__name__,
+            # Upstream timeouts, outages and an open circuit breaker are worth retrying later
+            "retryable": is_transient(e)
         }
-        return [types.TextContent(type="text", text=json.dumps(error_msg, indent=2))]
-
-# Run the server
-async def main():
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream, 
-            server.create_initialization_options()
-        )
+        return text_response(error_msg, fmt if fmt in RESPONSE_FORMATS else "pretty")
 
-if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+async def metrics_writer(path: str):
+    """Periodically write the Prometheus metrics to path for a textfile collector"""
+    while True:
+        await asyncio.sleep(METRICS_INTERVAL)
+        try:
+            write_textfile(path, server_metrics_text())
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", path, e)
+
+async def cache_expirer():
+    """Periodically drain the data cache's expiry heap, so requests never scan the cache"""
+    while True:
+        await asyncio.sleep(CACHE_SWEEP_INTERVAL)
+        removed = await dispatcher.run("cache_expiry", data_cache.clear_expired)
+        if removed:
+            logger.debug("Cleared %d expired cache entries", removed)
+
+def start():
+    """Start the cache expirer, periodic fundamentals sweep and metrics writer; the front end calls this once the module is loaded"""
+    service_tasks.append(asyncio.create_task(cache_expirer()))
+    service_tasks.append(asyncio.create_task(fundamentals_refresher()))
+    if METRICS_TEXTFILE:
+        service_tasks.append(asyncio.create_task(metrics_writer(METRICS_TEXTFILE)))
+
+def shutdown():
+    """Stop the periodic sweeps, persist the warehouse and release the thread pool"""
+    for task in service_tasks:
+        task.cancel()
+    service_tasks.clear()
+    fundamentals_store.flush(force=True)
+    dispatcher.shutdown()
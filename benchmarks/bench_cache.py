@@ -0,0 +1,61 @@
+"""Benchmark the per-request cost of cache expiry: a full scan on every call vs the expiry heap drained in the background
+
+Usage: python benchmarks/bench_cache.py [--entries 1000 10000 100000] [--requests 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cache import DataCache
+
+
+def scan_expired(cache: DataCache) -> int:
+    """The original clear_expired, which walked every entry and ran on every request; kept here as the baseline"""
+    now = cache._clock()
+    with cache._lock:
+        expired = [key for key, (_, expires_at) in cache._entries.items() if now >= expires_at + cache.stale_max_age]
+        return len(expired)
+
+
+def request(cache: DataCache, i: int, entries: int):
+    symbol = f"SYM{i % entries}"
+    found, _ = cache.get(symbol, "quote")
+    if not found:
+        cache.put(symbol, "quote", i)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'scan per request':>18} {'heap per request':>18} {'background drain':>18}")
+    for entries in args.entries:
+        cache = DataCache(max_entries=entries, ttls={"quote": 0.5})
+        for i in range(entries):
+            cache.put(f"SYM{i}", "quote", i)
+
+        start_time = time.perf_counter()
+        for i in range(args.requests):
+            scan_expired(cache)
+            request(cache, i, entries)
+        scan = (time.perf_counter() - start_time) / args.requests
+
+        start_time = time.perf_counter()
+        for i in range(args.requests):
+            request(cache, i, entries)
+        heap = (time.perf_counter() - start_time) / args.requests
+
+        time.sleep(0.5)
+        start_time = time.perf_counter()
+        cache.clear_expired()
+        drain = time.perf_counter() - start_time
+        print(f"{entries:>8} {scan * 1e6:>15.1f} us {heap * 1e6:>15.1f} us {drain * 1000:>15.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark concurrent call_tool dispatch against a fake slow yfinance backend
+
+Usage: python benchmarks/bench_dispatch.py [--calls 32] [--latency 0.2]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import afinance_server
+from dispatch import Dispatcher
+from providers import DataProvider
+from ratelimit import RateLimiter
+
+
+class SlowTicker:
+    """Ticker stand-in whose network-backed attributes block like a Yahoo round-trip"""
+
+    latency = 0.2
+
+    def __init__(self, symbol: str):
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        time.sleep(self.latency)
+        return {"longName": self.ticker, "currentPrice": 100.0, "previousClose": 99.0}
+
+
+class SlowProvider(DataProvider):
+    name = "slow-fake"
+
+    def ticker(self, symbol: str):
+        return SlowTicker(symbol)
+
+    def download(self, symbols, period="5d", interval="1d"):
+        return pd.DataFrame()
+
+    def search(self, query, max_results=10):
+        return []
+
+
+async def run_batch(calls: int) -> float:
+    afinance_server.data_cache.invalidate()
+    start_time = time.perf_counter()
+    await asyncio.gather(*[
+        afinance_server.call_tool("get_stock_info", {"symbol": f"SYM{i}"})
+        for i in range(calls)
+    ])
+    return time.perf_counter() - start_time
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    SlowTicker.latency = args.latency
+    afinance_server.provider = SlowProvider()
+    # Unlimited, so the timings measure the pool rather than the token bucket
+    afinance_server.rate_limiter = RateLimiter(rate=0)
+
+    print(f"{args.calls} concurrent get_stock_info calls, {args.latency:.2f}s upstream latency")
+    for label, dispatcher in [
+        ("serial (1 worker)", Dispatcher(max_workers=1, default_concurrency=1)),
+        ("pool (8 workers)", Dispatcher(max_workers=8)),
+        ("pool (32 workers)", Dispatcher(max_workers=32, default_concurrency=32)),
+    ]:
+        afinance_server.dispatcher = dispatcher
+        elapsed = await run_batch(args.calls)
+        dispatcher.shutdown()
+        print(f"  {label:<20} {elapsed:6.2f}s  {args.calls / elapsed:7.1f} calls/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
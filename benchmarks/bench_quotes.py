@@ -0,0 +1,96 @@
+"""Benchmark get_multiple_quotes: serial per-symbol info vs batch download, 1 to 500 symbols
+
+Usage: python benchmarks/bench_quotes.py [--sizes 1 10 50 100 500] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import afinance_server
+from cache import DataCache
+from dispatch import Dispatcher
+from providers import DataProvider
+from ratelimit import RateLimiter
+
+LATENCY = 0.02
+upstream_calls = {"info": 0, "download": 0}
+
+
+class FakeTicker:
+    def __init__(self, symbol: str):
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        upstream_calls["info"] += 1
+        time.sleep(LATENCY)
+        return {"longName": self.ticker, "currentPrice": 101.0, "previousClose": 100.0,
+                "marketCap": 1e9, "trailingPE": 20.0, "forwardPE": 18.0}
+
+
+class FakeProvider(DataProvider):
+    name = "quotes-fake"
+
+    def ticker(self, symbol: str):
+        return FakeTicker(symbol)
+
+    def download(self, symbols, period="5d", interval="1d"):
+        """One round-trip for all symbols, plus a small per-symbol parsing cost"""
+        upstream_calls["download"] += 1
+        time.sleep(LATENCY + 0.0002 * len(symbols))
+        index = pd.date_range(end=pd.Timestamp.now().normalize(), periods=5, freq="B")
+        closes = pd.DataFrame(np.linspace(100, 101, 5)[:, None].repeat(len(symbols), axis=1), index=index, columns=symbols)
+        return pd.concat({"Close": closes}, axis=1)
+
+    def search(self, query, max_results=10):
+        return []
+
+
+def serial_info_quotes(symbols):
+    """The original implementation: one blocking info round-trip per symbol"""
+    return {symbol: FakeTicker(symbol).info for symbol in symbols}
+
+
+async def timed(coro_factory) -> float:
+    afinance_server.data_cache = DataCache()
+    afinance_server.dispatcher = Dispatcher()
+    start_time = time.perf_counter()
+    await coro_factory()
+    elapsed = time.perf_counter() - start_time
+    afinance_server.dispatcher.shutdown()
+    return elapsed
+
+
+async def main():
+    global LATENCY
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 100, 500])
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    LATENCY = args.latency
+    afinance_server.provider = FakeProvider()
+    # Unlimited, so the timings measure the batch path rather than the token bucket
+    afinance_server.rate_limiter = RateLimiter(rate=0)
+
+    print(f"upstream latency {LATENCY * 1000:.0f} ms per request")
+    print(f"{'symbols':>8} {'serial info':>12} {'batch+info':>12} {'batch only':>12}")
+    for size in args.sizes:
+        symbols = [f"SYM{i}" for i in range(size)]
+        serial = await timed(lambda: asyncio.to_thread(serial_info_quotes, symbols))
+        with_info = await timed(lambda: afinance_server.call_tool(
+            "get_multiple_quotes", {"symbols": symbols, "include_fundamentals": True}))
+        prices_only = await timed(lambda: afinance_server.call_tool(
+            "get_multiple_quotes", {"symbols": symbols}))
+        print(f"{size:>8} {serial:>11.2f}s {with_info:>11.2f}s {prices_only:>11.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
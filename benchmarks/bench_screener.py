@@ -0,0 +1,72 @@
+"""Benchmark run_screener evaluation: compiled vectorized queries vs a per-symbol Python loop
+
+Usage: python benchmarks/bench_screener.py [--symbols 1000 5000 20000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from screener import TABLE_COLUMNS, compile_query, run_screen
+
+QUERIES = [
+    "Return on equity > 15 AND Debt to equity < 0.5",
+    "Price to Earning < 20 OR Dividend yield > 3",
+    "OPM > 20 AND (Sales - Material cost) / Sales * 100 > 40 AND Market Capitalization > 1000000000",
+]
+
+
+def make_table(symbols: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(3, 1.5, (symbols, len(TABLE_COLUMNS)))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return pd.DataFrame(values, index=[f"SYM{i}" for i in range(symbols)], columns=TABLE_COLUMNS)
+
+
+def loop_screen(table: pd.DataFrame) -> list:
+    """Baseline: test every symbol's row in Python, as a naive screen would"""
+    matches = []
+    for symbol, row in table.iterrows():
+        if row["Return on equity"] > 15 and row["Debt to equity"] < 0.5:
+            matches.append(symbol)
+    return matches
+
+
+def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    compile_query.cache_clear()
+    compile_query(QUERIES[2])
+    print(f"compile (cold): {(time.perf_counter() - start) * 1000:.3f} ms")
+
+    print(f"{'symbols':>8} {'loop ms':>10} {'mask ms':>10} {'screen ms':>10}  query")
+    for symbols in args.symbols:
+        table = make_table(symbols)
+        loop = timed(lambda: loop_screen(table), 1)
+        for query in QUERIES:
+            compiled = compile_query(query)
+            mask = timed(lambda: compiled.mask(table), args.repeat)
+            screen = timed(lambda: run_screen(table, query, sort_by="Market Capitalization"), args.repeat)
+            print(f"{symbols:>8} {loop * 1000:>10.1f} {mask * 1000:>10.3f} {screen * 1000:>10.3f}  {query[:50]}")
+
+
+if __name__ == "__main__":
+    main()
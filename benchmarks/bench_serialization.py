@@ -0,0 +1,80 @@
+"""Benchmark get_historical_data serialization: iterrows vs vectorized records vs columnar
+
+Usage: python benchmarks/bench_serialization.py [--rows 10000 100000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from serialization import history_columns, history_records
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    close = 100 + rng.standard_normal(rows).cumsum()
+    index = pd.date_range("2000-01-03", periods=rows, freq="min", tz="America/New_York")
+    return pd.DataFrame({
+        "Open": close + rng.random(rows),
+        "High": close + 1,
+        "Low": close - 1,
+        "Close": close,
+        "Volume": rng.integers(0, 1_000_000, rows),
+    }, index=index)
+
+
+def iterrows_records(hist: pd.DataFrame):
+    """The original per-row loop, kept here as the baseline"""
+    data = []
+    for date, row in hist.iterrows():
+        data.append({
+            "date": date.strftime("%Y-%m-%d"),
+            "open": float(row["Open"]),
+            "high": float(row["High"]),
+            "low": float(row["Low"]),
+            "close": float(row["Close"]),
+            "volume": int(row["Volume"]) if "Volume" in row else 0,
+        })
+    return data
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = {
+        "iterrows + indent=2": lambda hist: json.dumps({"data": iterrows_records(hist)}, indent=2),
+        "vectorized records + indent=2": lambda hist: json.dumps({"data": history_records(hist)}, indent=2),
+        "columnar + compact": lambda hist: json.dumps({"data": history_columns(hist)}, separators=(",", ":")),
+    }
+    for rows in args.rows:
+        hist = make_frame(rows)
+        assert iterrows_records(hist) == history_records(hist)
+        print(f"{rows} rows")
+        baseline = None
+        for label, serialize in cases.items():
+            payload = serialize(hist)
+            elapsed = best_of(args.repeat, lambda: serialize(hist))
+            baseline = baseline or elapsed
+            print(f"  {label:<32} {elapsed * 1000:9.1f} ms  {baseline / elapsed:6.1f}x  {len(payload) / 1e6:7.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark server cold start over MCP stdio: time from spawn to initialize, list_tools, list_prompts and the first tool result
+
+Modes:
+    lazy     data stack imported on the first tool call (YF_PREWARM=0)
+    prewarm  data stack imported in the background right after startup (default)
+    eager    data stack imported before the handshake, as the server used to
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from providers import generate_fixtures
+
+SERVER = os.path.join(ROOT, "afinance_server.py")
+EAGER = f"import sys; sys.path.insert(0, {ROOT!r}); import asyncio, afinance_server, server_app; asyncio.run(server_app.main())"
+MODES = {
+    "lazy": ([SERVER], {"YF_PREWARM": "0"}),
+    "prewarm": ([SERVER], {"YF_PREWARM": "1"}),
+    "eager": (["-c", EAGER], {"YF_PREWARM": "0"}),
+}
+STEPS = ["initialize", "list_tools", "list_prompts", "first_tool"]
+
+
+async def cold_start(args: List[str], env: Dict[str, str]) -> Dict[str, float]:
+    """Spawn one server and time each step from the spawn"""
+    server_params = StdioServerParameters(command=sys.executable, args=args, env=env, cwd=tempfile.mkdtemp(prefix="yf-server-"))
+    timings = {}
+    with open(os.devnull, "w") as errlog:
+        start_time = time.perf_counter()
+        async with stdio_client(server_params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                timings["initialize"] = time.perf_counter() - start_time
+                await session.list_tools()
+                timings["list_tools"] = time.perf_counter() - start_time
+                await session.list_prompts()
+                timings["list_prompts"] = time.perf_counter() - start_time
+                await session.call_tool("get_stock_info", {"symbol": "SYM0"})
+                timings["first_tool"] = time.perf_counter() - start_time
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per mode")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    fixture_dir = tempfile.mkdtemp(prefix="yf-fixtures-")
+    generate_fixtures(["SYM0"], fixture_dir, years=1)
+    base_env = dict(os.environ)
+    base_env.update({
+        "YF_DATA_PROVIDER": "fixture",
+        "YF_FIXTURE_DIR": fixture_dir,
+        "YF_HISTORY_DIR": tempfile.mkdtemp(prefix="yf-history-"),
+        "YF_FUNDAMENTALS_DIR": tempfile.mkdtemp(prefix="yf-fundamentals-"),
+    })
+
+    print(f"Median of {args.runs} cold starts, ms from spawn")
+    print(f"{'mode':<10}" + "".join(f"{step:>14}" for step in STEPS))
+    for mode in args.modes:
+        server_args, env = MODES[mode]
+        runs = [asyncio.run(cold_start(server_args, {**base_env, **env})) for _ in range(args.runs)]
+        medians = [statistics.median(run[step] for run in runs) * 1000 for step in STEPS]
+        print(f"{mode:<10}" + "".join(f"{median:>14.0f}" for median in medians))
+
+
+if __name__ == "__main__":
+    main()
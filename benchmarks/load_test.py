@@ -0,0 +1,229 @@
+"""Load test afinance_server.py over MCP stdio against the offline fixture provider
+
+Spawns the server as a subprocess (exactly as an MCP client would), drives it
+with concurrent tool calls and reports p50/p95/p99 latency, throughput and
+response size per tool. Results are saved as JSON so runs can be compared
+across versions:
+
+    python benchmarks/load_test.py --concurrency 16 --requests 2000 --output before.json
+    python benchmarks/load_test.py --concurrency 16 --requests 2000 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from providers import generate_fixtures
+
+DEFAULT_MIX = "get_stock_info=4,get_historical_data=3,get_multiple_quotes=2,get_financials=1,get_earnings=1,get_dividends=1,get_news=1"
+PERIODS = ["1mo", "3mo", "6mo", "1y", "5y"]
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        tool, _, weight = part.partition("=")
+        weights[tool.strip()] = int(weight or 1)
+    return weights
+
+
+def make_arguments(tool: str, symbols: List[str], rng: random.Random) -> Dict[str, Any]:
+    """Build realistic arguments for one call of tool"""
+    symbol = rng.choice(symbols)
+    if tool == "get_historical_data":
+        return {"symbol": symbol, "period": rng.choice(PERIODS), "interval": "1d"}
+    if tool == "get_multiple_quotes":
+        return {"symbols": rng.sample(symbols, min(len(symbols), rng.randint(2, 20)))}
+    if tool == "get_financials":
+        return {"symbol": symbol, "quarterly": rng.random() < 0.5}
+    if tool == "get_news":
+        return {"symbol": symbol, "count": 5}
+    if tool == "search_stocks":
+        return {"query": symbol[:3], "limit": 5}
+    if tool in ("get_cache_stats", "clear_cache"):
+        return {}
+    return {"symbol": symbol}
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Aggregate raw samples into per-tool latency, throughput and size statistics"""
+    summary = {}
+    tools = sorted({sample["tool"] for sample in samples})
+    for tool in tools + ["ALL"]:
+        selected = [sample for sample in samples if tool == "ALL" or sample["tool"] == tool]
+        latencies = np.array([sample["latency"] for sample in selected]) * 1000
+        sizes = np.array([sample["bytes"] for sample in selected])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary[tool] = {
+            "requests": len(selected),
+            "errors": sum(1 for sample in selected if sample["error"]),
+            "throughput_rps": round(len(selected) / elapsed, 2),
+            "latency_ms": {
+                "mean": round(float(latencies.mean()), 2),
+                "p50": round(float(p50), 2),
+                "p95": round(float(p95), 2),
+                "p99": round(float(p99), 2),
+                "max": round(float(latencies.max()), 2),
+            },
+            "bytes": {
+                "mean": int(sizes.mean()),
+                "total": int(sizes.sum()),
+            },
+        }
+    return summary
+
+
+def print_summary(summary: Dict[str, Any], baseline: Dict[str, Any] = None):
+    print(f"{'tool':<22} {'reqs':>6} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'bytes':>9}")
+    for tool, stats in summary.items():
+        latency = stats["latency_ms"]
+        line = (f"{tool:<22} {stats['requests']:>6} {stats['errors']:>4} {stats['throughput_rps']:>8.1f} "
+                f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} {stats['bytes']['mean']:>9}")
+        if baseline and tool in baseline:
+            before = baseline[tool]["latency_ms"]
+            line += f"  p50 {_delta(before['p50'], latency['p50'])} p95 {_delta(before['p95'], latency['p95'])}"
+        print(line)
+
+
+def _delta(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_load(args, fixture_dir: str, symbols: List[str]) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env.update({
+        "YF_DATA_PROVIDER": "fixture",
+        "YF_FIXTURE_DIR": fixture_dir,
+        "YF_FIXTURE_LATENCY": str(args.latency),
+        "YF_RATE_LIMIT": str(args.rate_limit),
+        "YF_HISTORY_DIR": tempfile.mkdtemp(prefix="yf-history-"),
+        "YF_FUNDAMENTALS_DIR": tempfile.mkdtemp(prefix="yf-fundamentals-"),
+    })
+    server_params = StdioServerParameters(
+        command=sys.executable,
+        args=[os.path.join(ROOT, "afinance_server.py")],
+        env=env,
+        cwd=tempfile.mkdtemp(prefix="yf-server-"),
+    )
+
+    rng = random.Random(args.seed)
+    weights = parse_mix(args.mix)
+    tools = rng.choices(list(weights), weights=list(weights.values()), k=args.requests)
+    plan = asyncio.Queue()
+    for tool in tools:
+        plan.put_nowait((tool, make_arguments(tool, symbols, rng)))
+
+    samples = []
+
+    errlog = open(args.server_log, "w") if args.server_log else open(os.devnull, "w")
+    async with stdio_client(server_params, errlog=errlog) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+
+            for tool in list(weights)[:args.warmup and len(weights)]:
+                await session.call_tool(tool, make_arguments(tool, symbols, rng))
+
+            async def worker():
+                while True:
+                    try:
+                        tool, arguments = plan.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    start_time = time.perf_counter()
+                    error = False
+                    size = 0
+                    try:
+                        result = await session.call_tool(tool, arguments)
+                        text = "".join(getattr(item, "text", "") for item in result.content)
+                        size = len(text.encode())
+                        error = bool(result.isError) or text.lstrip("{ \n").startswith('"error"')
+                    except Exception:
+                        error = True
+                    samples.append({
+                        "tool": tool,
+                        "latency": time.perf_counter() - start_time,
+                        "bytes": size,
+                        "error": error,
+                    })
+
+            start_time = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+            elapsed = time.perf_counter() - start_time
+
+    errlog.close()
+    return {"elapsed_seconds": round(elapsed, 3), "tools": summarize(samples, elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent in-flight tool calls")
+    parser.add_argument("--requests", type=int, default=500, help="Total tool calls to issue")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Tool mix as tool=weight,...")
+    parser.add_argument("--symbols", nargs="+", help="Symbol universe (default: every fixture symbol)")
+    parser.add_argument("--universe", type=int, default=50, help="Synthetic symbols to generate when --fixture-dir is empty")
+    parser.add_argument("--fixture-dir", help="Fixture directory (default: a generated temporary one)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated upstream latency per fixture access, seconds")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Server's upstream requests per second (0 disables the limiter)")
+    parser.add_argument("--warmup", type=int, default=1, help="Call each tool once before measuring (0 to disable)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server-log", help="Write the server's stderr here (default: discarded)")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    fixture_dir = args.fixture_dir or tempfile.mkdtemp(prefix="yf-fixtures-")
+    if not os.path.isdir(fixture_dir) or not os.listdir(fixture_dir):
+        print(f"Generating {args.universe} synthetic symbols in {fixture_dir}...")
+        generate_fixtures([f"SYM{i}" for i in range(args.universe)], fixture_dir, years=5)
+    symbols = args.symbols or sorted(os.listdir(fixture_dir))
+
+    results = asyncio.run(run_load(args, fixture_dir, symbols))
+    results["config"] = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "mix": parse_mix(args.mix),
+        "symbols": len(symbols),
+        "latency": args.latency,
+        "seed": args.seed,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["tools"]
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {len(symbols)} symbols, "
+          f"{results['elapsed_seconds']:.2f}s")
+    print_summary(results["tools"], baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
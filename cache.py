@@ -0,0 +1,240 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+# Time-to-live per dataset in seconds; override with YF_CACHE_TTL_<DATASET>
+DATASET_TTLS = {
+    "ticker": 24 * 3600,
+    "info": 60,
+    "quote": 15,
+    # How long a stored bar series is served before its tail is refreshed
+    "history": 300,
+    "dividends": 24 * 3600,
+    "splits": 7 * 24 * 3600,
+    "news": 15 * 60,
+    "recommendations": 6 * 3600,
+    "search": 3600,
+    # How long warehouse statements are served before the last report date is re-checked
+    "fundamentals": 3600,
+    # Bulk-downloaded close matrices for portfolio analytics
+    "closes": 300,
+    # Memoized indicator series; keys include the bar series stamp, so changed bars never hit
+    "indicators": 3600,
+}
+DEFAULT_TTL = 300
+CACHE_MAX_ENTRIES = int(os.getenv("YF_CACHE_MAX_ENTRIES", "4096"))
+# Expired entries are kept this long (seconds) to answer requests while upstream is down
+STALE_MAX_AGE = float(os.getenv("YF_STALE_MAX_AGE", str(24 * 3600)))
+# Seconds between background drains of the expiry heap
+CACHE_SWEEP_INTERVAL = float(os.getenv("YF_CACHE_SWEEP_INTERVAL", "5"))
+# Heap and stale queue items handled per lock acquisition while draining
+DRAIN_BATCH = 1024
+
+for _dataset in DATASET_TTLS:
+    _override = os.getenv(f"YF_CACHE_TTL_{_dataset.upper()}")
+    if _override:
+        DATASET_TTLS[_dataset] = float(_override)
+
+CacheKey = Tuple[str, str, Tuple[Tuple[str, Hashable], ...]]
+
+
+def make_key(symbol: str, dataset: str, params: Optional[Dict[str, Any]] = None) -> CacheKey:
+    """Build a cache key from symbol, dataset and normalized params"""
+    normalized = tuple(sorted((params or {}).items()))
+    return (symbol.upper(), dataset, normalized)
+
+
+class DataCache:
+    """Thread-safe TTL cache keyed by (symbol, dataset, params) with LRU eviction
+
+    Expiry is tracked in a min-heap of expiry times instead of by scanning:
+    clear_expired() pops the entries whose TTL has passed onto a queue of
+    stale entries, ordered by expiry, and drops those past stale_max_age from
+    its head. Superseded heap and queue items are skipped when popped and
+    compacted away once they outnumber live entries, so puts and drains cost
+    O(log n) amortized and stats() reads counters instead of walking entries.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+        stale_max_age: float = STALE_MAX_AGE,
+    ):
+        self.max_entries = max_entries
+        self.ttls = dict(DATASET_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.stale_max_age = stale_max_age
+        self._clock = clock
+        self._entries: "OrderedDict[CacheKey, Tuple[Any, float]]" = OrderedDict()
+        # (expires_at, sequence, key) for every put; sequence breaks ties without comparing keys
+        self._expiring: List[Tuple[float, int, CacheKey]] = []
+        self._sequence = itertools.count()
+        # (expires_at, key) of entries past their TTL, oldest first, and the set of those keys
+        self._stale: Deque[Tuple[float, CacheKey]] = deque()
+        self._stale_keys: Set[CacheKey] = set()
+        self._datasets: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def ttl_for(self, dataset: str) -> float:
+        return self.ttls.get(dataset, self.default_ttl)
+
+    def get(self, symbol: str, dataset: str, params: Optional[Dict[str, Any]] = None) -> Tuple[bool, Any]:
+        """Return (found, value) for a key; expired entries miss but are kept for get_stale until too old"""
+        key = make_key(symbol, dataset, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            value, expires_at = entry
+            now = self._clock()
+            if now >= expires_at:
+                if now >= expires_at + self.stale_max_age:
+                    self._remove(key)
+                    self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def get_stale(self, symbol: str, dataset: str, params: Optional[Dict[str, Any]] = None) -> Tuple[bool, Any, float]:
+        """Return (found, value, age in seconds) for a key even if it has expired, as a fallback when upstream fails"""
+        key = make_key(symbol, dataset, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None, 0.0
+            value, expires_at = entry
+            age = self._clock() - (expires_at - self.ttl_for(dataset))
+            if age >= self.ttl_for(dataset) + self.stale_max_age:
+                return False, None, 0.0
+            return True, value, age
+
+    def put(self, symbol: str, dataset: str, value: Any, params: Optional[Dict[str, Any]] = None):
+        """Store a value and evict least recently used entries beyond max_entries"""
+        key = make_key(symbol, dataset, params)
+        expires_at = self._clock() + self.ttl_for(dataset)
+        with self._lock:
+            if key in self._entries:
+                self._stale_keys.discard(key)
+            else:
+                self._datasets[dataset] = self._datasets.get(dataset, 0) + 1
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            heapq.heappush(self._expiring, (expires_at, next(self._sequence), key))
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            if len(self._expiring) > 2 * len(self._entries) + 64:
+                self._expiring = [
+                    (expires_at, next(self._sequence), key)
+                    for key, (_, expires_at) in self._entries.items() if key not in self._stale_keys
+                ]
+                heapq.heapify(self._expiring)
+
+    def _remove(self, key: CacheKey):
+        """Delete an entry and its bookkeeping; its heap and stale queue items are skipped when popped"""
+        del self._entries[key]
+        self._stale_keys.discard(key)
+        self._datasets[key[1]] -= 1
+        if not self._datasets[key[1]]:
+            del self._datasets[key[1]]
+
+    def invalidate(self, symbol: Optional[str] = None) -> int:
+        """Drop all entries, or only those for symbol; returns the number removed"""
+        with self._lock:
+            if symbol is None:
+                count = len(self._entries)
+                self._entries.clear()
+                self._expiring.clear()
+                self._stale.clear()
+                self._stale_keys.clear()
+                self._datasets.clear()
+                return count
+            symbol = symbol.upper()
+            keys = [key for key in self._entries if key[0] == symbol]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear_expired(self) -> int:
+        """Mark entries past their TTL as stale and remove those expired for longer than stale_max_age; returns the number removed
+
+        Works in batches of DRAIN_BATCH items, releasing the lock in between so
+        a burst of expiries does not stall concurrent gets and puts.
+        """
+        now = self._clock()
+        removed = 0
+        while True:
+            with self._lock:
+                batch_removed, done = self._drain(now, DRAIN_BATCH)
+                self.expirations += batch_removed
+            removed += batch_removed
+            if done:
+                return removed
+
+    def _drain(self, now: float, limit: int) -> Tuple[int, bool]:
+        """Handle up to limit heap and stale queue items due at now; returns (removed, whether nothing due is left)"""
+        while self._expiring and self._expiring[0][0] <= now and limit > 0:
+            expires_at, _, key = heapq.heappop(self._expiring)
+            limit -= 1
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == expires_at and key not in self._stale_keys:
+                self._stale_keys.add(key)
+                self._stale.append((expires_at, key))
+        removed = 0
+        while self._stale and self._stale[0][0] + self.stale_max_age <= now and limit > 0:
+            expires_at, key = self._stale.popleft()
+            limit -= 1
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == expires_at:
+                self._remove(key)
+                removed += 1
+        if limit <= 0:
+            return removed, False
+        if len(self._stale) > 2 * len(self._stale_keys) + 64:
+            self._stale = deque(
+                (expires_at, key) for expires_at, key in self._stale
+                if key in self._stale_keys and self._entries[key][1] == expires_at
+            )
+        return removed, True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics from counters kept up to date by put and clear_expired"""
+        self.clear_expired()
+        with self._lock:
+            total = len(self._entries)
+            active = total - len(self._stale_keys)
+            datasets = dict(self._datasets)
+            pending = len(self._expiring)
+        lookups = self.hits + self.misses
+        return {
+            "active_cache_entries": active,
+            "expired_cache_entries": total - active,
+            "total_cache_entries": total,
+            "max_entries": self.max_entries,
+            "entries_by_dataset": datasets,
+            "expiry_heap_size": pending,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "stale_max_age_seconds": self.stale_max_age,
+            "ttl_seconds": self.ttls,
+        }
@@ -0,0 +1,36 @@
+import pytest
+
+import afinance_server
+from cache import DataCache
+from dispatch import Dispatcher
+from fundamentals_store import FundamentalsStore
+from history_store import HistoryStore
+from metrics import Metrics
+from profiling import Profiler
+from providers import FixtureProvider, generate_fixtures
+from ratelimit import RateLimiter
+from resilience import Resilience
+from screener import FundamentalsTable
+from singleflight import SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def server(tmp_path):
+    """Give every test fresh afinance_server globals, over a fixture provider with two years of AAA bars"""
+    generate_fixtures(["AAA"], str(tmp_path / "fixtures"), years=2)
+    afinance_server.provider = FixtureProvider(str(tmp_path / "fixtures"))
+    afinance_server.data_cache = DataCache()
+    afinance_server.dispatcher = Dispatcher(max_workers=4)
+    afinance_server.tool_flight = SingleFlight()
+    afinance_server.upstream_flight = SingleFlight()
+    afinance_server.history_store = HistoryStore(str(tmp_path / "history"))
+    afinance_server.fundamentals_store = FundamentalsStore(str(tmp_path / "fundamentals"), check_interval=0)
+    afinance_server.screener_table = FundamentalsTable(afinance_server.fundamentals_store)
+    afinance_server.resilience = Resilience()
+    # Unlimited, so tests never wait for tokens; test_ratelimit installs its own
+    afinance_server.rate_limiter = RateLimiter(rate=0)
+    afinance_server.metrics = Metrics()
+    afinance_server.profiler = Profiler(sample_rate=0, directory=str(tmp_path / "profiles"))
+    afinance_server.background_tasks.clear()
+    yield afinance_server
+    afinance_server.dispatcher.shutdown()
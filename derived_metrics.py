@@ -0,0 +1,301 @@
+"""Bulk computation of derived screener fields
+
+Growth rates, multi-year averages and medians, cumulative cash flows and
+trailing price returns are computed for the whole universe at once. Each
+input is stacked into a (symbols x periods) array, newest period first for
+statements and right-aligned on the latest bar for prices, so every field
+is a handful of numpy operations over all symbols instead of a Python loop
+per ticker.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from constants import SCREENER_PARAMS
+from indicators import macd, rsi
+
+_CANONICAL = {name.lower(): name for group in SCREENER_PARAMS.values() for name in group}
+
+# Annual periods stacked per symbol: enough for 10-year growth (11 data points)
+ANNUAL_DEPTH = 11
+QUARTER_DEPTH = 8
+
+# Daily bars the price metrics look back over; trading-day windows approximate calendar spans
+PRICE_HISTORY_PERIOD = "max"
+TRADING_DAYS = 252
+RETURN_WINDOWS = {
+    "1day": 1,
+    "1week": 5,
+    "1month": 21,
+    "3months": 63,
+    "6months": 126,
+    "1year": TRADING_DAYS,
+    "3years": 3 * TRADING_DAYS,
+    "5years": 5 * TRADING_DAYS,
+    "7years": 7 * TRADING_DAYS,
+}
+VOLUME_WINDOWS = {"1week": 5, "1month": 21, "1year": TRADING_DAYS}
+PRICE_YEARS_BACK = (3, 5, 7, 10)
+PRICE_DEPTH = max(PRICE_YEARS_BACK) * TRADING_DAYS + 1
+# Bars RSI/MACD are run over; older bars' weight in their moving averages is below float precision
+INDICATOR_WARMUP = 500
+
+GROWTH_ITEMS = {
+    "Sales": "Total Revenue",
+    "Profit": "Net Income",
+    "EBIDT": "EBITDA",
+    "EPS": "Diluted EPS",
+}
+GROWTH_YEARS = (3, 5, 7, 10)
+
+
+def canonical(name: str) -> str:
+    """Spell a generated field name the way SCREENER_PARAMS does"""
+    return _CANONICAL.get(name.lower(), name)
+
+
+def _statement_field_names() -> List[str]:
+    names = [f"{prefix} growth {years}Years" for prefix in GROWTH_ITEMS for years in GROWTH_YEARS]
+    names += ["Sales growth 5years median", "Sales growth 10years median"]
+    names += [f"Average Earnings {years}Year" for years in (5, 10)]
+    names += [f"Average EBIT {years}Year" for years in (5, 10)]
+    names += [f"Average return on equity {years}Years" for years in (3, 5, 7, 10)]
+    names += [f"Average return on capital employed {years}Years" for years in (3, 5, 7, 10)]
+    names += [f"Return on assets {years}years" for years in (3, 5)]
+    names += [f"OPM {years}Year" for years in (5, 10)]
+    names += ["Average 5years dividend", "Average dividend payout 3years"]
+    names += ["Average debtor days 3years", "Average Working Capital Days 3years"]
+    names += [f"{kind} cash flow {years}years" for kind in ("Free", "Operating", "Investing") for years in (3, 5, 7, 10)]
+    names += [f"Book value {years}years back" for years in (3, 5, 10)]
+    names += [f"Debtor days {years}years back" for years in (3, 5)]
+    names += [f"Inventory turnover ratio {years}Years back" for years in (3, 5, 7, 10)]
+    names += ["Sales preceding 12months", "Net profit preceding 12months"]
+    return [canonical(name) for name in names]
+
+
+def _price_field_names() -> List[str]:
+    names = [f"Return over {window}" for window in RETURN_WINDOWS]
+    names += [f"Volume {window} average" for window in VOLUME_WINDOWS]
+    names += ["High price all time", "Low price all time", "DMA 50 previous day", "DMA 200 previous day"]
+    names += [f"Price {years}Years back" for years in PRICE_YEARS_BACK]
+    names += ["RSI", "MACD", "MACD Previous Day", "MACD Signal", "MACD Signal Previous Day"]
+    return [canonical(name) for name in names]
+
+
+STATEMENT_METRICS = _statement_field_names()
+PRICE_METRICS = _price_field_names()
+
+
+class PeriodStack:
+    """Line items of one statement table as (symbols x periods) arrays, newest period first"""
+
+    def __init__(self, table: Optional[pd.DataFrame], symbols: pd.Index, depth: int):
+        self.symbols = symbols
+        self.depth = depth
+        self._arrays: Dict[str, np.ndarray] = {}
+        if table is None or table.empty:
+            self.table = None
+            return
+        self.table = table.sort_index(level=["symbol", "period_end"], ascending=[True, False])
+        offsets = self.table.groupby(level="symbol").cumcount().to_numpy()
+        codes = symbols.get_indexer(self.table.index.get_level_values("symbol"))
+        self._keep = (offsets < depth) & (codes >= 0)
+        self._codes = codes[self._keep]
+        self._offsets = offsets[self._keep]
+
+    def __getitem__(self, item: str) -> np.ndarray:
+        values = self._arrays.get(item)
+        if values is None:
+            values = np.full((len(self.symbols), self.depth), np.nan)
+            if self.table is not None and item in self.table:
+                values[self._codes, self._offsets] = self.table[item].to_numpy(dtype="float64")[self._keep]
+            self._arrays[item] = values
+        return values
+
+
+def cagr(values: np.ndarray, years: int) -> np.ndarray:
+    """Compound annual growth in percent from years back to the latest period; NaN unless both ends are positive"""
+    latest, base = values[:, 0], values[:, years]
+    valid = (latest > 0) & (base > 0)
+    return np.where(valid, ((latest / base) ** (1 / years) - 1) * 100, np.nan)
+
+
+def window_mean(values: np.ndarray, years: int) -> np.ndarray:
+    """Mean of the latest years periods; NaN unless all are present"""
+    return values[:, :years].mean(axis=1)
+
+
+def year_over_year(values: np.ndarray) -> np.ndarray:
+    """Growth of each period over the one before it, in percent"""
+    return (values[:, :-1] / values[:, 1:] - 1) * 100
+
+
+def compute_statement_metrics(tables: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Compute every statement-derived field for all symbols in the warehouse tables"""
+    symbols = pd.Index(sorted(set().union(*[
+        table.index.get_level_values("symbol") for table in tables.values() if table is not None and not table.empty
+    ])), name="symbol")
+    income = PeriodStack(tables.get("income_stmt"), symbols, ANNUAL_DEPTH)
+    balance = PeriodStack(tables.get("balance_sheet"), symbols, ANNUAL_DEPTH)
+    cashflow = PeriodStack(tables.get("cashflow"), symbols, ANNUAL_DEPTH)
+    quarterly = PeriodStack(tables.get("quarterly_income_stmt"), symbols, QUARTER_DEPTH)
+
+    columns = {}
+    with np.errstate(all="ignore"):
+        for prefix, item in GROWTH_ITEMS.items():
+            for years in GROWTH_YEARS:
+                columns[f"{prefix} growth {years}Years"] = cagr(income[item], years)
+
+        sales = income["Total Revenue"]
+        net = income["Net Income"]
+        ebit = income["EBIT"]
+        sales_growth = year_over_year(sales)
+        columns["Sales growth 5years median"] = np.median(sales_growth[:, :5], axis=1)
+        columns["Sales growth 10years median"] = np.median(sales_growth[:, :10], axis=1)
+
+        capital_employed = balance["Total Assets"] - balance["Current Liabilities"]
+        roe = net / balance["Stockholders Equity"] * 100
+        roce = ebit / capital_employed * 100
+        roa = net / balance["Total Assets"] * 100
+        opm = income["Operating Income"] / sales * 100
+        dividends = -cashflow["Cash Dividends Paid"]
+        debtor_days = balance["Accounts Receivable"] / sales * 365
+        working_capital_days = (balance["Current Assets"] - balance["Current Liabilities"]) / sales * 365
+        for years in (5, 10):
+            columns[f"Average Earnings {years}Year"] = window_mean(net, years)
+            columns[f"Average EBIT {years}Year"] = window_mean(ebit, years)
+            columns[f"OPM {years}Year"] = window_mean(opm, years)
+        for years in (3, 5, 7, 10):
+            columns[f"Average return on equity {years}Years"] = window_mean(roe, years)
+            columns[f"Average return on capital employed {years}Years"] = window_mean(roce, years)
+        for years in (3, 5):
+            columns[f"Return on assets {years}years"] = window_mean(roa, years)
+        columns["Average 5years dividend"] = window_mean(dividends, 5)
+        columns["Average dividend payout 3years"] = window_mean(dividends / net * 100, 3)
+        columns["Average debtor days 3years"] = window_mean(debtor_days, 3)
+        columns["Average Working Capital Days 3years"] = window_mean(working_capital_days, 3)
+
+        flows = {"Free": "Free Cash Flow", "Operating": "Operating Cash Flow", "Investing": "Investing Cash Flow"}
+        for kind, item in flows.items():
+            for years in (3, 5, 7, 10):
+                columns[f"{kind} cash flow {years}years"] = cashflow[item][:, :years].sum(axis=1)
+
+        book_value = balance["Stockholders Equity"] / balance["Ordinary Shares Number"]
+        inventory_turnover = sales / balance["Inventory"]
+        for years in (3, 5, 10):
+            columns[f"Book value {years}years back"] = book_value[:, years]
+        for years in (3, 5):
+            columns[f"Debtor days {years}years back"] = debtor_days[:, years]
+        for years in (3, 5, 7, 10):
+            columns[f"Inventory turnover ratio {years}Years back"] = inventory_turnover[:, years]
+
+        # The four quarters before the latest four
+        columns["Sales preceding 12months"] = quarterly["Total Revenue"][:, 4:8].sum(axis=1)
+        columns["Net profit preceding 12months"] = quarterly["Net Income"][:, 4:8].sum(axis=1)
+
+    return pd.DataFrame({canonical(name): values for name, values in columns.items()}, index=symbols)
+
+
+def stack_series(series: Dict[str, pd.DataFrame], column: str, depth: int) -> np.ndarray:
+    """Stack the last depth values of column for every symbol, right-aligned on the latest bar"""
+    stacked = np.full((len(series), depth), np.nan)
+    for row, frame in enumerate(series.values()):
+        if frame is None or frame.empty or column not in frame:
+            continue
+        values = frame[column].to_numpy(dtype="float64")[-depth:]
+        stacked[row, depth - len(values):] = values
+    return stacked
+
+
+def compute_price_metrics(series: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Compute trailing returns, volume averages and price levels from daily bars of every symbol"""
+    closes = stack_series(series, "Close", PRICE_DEPTH)
+    volumes = stack_series(series, "Volume", max(VOLUME_WINDOWS.values()))
+    columns = {}
+    with np.errstate(all="ignore"):
+        latest = closes[:, -1]
+        for window, bars in RETURN_WINDOWS.items():
+            columns[f"Return over {window}"] = (latest / closes[:, -1 - bars] - 1) * 100
+        for window, bars in VOLUME_WINDOWS.items():
+            columns[f"Volume {window} average"] = volumes[:, -bars:].mean(axis=1)
+        columns["DMA 50 previous day"] = closes[:, -51:-1].mean(axis=1)
+        columns["DMA 200 previous day"] = closes[:, -201:-1].mean(axis=1)
+        for years in PRICE_YEARS_BACK:
+            columns[f"Price {years}Years back"] = closes[:, -1 - years * TRADING_DAYS]
+
+    # One column per symbol, so the indicator recursions run once for the whole universe
+    close_columns = pd.DataFrame(closes[:, -INDICATOR_WARMUP:].T)
+    columns["RSI"] = rsi(close_columns).to_numpy()[-1]
+    line, signal = macd(close_columns)
+    columns["MACD"], columns["MACD Previous Day"] = line.to_numpy()[-1], line.to_numpy()[-2]
+    columns["MACD Signal"], columns["MACD Signal Previous Day"] = signal.to_numpy()[-1], signal.to_numpy()[-2]
+
+    # All-time extremes use the full series, not just the stacked window
+    highs = [frame["High"].max() if frame is not None and not frame.empty else np.nan for frame in series.values()]
+    lows = [frame["Low"].min() if frame is not None and not frame.empty else np.nan for frame in series.values()]
+    columns["High price all time"] = np.array(highs, dtype="float64")
+    columns["Low price all time"] = np.array(lows, dtype="float64")
+    return pd.DataFrame({canonical(name): values for name, values in columns.items()}, index=list(series))
+
+
+class DerivedMetrics:
+    """Materialized derived fields, recomputed only when their inputs' version changes"""
+
+    def __init__(self):
+        self._statement_key: Optional[Hashable] = None
+        self._statement_frame: Optional[pd.DataFrame] = None
+        # Price metric rows per symbol, and the series version each row was computed from
+        self._price_versions: Dict[str, Hashable] = {}
+        self._price_frame: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+        self.computations = {"statements": 0, "prices": 0}
+        self.symbols_recomputed = 0
+        self.last_compute_ms = {"statements": 0.0, "prices": 0.0}
+
+    def statements(self, version: Hashable, tables: Callable[[], Dict[str, pd.DataFrame]]) -> pd.DataFrame:
+        """Statement metrics for warehouse version; tables() is only called when it changed"""
+        with self._lock:
+            if self._statement_frame is None or self._statement_key != version:
+                start_time = time.perf_counter()
+                self._statement_frame = compute_statement_metrics(tables())
+                self._statement_key = version
+                self._record("statements", start_time)
+            return self._statement_frame
+
+    def prices(
+        self,
+        version: Callable[[str], Hashable],
+        symbols: List[str],
+        read: Callable[[str], Optional[pd.DataFrame]],
+    ) -> pd.DataFrame:
+        """Price metrics for symbols; only symbols whose version(symbol) changed since their row was computed are read again"""
+        with self._lock:
+            versions = {symbol: version(symbol) for symbol in symbols}
+            changed = [
+                symbol for symbol in symbols
+                if symbol not in self._price_versions or self._price_versions[symbol] != versions[symbol]
+            ]
+            if changed:
+                start_time = time.perf_counter()
+                rows = compute_price_metrics({symbol: read(symbol) for symbol in changed})
+                if self._price_frame is not None:
+                    rows = pd.concat([self._price_frame.drop(changed, errors="ignore"), rows])
+                self._price_frame = rows
+                self._price_versions.update((symbol, versions[symbol]) for symbol in changed)
+                self._record("prices", start_time)
+                self.symbols_recomputed += len(changed)
+            return self._price_frame.reindex(symbols)
+
+    def _record(self, kind: str, start_time: float):
+        self.computations[kind] += 1
+        self.last_compute_ms[kind] = round((time.perf_counter() - start_time) * 1000, 2)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "computations": dict(self.computations),
+            "price_symbols_recomputed": self.symbols_recomputed,
+            "last_compute_ms": dict(self.last_compute_ms),
+        }
@@ -0,0 +1,113 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from profiling import profiled
+
+# Thread pool and per-tool limits for blocking yfinance calls
+DISPATCH_MAX_WORKERS = int(os.getenv("YF_MAX_WORKERS", "16"))
+DISPATCH_DEFAULT_CONCURRENCY = int(os.getenv("YF_TOOL_CONCURRENCY", "8"))
+DISPATCH_DEFAULT_TIMEOUT = float(os.getenv("YF_TOOL_TIMEOUT", "30"))
+
+# Heavier tools get fewer concurrent slots so they cannot starve quote lookups
+TOOL_CONCURRENCY = {
+    "get_historical_data": 4,
+    "get_financials": 2,
+    "get_earnings": 2,
+    # Background warehouse checks yield to interactive requests
+    "fundamentals_refresh": 2,
+}
+
+TOOL_TIMEOUTS = {
+    "get_stock_info": 15.0,
+    "get_multiple_quotes": 60.0,
+    "get_financials": 45.0,
+    "get_earnings": 45.0,
+    "fundamentals_refresh": 45.0,
+}
+
+
+class ToolTimeoutError(Exception):
+    """Raised when a blocking call exceeds its tool timeout"""
+
+
+class Dispatcher:
+    """Run blocking calls on a shared thread pool with per-tool limits and timeouts"""
+
+    def __init__(
+        self,
+        max_workers: int = DISPATCH_MAX_WORKERS,
+        default_concurrency: int = DISPATCH_DEFAULT_CONCURRENCY,
+        default_timeout: float = DISPATCH_DEFAULT_TIMEOUT,
+        concurrency: Optional[Dict[str, int]] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        self.max_workers = max_workers
+        self.default_concurrency = default_concurrency
+        self.default_timeout = default_timeout
+        self.concurrency = dict(TOOL_CONCURRENCY if concurrency is None else concurrency)
+        self.timeouts = dict(TOOL_TIMEOUTS if timeouts is None else timeouts)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._calls = 0
+        self._timeouts = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="yf-dispatch"
+            )
+        return self._executor
+
+    def slot(self, tool: str) -> asyncio.Semaphore:
+        """The semaphore limiting concurrent calls of tool; hold it around run_in_slot"""
+        semaphore = self._semaphores.get(tool)
+        if semaphore is None:
+            limit = self.concurrency.get(tool, self.default_concurrency)
+            semaphore = asyncio.Semaphore(limit)
+            self._semaphores[tool] = semaphore
+        return semaphore
+
+    async def run(self, tool: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in the pool under the limit and timeout of tool"""
+        async with self.slot(tool):
+            return await self.run_in_slot(tool, func, *args, **kwargs)
+
+    async def run_in_slot(self, tool: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Like run, for a caller already holding slot(tool); the timeout starts now, not when the slot was requested"""
+        timeout = self.timeouts.get(tool, self.default_timeout)
+        loop = asyncio.get_running_loop()
+        self._calls += 1
+        self._in_flight[tool] = self._in_flight.get(tool, 0) + 1
+        start_time = time.perf_counter()
+        try:
+            # Run in a copy of the caller's context so logs from the pool keep its request id
+            context = contextvars.copy_context()
+            future = loop.run_in_executor(self.executor, context.run, profiled(lambda: func(*args, **kwargs)))
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise ToolTimeoutError(
+                f"{tool} timed out after {time.perf_counter() - start_time:.1f}s (limit {timeout}s)"
+            )
+        finally:
+            self._in_flight[tool] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get dispatcher statistics"""
+        return {
+            "max_workers": self.max_workers,
+            "total_calls": self._calls,
+            "timeouts": self._timeouts,
+            "in_flight": {tool: count for tool, count in self._in_flight.items() if count},
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+# On-disk fundamentals warehouse: one wide table per statement type, indexed by (symbol, period_end)
+FUNDAMENTALS_DIR = os.getenv(
+    "YF_FUNDAMENTALS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fundamentals_store")
+)
+
+STATEMENT_TYPES = [
+    "income_stmt",
+    "quarterly_income_stmt",
+    "balance_sheet",
+    "quarterly_balance_sheet",
+    "cashflow",
+    "quarterly_cashflow",
+]
+
+# Stored symbols are re-checked this often (seconds) by the background sweep
+FUNDAMENTALS_SWEEP_INTERVAL = float(os.getenv("YF_FUNDAMENTALS_SWEEP", "300"))
+# Symbols whose quote info reports no statement date (ETFs, funds) are re-pulled only this often (seconds)
+FUNDAMENTALS_UNREPORTED_TTL = float(os.getenv("YF_FUNDAMENTALS_UNREPORTED_TTL", str(7 * 24 * 3600)))
+
+# Minimum seconds between rewrites of the table files while symbols keep arriving
+FLUSH_INTERVAL = 5.0
+
+INDEX_NAMES = ["symbol", "period_end"]
+
+
+def report_date(info: Dict[str, Any]) -> Optional[str]:
+    """Get the end date of the latest reported period from quote info, if upstream provides it"""
+    stamps = [info.get(key) for key in ("mostRecentQuarter", "lastFiscalYearEnd")]
+    stamps = [stamp for stamp in stamps if isinstance(stamp, (int, float)) and not isinstance(stamp, bool)]
+    if not stamps:
+        return None
+    return pd.Timestamp(max(stamps), unit="s").strftime("%Y-%m-%d")
+
+
+def normalize_statement(symbol: str, df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Turn a yfinance statement (line items x periods) into rows indexed by (symbol, period_end)"""
+    if df is None or df.empty:
+        return pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=INDEX_NAMES))
+    rows = df.T.apply(pd.to_numeric, errors="coerce").astype("float64")
+    rows.columns = [str(column) for column in rows.columns]
+    rows = rows.loc[:, ~rows.columns.duplicated()]
+    periods = pd.DatetimeIndex(pd.to_datetime(rows.index))
+    if periods.tz is not None:
+        periods = periods.tz_localize(None)
+    rows.index = pd.MultiIndex.from_arrays([[symbol.upper()] * len(rows), periods], names=INDEX_NAMES)
+    return rows
+
+
+def denormalize_statement(rows: pd.DataFrame) -> pd.DataFrame:
+    """Turn one symbol's stored rows back into a yfinance-shaped statement, newest period first"""
+    if rows is None or rows.empty:
+        return pd.DataFrame()
+    rows = rows.droplevel("symbol") if isinstance(rows.index, pd.MultiIndex) else rows
+    # Wide tables hold the union of every symbol's line items; keep only this symbol's
+    rows = rows.dropna(axis=1, how="all").sort_index(ascending=False)
+    return rows.T
+
+
+class FundamentalsStore:
+    """Warehouse of normalized financial statements shared by get_financials, get_earnings and the screener
+
+    Each statement type is one wide table (rows: symbol and period end,
+    columns: line items). A symbol is re-pulled only when its last report
+    date changes; in between, checks just confirm the stored data is current.
+    """
+
+    def __init__(self, root: str = FUNDAMENTALS_DIR, check_interval: float = 3600, unreported_ttl: float = FUNDAMENTALS_UNREPORTED_TTL):
+        self.root = root
+        self.check_interval = check_interval
+        self.unreported_ttl = unreported_ttl
+        self._rows: Dict[str, Dict[str, pd.DataFrame]] = {statement: {} for statement in STATEMENT_TYPES}
+        self._tables: Dict[str, pd.DataFrame] = {}
+        self._quotes: Dict[str, Dict[str, float]] = {}
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dirty = False
+        self._flushed_at = 0.0
+        # version changes with any stored data; statements_version only when statements do
+        self.version = 0
+        self.statements_version = 0
+        self.refreshes = 0
+        self.unchanged_checks = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        """Read the stored warehouse from disk once; callers on the event loop should run it on a worker thread first"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                with open(os.path.join(self.root, "meta.json"), "r") as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                return
+            self._meta = stored.get("symbols", {})
+            self._quotes = stored.get("quotes", {})
+            for statement in STATEMENT_TYPES:
+                try:
+                    table = pd.read_pickle(os.path.join(self.root, f"{statement}.pkl"))
+                except (OSError, ValueError):
+                    continue
+                self._rows[statement] = {symbol: rows for symbol, rows in table.groupby(level="symbol")}
+            self.version += 1
+            self.statements_version += 1
+
+    def has(self, symbol: str) -> bool:
+        self.load()
+        return symbol.upper() in self._meta
+
+    def check_due(self, symbol: str) -> bool:
+        """True when the symbol is stored but has not been checked against upstream recently"""
+        self.load()
+        meta = self._meta.get(symbol.upper())
+        return meta is not None and time.time() - meta.get("checked_at", 0) >= self.check_interval
+
+    def due_symbols(self) -> List[str]:
+        self.load()
+        return [symbol for symbol in list(self._meta) if self.check_due(symbol)]
+
+    def is_current(self, symbol: str, report: Optional[str]) -> bool:
+        """True when stored statements already include the given last report date
+
+        Without a report date there is nothing to compare, so the last pull
+        counts as current until it is unreported_ttl old.
+        """
+        self.load()
+        meta = self._meta.get(symbol.upper())
+        if meta is None:
+            return False
+        if report is None:
+            return time.time() - meta.get("refreshed_at", 0) < self.unreported_ttl
+        return meta.get("report") == report
+
+    def mark_checked(self, symbol: str, quote: Optional[Dict[str, float]] = None):
+        """Record an upstream check that found no new report, refreshing the quote snapshot"""
+        symbol = symbol.upper()
+        with self._lock:
+            self._meta[symbol]["checked_at"] = time.time()
+            if quote is not None:
+                self._quotes[symbol] = quote
+                self.version += 1
+            self._dirty = True
+            self.unchanged_checks += 1
+
+    def update(self, symbol: str, statements: Dict[str, pd.DataFrame], report: Optional[str], quote: Optional[Dict[str, float]] = None):
+        """Replace every stored statement of symbol with freshly pulled ones"""
+        self.load()
+        symbol = symbol.upper()
+        rows = {statement: normalize_statement(symbol, statements.get(statement)) for statement in STATEMENT_TYPES}
+        now = time.time()
+        with self._lock:
+            for statement, frame in rows.items():
+                self._rows[statement][symbol] = frame
+                self._tables.pop(statement, None)
+            if quote is not None:
+                self._quotes[symbol] = quote
+            self._meta[symbol] = {"report": report, "refreshed_at": now, "checked_at": now}
+            self._dirty = True
+            self.version += 1
+            self.statements_version += 1
+            self.refreshes += 1
+
+    def table(self, statement: str) -> pd.DataFrame:
+        """Wide table of one statement type for every stored symbol"""
+        self.load()
+        with self._lock:
+            table = self._tables.get(statement)
+            if table is None:
+                frames = [frame for frame in self._rows[statement].values() if not frame.empty]
+                if frames:
+                    table = pd.concat(frames).sort_index()
+                else:
+                    table = normalize_statement("", None)
+                self._tables[statement] = table
+            return table
+
+    def statement(self, symbol: str, statement: str) -> pd.DataFrame:
+        """One symbol's statement in yfinance orientation (line items x periods)"""
+        self.load()
+        return denormalize_statement(self._rows[statement].get(symbol.upper()))
+
+    def quotes(self) -> pd.DataFrame:
+        """Quote snapshot taken at each check, one row per symbol"""
+        self.load()
+        with self._lock:
+            return pd.DataFrame.from_dict(self._quotes, orient="index", dtype="float64")
+
+    def symbols(self) -> List[str]:
+        self.load()
+        return sorted(self._meta)
+
+    def flush(self, force: bool = False):
+        """Persist tables and metadata; rate-limited to FLUSH_INTERVAL unless forced"""
+        if not self._dirty or (not force and time.time() - self._flushed_at < FLUSH_INTERVAL):
+            return
+        with self._lock:
+            self._dirty = False
+            self._flushed_at = time.time()
+            tables = {statement: self.table(statement) for statement in STATEMENT_TYPES}
+            meta = {"symbols": dict(self._meta), "quotes": dict(self._quotes)}
+        os.makedirs(self.root, exist_ok=True)
+        for statement, table in tables.items():
+            tmp = os.path.join(self.root, f"{statement}.tmp.pkl")
+            table.to_pickle(tmp)
+            os.replace(tmp, os.path.join(self.root, f"{statement}.pkl"))
+        tmp = os.path.join(self.root, "meta.tmp.json")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.root, "meta.json"))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get fundamentals warehouse statistics"""
+        self.load()
+        return {
+            "symbols": len(self._meta),
+            "rows": {statement: int(sum(len(frame) for frame in self._rows[statement].values())) for statement in STATEMENT_TYPES},
+            "refreshes": self.refreshes,
+            "unchanged_checks": self.unchanged_checks,
+            "check_interval_seconds": self.check_interval,
+            "pending_write": self._dirty,
+        }
+
+    def clear(self, symbol: Optional[str] = None) -> int:
+        """Drop stored statements for symbol, or everything; returns symbols removed"""
+        self.load()
+        with self._lock:
+            symbols = list(self._meta) if symbol is None else [symbol.upper()] if symbol.upper() in self._meta else []
+            for item in symbols:
+                del self._meta[item]
+                self._quotes.pop(item, None)
+                for rows in self._rows.values():
+                    rows.pop(item, None)
+            if symbols:
+                self._tables.clear()
+                self._dirty = True
+                self.version += 1
+                self.statements_version += 1
+        self.flush(force=True)
+        return len(symbols)
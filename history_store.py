@@ -0,0 +1,332 @@
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+# On-disk OHLCV store: one memory-mappable structured .npy file per symbol/interval
+HISTORY_STORE_DIR = os.getenv(
+    "YF_HISTORY_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".history_store")
+)
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+BAR_DTYPE = np.dtype([
+    ("ts", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+
+# Periods ordered by how far back they reach; only compared directly for the
+# trading-day periods, which have no calendar start
+PERIOD_RANK = {
+    "1d": 0, "5d": 1, "1mo": 2, "3mo": 3, "6mo": 4, "ytd": 5,
+    "1y": 6, "2y": 7, "5y": 8, "10y": 9, "max": 10,
+}
+
+PERIOD_OFFSETS = {
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+
+# Relative tolerance when checking that stored bars still match upstream
+ADJUSTMENT_TOLERANCE = 1e-4
+
+# Bar series kept in memory so repeated requests skip the disk read
+HISTORY_MEMORY_SERIES = int(os.getenv("YF_HISTORY_MEMORY_SERIES", "256"))
+
+
+def period_covers(stored_period: Optional[str], period: str, now: Optional[pd.Timestamp] = None) -> bool:
+    """Check whether a series fetched for stored_period also spans period
+
+    Calendar periods are compared by start date, since ytd reaches back
+    less far than 1mo in early January and further than 6mo by July.
+    """
+    if stored_period not in PERIOD_RANK or period not in PERIOD_RANK:
+        return False
+    if stored_period in (period, "max"):
+        return True
+    stored_start = period_start(stored_period, now=now)
+    if stored_start is None or period == "max":
+        return PERIOD_RANK[stored_period] >= PERIOD_RANK[period]
+    start = period_start(period, now=now)
+    if start is None:
+        # Allow for weekends and a holiday when counting back trading days
+        now = pd.Timestamp.now() if now is None else now
+        start = now.normalize() - pd.Timedelta(days=int(period[:-1]) * 7 // 5 + 4)
+    return stored_start <= start
+
+
+def period_start(period: str, tz: Optional[str] = None, now: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """Get the calendar start of a period, or None for trading-day periods and max"""
+    now = pd.Timestamp.now(tz=tz) if now is None else now
+    if period == "ytd":
+        return now.normalize().replace(month=1, day=1)
+    if period in PERIOD_OFFSETS:
+        return now.normalize() - PERIOD_OFFSETS[period]
+    return None
+
+
+def slice_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    """Cut a bar series down to the window a yfinance period request would return"""
+    if df.empty or period == "max":
+        return df
+
+    if period.endswith("d") and period[:-1].isdigit():
+        # Day periods count trading days, not calendar days
+        days = int(period[:-1])
+        dates = df.index.normalize().unique()
+        return df[df.index >= dates[-days:][0]]
+
+    start = period_start(period, df.index.tz)
+    if start is None:
+        return df
+    return df[df.index >= start]
+
+
+def page_before(df: pd.DataFrame, before: Optional[int], size: int) -> Tuple[pd.DataFrame, bool]:
+    """Get the newest size bars stamped before the bar at before (epoch ns), oldest first, and whether older bars remain"""
+    end = len(df) if before is None else int(np.searchsorted(df.index.asi8, before, side="left"))
+    start = max(end - size, 0)
+    return df.iloc[start:end], start > 0
+
+
+def frame_to_bars(df: pd.DataFrame) -> np.ndarray:
+    """Convert a yfinance history frame into a structured bar array"""
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    index = df.index
+    if index.tz is not None:
+        index = index.tz_convert("UTC")
+    bars["ts"] = index.asi8
+    bars["open"] = df["Open"].to_numpy(dtype="f8")
+    bars["high"] = df["High"].to_numpy(dtype="f8")
+    bars["low"] = df["Low"].to_numpy(dtype="f8")
+    bars["close"] = df["Close"].to_numpy(dtype="f8")
+    bars["volume"] = df["Volume"].to_numpy(dtype="f8") if "Volume" in df else 0.0
+    return bars
+
+
+def bars_to_frame(bars: np.ndarray, tz: Optional[str]) -> pd.DataFrame:
+    """Convert a structured bar array back into a yfinance-shaped frame"""
+    index = pd.DatetimeIndex(bars["ts"].astype("datetime64[ns]"), name="Date")
+    if tz:
+        index = index.tz_localize("UTC").tz_convert(tz)
+    return pd.DataFrame({
+        "Open": bars["open"],
+        "High": bars["high"],
+        "Low": bars["low"],
+        "Close": bars["close"],
+        "Volume": bars["volume"],
+    }, index=index)
+
+
+def merge_bars(stored: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
+    """Merge fresh bars into a stored series; fresh bars win on duplicate timestamps"""
+    if stored is None or stored.empty:
+        return fresh[BAR_COLUMNS].sort_index()
+    if fresh.empty:
+        return stored
+    fresh = fresh[BAR_COLUMNS]
+    if stored.index.tz is not None and fresh.index.tz is not None:
+        fresh = fresh.tz_convert(stored.index.tz)
+    merged = pd.concat([stored, fresh])
+    merged = merged[~merged.index.duplicated(keep="last")]
+    return merged.sort_index()
+
+
+def adjustments_changed(stored: pd.DataFrame, fresh: pd.DataFrame) -> bool:
+    """Detect split/dividend re-adjustment by comparing closes on overlapping bars"""
+    overlap = stored.index.intersection(fresh.index)
+    if len(overlap) < 2:
+        return False
+    # The newest overlapping bar may still be forming, so compare the ones before it
+    overlap = overlap[:-1]
+    old = stored.loc[overlap, "Close"].to_numpy(dtype="f8")
+    new = fresh.loc[overlap, "Close"].to_numpy(dtype="f8")
+    return not np.allclose(old, new, rtol=ADJUSTMENT_TOLERANCE, equal_nan=True)
+
+
+class HistoryStore:
+    """Persist OHLCV bars per (symbol, interval) so history survives restarts
+
+    The most recently used series are also held in memory, so a repeated
+    request only costs a slice unless new bars have to be fetched.
+    """
+
+    def __init__(self, root: str = HISTORY_STORE_DIR, memory_series: int = HISTORY_MEMORY_SERIES):
+        self.root = root
+        self.memory_series = memory_series
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[pd.DataFrame, Dict[str, Any]]]" = OrderedDict()
+        self._fetched_at: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        # Held across each read-merge-write, so concurrent fetches of one series cannot drop each other's bars
+        self._series_locks: Dict[Tuple[str, str], threading.RLock] = {}
+        # Bumped on every write, so derived data can tell when any series changed
+        self.version = 0
+        # Store version of each series' last write, and how many clears there have been
+        self._versions: Dict[Tuple[str, str], int] = {}
+        self._clears = 0
+        self.fetches = {"full": 0, "head": 0, "tail": 0}
+        self.bars_fetched = 0
+        self.memory_hits = 0
+        self.disk_reads = 0
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, quote(symbol.upper(), safe=""), interval)
+
+    def _series_lock(self, symbol: str, interval: str) -> threading.RLock:
+        with self._lock:
+            return self._series_locks.setdefault((symbol.upper(), interval), threading.RLock())
+
+    def _remember(self, key: Tuple[str, str], df: pd.DataFrame, meta: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = (df, meta)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_series:
+                self._memory.popitem(last=False)
+
+    def load(self, symbol: str, interval: str) -> Tuple[Optional[pd.DataFrame], Dict[str, Any]]:
+        """Get (series, metadata) from memory or disk; series is None if nothing is stored"""
+        key = (symbol.upper(), interval)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0], dict(entry[1])
+
+        directory = self._dir(symbol, interval)
+        try:
+            with open(os.path.join(directory, "meta.json"), "r") as f:
+                meta = json.load(f)
+            bars = np.load(os.path.join(directory, "bars.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None, {}
+        self.disk_reads += 1
+        df = bars_to_frame(bars, meta.get("tz"))
+        self._remember(key, df, meta)
+        return df, dict(meta)
+
+    def fetched_at(self, symbol: str, interval: str) -> Optional[float]:
+        """Get when a stored series was last refreshed, or None if nothing is stored, without loading its bars"""
+        key = (symbol.upper(), interval)
+        if key not in self._fetched_at:
+            try:
+                with open(os.path.join(self._dir(symbol, interval), "meta.json"), "r") as f:
+                    self._fetched_at[key] = json.load(f).get("fetched_at", 0)
+            except (OSError, ValueError):
+                return None
+        return self._fetched_at[key]
+
+    def series_version(self, symbol: str, interval: str) -> Tuple[int, int]:
+        """A value that changes whenever the stored series for symbol/interval may have, without loading it"""
+        return self._versions.get((symbol.upper(), interval), 0), self._clears
+
+    def meta(self, symbol: str, interval: str) -> Dict[str, Any]:
+        """Get stored metadata (period, tz, fetched_at) or an empty dict, reading only meta.json if the series is not in memory"""
+        key = (symbol.upper(), interval)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                return dict(entry[1])
+        try:
+            with open(os.path.join(self._dir(symbol, interval), "meta.json"), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def read(self, symbol: str, interval: str) -> Optional[pd.DataFrame]:
+        """Load the stored series for symbol/interval, or None if nothing is stored"""
+        return self.load(symbol, interval)[0]
+
+    def write(self, symbol: str, interval: str, df: pd.DataFrame, period: Optional[str] = None, refreshed: bool = True):
+        """Atomically replace the stored series
+
+        refreshed marks the series as up to date with upstream; backfilling
+        older bars passes False so the tail is still checked for new bars.
+        """
+        with self._series_lock(symbol, interval):
+            df = df[BAR_COLUMNS]
+            directory = self._dir(symbol, interval)
+            meta = self.meta(symbol, interval)
+            if period is not None and not period_covers(meta.get("period"), period):
+                meta["period"] = period
+            meta["tz"] = str(df.index.tz) if df.index.tz is not None else None
+            if refreshed or "fetched_at" not in meta:
+                meta["fetched_at"] = time.time() if refreshed else 0
+            meta["count"] = len(df)
+
+            with self._lock:
+                os.makedirs(directory, exist_ok=True)
+                bars_tmp = os.path.join(directory, "bars.tmp.npy")
+                meta_tmp = os.path.join(directory, "meta.tmp.json")
+                np.save(bars_tmp, frame_to_bars(df))
+                with open(meta_tmp, "w") as f:
+                    json.dump(meta, f)
+                os.replace(bars_tmp, os.path.join(directory, "bars.npy"))
+                os.replace(meta_tmp, os.path.join(directory, "meta.json"))
+                self._fetched_at[(symbol.upper(), interval)] = meta["fetched_at"]
+                self.version += 1
+                self._versions[(symbol.upper(), interval)] = self.version
+            self._remember((symbol.upper(), interval), df, meta)
+
+    def append(self, symbol: str, interval: str, fresh: pd.DataFrame, period: Optional[str] = None, refreshed: bool = True) -> pd.DataFrame:
+        """Merge fresh bars into the stored series, persist it and return the result"""
+        with self._series_lock(symbol, interval):
+            merged = merge_bars(self.read(symbol, interval), fresh)
+            if not merged.empty:
+                self.write(symbol, interval, merged, period, refreshed)
+        return merged
+
+    def record_fetch(self, kind: str, bars: int):
+        """Count an upstream history fetch of the given kind (full, head or tail)"""
+        self.fetches[kind] += 1
+        self.bars_fetched += bars
+
+    def stats(self) -> Dict[str, Any]:
+        """Get history store statistics"""
+        return {
+            "series_in_memory": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_reads": self.disk_reads,
+            "fetches": dict(self.fetches),
+            "bars_fetched": self.bars_fetched,
+        }
+
+    def clear(self, symbol: Optional[str] = None) -> int:
+        """Delete stored series for symbol, or everything; returns intervals removed"""
+        with self._lock:
+            self.version += 1
+            self._clears += 1
+            if symbol is None:
+                self._memory.clear()
+                self._fetched_at.clear()
+            else:
+                for key in [key for key in self._memory if key[0] == symbol.upper()]:
+                    del self._memory[key]
+                for key in [key for key in self._fetched_at if key[0] == symbol.upper()]:
+                    del self._fetched_at[key]
+            if symbol is None:
+                targets = [os.path.join(self.root, name) for name in os.listdir(self.root)] if os.path.isdir(self.root) else []
+            else:
+                targets = [os.path.join(self.root, quote(symbol.upper(), safe=""))]
+            removed = 0
+            for target in targets:
+                if os.path.isdir(target):
+                    removed += len(os.listdir(target))
+                    shutil.rmtree(target, ignore_errors=True)
+            return removed
@@ -0,0 +1,78 @@
+"""One pooled keep-alive HTTP session for every yfinance request
+
+yfinance keeps its Yahoo cookie and crumb on whichever session it was last
+handed, and yf.download() creates a fresh session on every call unless given
+one, which throws both away along with any open connections. Passing this
+session to every Ticker, download and Search keeps one cookie/crumb and warm
+TLS connections for the life of the server.
+
+curl keeps one connection cache per handle, and the session keeps one handle
+per thread, so each dispatcher thread holds up to HTTP_POOL_SIZE idle
+connections.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from curl_cffi import CurlInfo, CurlOpt
+from curl_cffi.requests import Session
+
+HTTP_POOL_SIZE = int(os.getenv("YF_HTTP_POOL_SIZE", "10"))
+HTTP_IMPERSONATE = "chrome"
+
+
+class PooledSession(Session):
+    """curl_cffi session with a bounded keep-alive pool that counts new and reused connections"""
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, **kwargs):
+        kwargs.setdefault("impersonate", HTTP_IMPERSONATE)
+        curl_options = dict(kwargs.pop("curl_options", None) or {})
+        curl_options.update({CurlOpt.MAXCONNECTS: pool_size, CurlOpt.TCP_KEEPALIVE: 1})
+        curl_infos = list(kwargs.pop("curl_infos", None) or [])
+        super().__init__(curl_options=curl_options, curl_infos=curl_infos + [CurlInfo.NUM_CONNECTS], **kwargs)
+        self.pool_size = pool_size
+        self._stats_lock = threading.Lock()
+        self._threads = set()
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.errors = 0
+        self.crumb_fetches = 0
+        self.request_seconds = 0.0
+
+    def request(self, method, url, *args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except Exception:
+            with self._stats_lock:
+                self.errors += 1
+            raise
+        elapsed = time.perf_counter() - start_time
+        connects = response.infos.get(CurlInfo.NUM_CONNECTS, 0)
+        with self._stats_lock:
+            self._threads.add(threading.get_ident())
+            self.requests += 1
+            self.request_seconds += elapsed
+            self.new_connections += connects
+            if not connects:
+                self.reused_connections += 1
+            if "getcrumb" in str(url):
+                self.crumb_fetches += 1
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Get request and connection reuse statistics"""
+        with self._stats_lock:
+            return {
+                "pool_size_per_thread": self.pool_size,
+                "threads": len(self._threads),
+                "requests": self.requests,
+                "errors": self.errors,
+                "new_connections": self.new_connections,
+                "reused_connections": self.reused_connections,
+                "reuse_rate": round(self.reused_connections / self.requests, 3) if self.requests else 0,
+                "crumb_fetches": self.crumb_fetches,
+                "avg_request_ms": round(self.request_seconds / self.requests * 1000, 1) if self.requests else 0,
+            }
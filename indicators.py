@@ -0,0 +1,142 @@
+"""Technical indicators computed over whole bar series
+
+Every indicator is a few vectorized pandas/numpy operations over the close
+(or high/low) column. The same functions accept a DataFrame with one column
+per symbol, which is how the screener computes RSI and MACD for a whole
+universe at once.
+"""
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from options import DEFAULT_INDICATORS
+from resampling import INTERVAL_SECONDS
+
+Series = Union[pd.Series, pd.DataFrame]
+
+# Regular session length used to annualize intraday volatility
+SESSION_SECONDS = 6.5 * 3600
+TRADING_DAYS = 252
+
+
+def sma(close: Series, window: int) -> Series:
+    return close.rolling(window).mean()
+
+
+def ema(close: Series, span: int) -> Series:
+    return close.ewm(span=span, adjust=False).mean()
+
+
+def wilder(values: Series, period: int) -> Series:
+    """Wilder's smoothing, the moving average RSI and ATR are defined with"""
+    return values.ewm(alpha=1 / period, adjust=False).mean()
+
+
+def rsi(close: Series, period: int = 14) -> Series:
+    change = close.diff()
+    gain = wilder(change.clip(lower=0), period)
+    loss = wilder(-change.clip(upper=0), period)
+    # No losses in the window gives gain / 0 = inf, i.e. an RSI of 100
+    return 100 - 100 / (1 + gain / loss)
+
+
+def macd(close: Series, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[Series, Series]:
+    """MACD line and its signal line"""
+    line = ema(close, fast) - ema(close, slow)
+    return line, ema(line, signal)
+
+
+def true_range(bars: pd.DataFrame) -> pd.Series:
+    previous = bars["Close"].shift()
+    return pd.concat([bars["High"] - bars["Low"], (bars["High"] - previous).abs(), (bars["Low"] - previous).abs()], axis=1).max(axis=1)
+
+
+def periods_per_year(interval: str) -> float:
+    seconds = INTERVAL_SECONDS.get(interval, 86400)
+    if seconds < 86400:
+        return TRADING_DAYS * SESSION_SECONDS / seconds
+    return TRADING_DAYS * 86400 / seconds if seconds < 7 * 86400 else 365 * 86400 / seconds
+
+
+def _bollinger(bars: pd.DataFrame, window: int, width: float) -> Dict[str, pd.Series]:
+    middle = sma(bars["Close"], window)
+    deviation = bars["Close"].rolling(window).std(ddof=0)
+    return {"upper": middle + width * deviation, "middle": middle, "lower": middle - width * deviation}
+
+
+def _macd(bars: pd.DataFrame, fast: int, slow: int, signal: int) -> Dict[str, pd.Series]:
+    line, signal_line = macd(bars["Close"], fast, slow, signal)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+
+
+def _volatility(bars: pd.DataFrame, window: int, interval: str) -> Dict[str, pd.Series]:
+    returns = np.log(bars["Close"]).diff()
+    return {"volatility": returns.rolling(window).std() * np.sqrt(periods_per_year(interval)) * 100}
+
+
+def _drawdown(bars: pd.DataFrame) -> Dict[str, pd.Series]:
+    drawdown = (bars["Close"] / bars["Close"].cummax() - 1) * 100
+    return {"drawdown": drawdown, "max_drawdown": drawdown.cummin()}
+
+
+# name -> (compute(bars, *params, interval), default params)
+INDICATORS = {
+    "sma": (lambda bars, window, interval: {"sma": sma(bars["Close"], window)}, (20,)),
+    "ema": (lambda bars, span, interval: {"ema": ema(bars["Close"], span)}, (20,)),
+    "rsi": (lambda bars, period, interval: {"rsi": rsi(bars["Close"], period)}, (14,)),
+    "macd": (lambda bars, fast, slow, signal, interval: _macd(bars, fast, slow, signal), (12, 26, 9)),
+    "bollinger": (lambda bars, window, width, interval: _bollinger(bars, window, width), (20, 2.0)),
+    "atr": (lambda bars, period, interval: {"atr": wilder(true_range(bars), period)}, (14,)),
+    "volatility": (lambda bars, window, interval: _volatility(bars, window, interval), (20,)),
+    "drawdown": (lambda bars, interval: _drawdown(bars), ()),
+    "levels": (lambda bars, window, interval: {
+        "support": bars["Low"].rolling(window).min(),
+        "resistance": bars["High"].rolling(window).max(),
+    }, (20,)),
+}
+
+
+def parse_indicator(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """Parse 'name' or 'name:param,param' into (name, params) with defaults filled in"""
+    name, _, args = spec.partition(":")
+    name = name.strip().lower()
+    if name not in INDICATORS:
+        raise ValueError(f"Unknown indicator: {name} (expected one of {', '.join(INDICATORS)})")
+    defaults = INDICATORS[name][1]
+    try:
+        params = tuple(float(arg) for arg in args.split(",")) if args.strip() else ()
+    except ValueError:
+        raise ValueError(f"Indicator parameters must be numbers: {spec}")
+    if len(params) > len(defaults):
+        raise ValueError(f"{name} takes at most {len(defaults)} parameters: {spec}")
+    params = params + tuple(float(value) for value in defaults[len(params):])
+    if any(value <= 0 for value in params):
+        raise ValueError(f"Indicator parameters must be positive: {spec}")
+    return name, params
+
+
+def indicator_label(name: str, params: Tuple[float, ...]) -> str:
+    return f"{name}:{','.join(format(value, 'g') for value in params)}" if params else name
+
+
+def compute_indicator(bars: pd.DataFrame, name: str, params: Tuple[float, ...], interval: str = "1d") -> Dict[str, np.ndarray]:
+    """Compute one indicator over bars; returns component name -> values aligned with the bars"""
+    compute, defaults = INDICATORS[name]
+    # Window lengths are whole bars; only a Bollinger width may be fractional
+    args = [value if isinstance(default, float) else int(value) for value, default in zip(params, defaults)]
+    return {component: values.to_numpy(dtype="float64") for component, values in compute(bars, *args, interval).items()}
+
+
+def summarize(components: Dict[str, np.ndarray], points: int, dates: List[str]) -> Dict[str, Any]:
+    """Latest value of every component, plus the trailing points values (dated by dates) when more than one is asked for"""
+    summary: Dict[str, Any] = {
+        component: None if np.isnan(values[-1]) else float(values[-1]) for component, values in components.items()
+    }
+    if points > 1:
+        series: Dict[str, Any] = {"date": dates}
+        for component, values in components.items():
+            tail = values[-points:]
+            series[component] = [None if np.isnan(value) else float(value) for value in tail]
+        summary["series"] = series
+    return summary
@@ -0,0 +1,124 @@
+"""Queue-based logging: request paths only enqueue records, a listener thread formats and writes them
+
+configure_logging() puts a single QueueHandler on the root logger. A log call
+costs a level check and, if enabled, a queue put; interpolating the message
+(logging's lazy %-style arguments), JSON encoding and file and stderr writes
+all happen on the QueueListener thread. Records carry the id and tool of the
+request they were logged under, including from dispatcher threads.
+"""
+import itertools
+import json
+import logging
+import os
+import queue
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.getenv("YF_LOG_LEVEL", "INFO")
+# Per-logger overrides, e.g. "yfinance=WARNING,afinance_server.access=WARNING"
+LOG_LEVELS = os.getenv("YF_LOG_LEVELS", "")
+LOG_FILE = os.getenv("YF_LOG_FILE", "yfinance_server.log")
+LOG_MAX_BYTES = int(os.getenv("YF_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("YF_LOG_BACKUPS", "5"))
+LOG_FORMAT = os.getenv("YF_LOG_FORMAT", "text")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Fields of the request being served ({"request_id": ..., "tool": ...}), copied onto every record logged under it
+request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_context", default=None)
+
+_request_ids = itertools.count(1)
+
+# Attributes every LogRecord has; anything else on a record was passed as extra
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+def new_request_id() -> str:
+    return f"{os.getpid():x}-{next(_request_ids)}"
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "logger=LEVEL,..." into {logger: LEVEL}"""
+    levels = {}
+    for part in spec.split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class ContextQueueHandler(QueueHandler):
+    """Enqueue records as they are, tagged with the current request, leaving formatting to the listener"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        context = request_context.get()
+        if context:
+            for key, value in context.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    """The usual text line, with the request id and tool appended when there is one"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        if request_id is None:
+            return line
+        return f"{line} [{request_id} {getattr(record, 'tool', '')}]"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including request fields and any extra= values such as timings"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(
+    level: str = LOG_LEVEL,
+    levels: str = LOG_LEVELS,
+    path: str = LOG_FILE,
+    max_bytes: int = LOG_MAX_BYTES,
+    backups: int = LOG_BACKUPS,
+    fmt: str = LOG_FORMAT,
+    stream: bool = True,
+) -> QueueListener:
+    """Route all logging through a queue to stderr and a size-rotated file; call stop() on the result at exit"""
+    if fmt not in ("text", "json"):
+        raise ValueError(f"Unknown log format: {fmt} (expected text or json)")
+    formatter = JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT)
+    handlers = []
+    if stream:
+        handlers.append(logging.StreamHandler())
+    if path:
+        handlers.append(RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(ContextQueueHandler(log_queue))
+    root.setLevel(level.upper())
+    for name, logger_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
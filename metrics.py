@@ -0,0 +1,275 @@
+"""Per-tool latency, throughput, error and payload metrics
+
+Every call_tool invocation is timed end to end. Executions (coalesced
+duplicates share one) are also split into phases: upstream (waiting on
+Yahoo, including retries and rate limit queueing), serialize (rendering the
+response) and transform (everything else: pandas work, cache and store
+access). Overlapping spans of one phase, e.g. 50 concurrent info fetches,
+count once, so the phases of an execution add up to its wall time.
+
+snapshot() backs the get_server_metrics tool; prometheus() renders the same
+data in the Prometheus text exposition format, which the server can also
+write to YF_METRICS_TEXTFILE for a node_exporter textfile collector.
+"""
+import bisect
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+METRICS_TEXTFILE = os.getenv("YF_METRICS_TEXTFILE", "")
+METRICS_INTERVAL = float(os.getenv("YF_METRICS_INTERVAL", "15"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+PHASES = ("upstream", "transform", "serialize")
+
+# (labels, value) samples of one metric family
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+class Histogram:
+    """Fixed-bucket histogram; bucket i counts observations <= bounds[i], the last one everything above"""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - cumulative) / n, self.max)
+            cumulative += n
+        return self.max
+
+    def summary(self, scale: float = 1000.0) -> Dict[str, Any]:
+        """Count, mean, percentiles and max, scaled (by default seconds to milliseconds)"""
+        return {
+            "count": self.count,
+            "avg": round(self.sum / self.count * scale, 2) if self.count else 0,
+            "p50": round(self.quantile(0.5) * scale, 2),
+            "p95": round(self.quantile(0.95) * scale, 2),
+            "p99": round(self.quantile(0.99) * scale, 2),
+            "max": round(self.max * scale, 2),
+        }
+
+
+class CallTimer:
+    """Wall time one tool execution spends in each phase; overlapping spans of a phase count once"""
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.start = time.perf_counter()
+        self.seconds: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self._active: Dict[str, int] = {}
+        self._since: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if not self._active.get(name):
+            self._since[name] = time.perf_counter()
+        self._active[name] = self._active.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            self._active[name] -= 1
+            if not self._active[name]:
+                self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - self._since[name]
+
+    def phases(self, total: float) -> Dict[str, float]:
+        """Split total seconds into PHASES, transform taking whatever upstream and serialize did not"""
+        upstream = self.seconds.get("upstream", 0.0)
+        serialize = self.seconds.get("serialize", 0.0)
+        return {"upstream": upstream, "transform": max(total - upstream - serialize, 0.0), "serialize": serialize}
+
+
+# Timer of the tool execution running in the current task, if any
+current_call: contextvars.ContextVar = contextvars.ContextVar("current_call", default=None)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Attribute the enclosed time to a phase of the current tool execution (no-op outside one)"""
+    call = current_call.get()
+    if call is None:
+        yield
+        return
+    with call.phase(phase):
+        yield
+
+
+class ToolMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.executed = 0
+        self.errors: Dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.latency = Histogram()
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.payload = Histogram(PAYLOAD_BUCKETS)
+
+
+class Metrics:
+    """Registry of per-tool metrics, updated from the event loop"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.tools: Dict[str, ToolMetrics] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _tool(self, tool: str) -> ToolMetrics:
+        metrics = self.tools.get(tool)
+        if metrics is None:
+            metrics = self.tools[tool] = ToolMetrics()
+        return metrics
+
+    def begin(self, tool: str):
+        """A client call started"""
+        metrics = self._tool(tool)
+        metrics.in_flight += 1
+        metrics.max_in_flight = max(metrics.max_in_flight, metrics.in_flight)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end(self, tool: str, seconds: float, payload_bytes: int, error: Optional[str] = None):
+        """A client call finished after seconds with a response of payload_bytes"""
+        metrics = self._tool(tool)
+        metrics.in_flight -= 1
+        self.in_flight -= 1
+        metrics.calls += 1
+        metrics.latency.observe(seconds)
+        metrics.payload.observe(payload_bytes)
+        if error:
+            metrics.errors[error] = metrics.errors.get(error, 0) + 1
+
+    def record_execution(self, call: CallTimer):
+        """A tool execution finished; coalesced duplicate calls share its phases"""
+        metrics = self._tool(call.tool)
+        metrics.executed += 1
+        for phase, seconds in call.phases(time.perf_counter() - call.start).items():
+            metrics.phases[phase].observe(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get per-tool latency, phase, error, payload and concurrency statistics"""
+        uptime = max(time.time() - self.started_at, 1e-9)
+        tools = {}
+        for tool, metrics in sorted(self.tools.items()):
+            errors = sum(metrics.errors.values())
+            tools[tool] = {
+                "calls": metrics.calls,
+                "executed": metrics.executed,
+                "coalesced": max(metrics.calls - metrics.executed, 0),
+                "calls_per_second": round(metrics.calls / uptime, 3),
+                "errors": errors,
+                "error_rate": round(errors / metrics.calls, 4) if metrics.calls else 0,
+                "errors_by_type": dict(metrics.errors),
+                "in_flight": metrics.in_flight,
+                "max_in_flight": metrics.max_in_flight,
+                "latency_ms": metrics.latency.summary(),
+                "phases_ms": {phase: histogram.summary() for phase, histogram in metrics.phases.items()},
+                "payload_bytes": {
+                    "total": int(metrics.payload.sum),
+                    "avg": round(metrics.payload.sum / metrics.payload.count) if metrics.payload.count else 0,
+                    "p95": round(metrics.payload.quantile(0.95)),
+                    "max": int(metrics.payload.max),
+                },
+            }
+        calls = sum(metrics.calls for metrics in self.tools.values())
+        return {
+            "uptime_seconds": round(uptime, 1),
+            "calls": calls,
+            "calls_per_second": round(calls / uptime, 3),
+            "errors": sum(sum(metrics.errors.values()) for metrics in self.tools.values()),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "tools": tools,
+        }
+
+    def prometheus(self, gauges: Optional[Dict[str, Tuple[str, Samples]]] = None) -> str:
+        """Render the metrics, plus extra gauges {name: (help, samples)}, in the Prometheus text format"""
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def sample(name: str, labels: Dict[str, str], value: float):
+            rendered = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{rendered}}} {_number(value)}" if rendered else f"{name} {_number(value)}")
+
+        def histogram(name: str, labels: Dict[str, str], values: Histogram):
+            cumulative = 0
+            for bound, count in zip(values.bounds + (float("inf"),), values.counts):
+                cumulative += count
+                sample(f"{name}_bucket", {**labels, "le": _number(bound)}, cumulative)
+            sample(f"{name}_sum", labels, values.sum)
+            sample(f"{name}_count", labels, values.count)
+
+        tools = sorted(self.tools.items())
+        family("yf_tool_calls_total", "counter", "Tool calls received")
+        for tool, metrics in tools:
+            sample("yf_tool_calls_total", {"tool": tool}, metrics.calls)
+        family("yf_tool_executions_total", "counter", "Tool executions (identical concurrent calls share one)")
+        for tool, metrics in tools:
+            sample("yf_tool_executions_total", {"tool": tool}, metrics.executed)
+        family("yf_tool_errors_total", "counter", "Tool calls answered with an error")
+        for tool, metrics in tools:
+            for error, count in sorted(metrics.errors.items()):
+                sample("yf_tool_errors_total", {"tool": tool, "error_type": error}, count)
+        family("yf_tool_in_flight", "gauge", "Tool calls currently running")
+        for tool, metrics in tools:
+            sample("yf_tool_in_flight", {"tool": tool}, metrics.in_flight)
+        family("yf_tool_latency_seconds", "histogram", "End-to-end tool call latency")
+        for tool, metrics in tools:
+            histogram("yf_tool_latency_seconds", {"tool": tool}, metrics.latency)
+        family("yf_tool_phase_seconds", "histogram", "Time per tool execution spent upstream, transforming and serializing")
+        for tool, metrics in tools:
+            for phase, values in metrics.phases.items():
+                histogram("yf_tool_phase_seconds", {"tool": tool, "phase": phase}, values)
+        family("yf_tool_response_bytes", "histogram", "Tool response payload size")
+        for tool, metrics in tools:
+            histogram("yf_tool_response_bytes", {"tool": tool}, metrics.payload)
+
+        for name, (help_text, samples) in (gauges or {}).items():
+            family(name, "gauge", help_text)
+            for labels, value in samples:
+                sample(name, labels, value)
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def write_textfile(path: str, text: str):
+    """Replace path with text atomically, so a collector never reads a partial file"""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temporary, path)
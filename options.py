@@ -0,0 +1,29 @@
+"""Option values shared by the tool schemas and the code behind them
+
+Kept free of pandas and yfinance so the MCP front end (server_app.py) can
+advertise the tools without importing the data stack.
+"""
+import os
+
+RESPONSE_FORMATS = ["pretty", "compact", "columnar", "csv"]
+DEFAULT_RESPONSE_FORMAT = os.getenv("YF_RESPONSE_FORMAT", "pretty")
+
+# Largest number of bars serialized into one get_historical_data response
+HISTORY_PAGE_SIZE = int(os.getenv("YF_HISTORY_PAGE_SIZE", "5000"))
+
+# Target interval -> pandas rule; bars are labelled with the start of their bucket like yfinance's
+RESAMPLE_RULES = {
+    "2m": "2min",
+    "5m": "5min",
+    "15m": "15min",
+    "30m": "30min",
+    "60m": "60min",
+    "90m": "90min",
+    "1h": "60min",
+    "1d": "1D",
+    "1wk": "W-MON",
+    "1mo": "MS",
+    "3mo": "QS",
+}
+
+DEFAULT_INDICATORS = ["sma:50", "sma:200", "rsi:14", "macd:12,26,9", "bollinger:20,2", "atr:14", "volatility:20", "drawdown"]
@@ -0,0 +1,201 @@
+"""Sampled cProfile and tracemalloc captures of tool executions
+
+Off by default. With YF_PROFILE_SAMPLE_RATE (or the set_profiling tool) at
+e.g. 0.01, one tool execution in a hundred is profiled: cProfile on the
+event loop thread, plus (before Python 3.12) a profile per blocking call the
+execution runs on the dispatcher pool, merged into one .prof file (open it
+with pstats or snakeviz), and a .txt summary of the slowest functions and the
+largest allocations still alive when the call finished. At most one execution
+is captured at a time; the profile also includes whatever other tasks (and,
+from 3.12, other pool threads) ran while it was active. The newest
+PROFILE_KEEP captures are kept.
+"""
+import cProfile
+import contextvars
+import io
+import itertools
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+PROFILE_SAMPLE_RATE = float(os.getenv("YF_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("YF_PROFILE_DIR", ".profiles")
+PROFILE_KEEP = int(os.getenv("YF_PROFILE_KEEP", "100"))
+PROFILE_TOOLS = [tool for tool in os.getenv("YF_PROFILE_TOOLS", "").split(",") if tool]
+PROFILE_TOP = 30
+# Before 3.12 cProfile hooks one thread, so pool work needs its own profiler. From 3.12 it is
+# built on sys.monitoring: the event loop's profiler already sees every thread, and enabling
+# a second one raises "Another profiling tool is already active"
+THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+class Capture:
+    """Profiles and allocation statistics of one sampled tool execution"""
+
+    def __init__(self, tool: str, arguments: Dict[str, Any]):
+        self.tool = tool
+        self.arguments = arguments
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+        self.loop_profile = cProfile.Profile()
+        self.thread_profiles: List[cProfile.Profile] = []
+        self.worker_calls = 0
+        self.allocations: List[tracemalloc.Statistic] = []
+        self.peak_bytes = 0
+        self.token: Optional[contextvars.Token] = None
+
+
+# Capture of the tool execution running in the current task, if it was sampled
+active_capture: contextvars.ContextVar = contextvars.ContextVar("active_capture", default=None)
+
+
+def profiled(func: Callable[[], Any]) -> Callable[[], Any]:
+    """Wrap a blocking call so it is profiled on its worker thread if the current execution is sampled"""
+    capture = active_capture.get()
+    if capture is None:
+        return func
+
+    def run():
+        capture.worker_calls += 1
+        if not THREAD_PROFILES:
+            return func()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            return func()
+        finally:
+            profile.disable()
+            capture.thread_profiles.append(profile)
+    return run
+
+
+class Profiler:
+    """Decide which tool executions to capture and write their profiles to a rotating directory"""
+
+    def __init__(
+        self,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        directory: str = PROFILE_DIR,
+        keep: int = PROFILE_KEEP,
+        tools: Optional[List[str]] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.keep = keep
+        self.tools = list(PROFILE_TOOLS if tools is None else tools)
+        self._active: Optional[Capture] = None
+        self._started_tracing = False
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self.captured = 0
+        self.skipped_busy = 0
+
+    def configure(self, sample_rate: Optional[float] = None, tools: Optional[List[str]] = None):
+        if sample_rate is not None:
+            if not 0 <= sample_rate <= 1:
+                raise ValueError(f"sample_rate must be between 0 and 1, got {sample_rate}")
+            self.sample_rate = sample_rate
+        if tools is not None:
+            self.tools = list(tools)
+
+    def start(self, tool: str, arguments: Dict[str, Any]) -> Optional[Capture]:
+        """Start capturing this execution if it is sampled; returns the capture or None"""
+        if self.sample_rate <= 0 or (self.tools and tool not in self.tools) or random.random() >= self.sample_rate:
+            return None
+        if self._active is not None:
+            self.skipped_busy += 1
+            return None
+        capture = Capture(tool, arguments)
+        try:
+            capture.loop_profile.enable()
+        except ValueError:
+            # Another profiler owns the interpreter, e.g. the server itself runs under cProfile
+            self.skipped_busy += 1
+            return None
+        self._active = capture
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        capture.token = active_capture.set(capture)
+        return capture
+
+    def stop(self, capture: Capture):
+        """Stop profiling and take the allocation snapshot; writing the files is left to write()"""
+        capture.loop_profile.disable()
+        capture.seconds = time.perf_counter() - capture.start
+        active_capture.reset(capture.token)
+        snapshot = tracemalloc.take_snapshot()
+        capture.peak_bytes = tracemalloc.get_traced_memory()[1]
+        if self._started_tracing:
+            tracemalloc.stop()
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        capture.allocations = snapshot.statistics("lineno")[:PROFILE_TOP]
+        self._active = None
+        self.captured += 1
+
+    def write(self, capture: Capture) -> str:
+        """Write the merged profile (.prof) and a readable summary (.txt); returns their path without extension"""
+        stats = pstats.Stats(capture.loop_profile)
+        for profile in capture.thread_profiles:
+            stats.add(profile)
+        tool = re.sub(r"[^A-Za-z0-9_-]", "_", capture.tool)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(capture.started_at))
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, f"{stamp}-{next(self._sequence):06d}-{tool}")
+        stats.dump_stats(base + ".prof")
+
+        report = io.StringIO()
+        report.write(f"tool: {capture.tool}\n")
+        report.write(f"arguments: {json.dumps(capture.arguments, sort_keys=True, default=str)}\n")
+        report.write(f"duration: {capture.seconds * 1000:.1f} ms\n")
+        report.write(f"worker thread calls: {capture.worker_calls}\n")
+        report.write(f"peak traced memory: {capture.peak_bytes / 1024:.1f} KiB\n\n")
+        report.write(f"Top {PROFILE_TOP} functions by cumulative time\n")
+        stats.stream = report
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        report.write(f"Top {PROFILE_TOP} allocations still alive at the end of the call\n")
+        for statistic in capture.allocations:
+            report.write(f"{statistic}\n")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+        self.rotate()
+        return base
+
+    def captures(self) -> List[str]:
+        """Names of the stored captures, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted({name.rsplit(".", 1)[0] for name in os.listdir(self.directory) if name.endswith((".prof", ".txt"))})
+
+    def rotate(self):
+        """Delete all but the newest keep captures"""
+        with self._lock:
+            names = self.captures()
+            for name in names[:max(len(names) - self.keep, 0)]:
+                for extension in (".prof", ".txt"):
+                    try:
+                        os.remove(os.path.join(self.directory, name + extension))
+                    except FileNotFoundError:
+                        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Get profiling configuration and counters"""
+        return {
+            "sample_rate": self.sample_rate,
+            "tools": self.tools or "all",
+            "directory": os.path.abspath(self.directory),
+            "keep": self.keep,
+            "captured": self.captured,
+            "skipped_while_busy": self.skipped_busy,
+            "recent_captures": self.captures()[-10:],
+        }
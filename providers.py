@@ -0,0 +1,424 @@
+"""Market data providers: live Yahoo Finance or recorded fixtures replayed from disk
+
+Select with YF_DATA_PROVIDER=yfinance (default) or YF_DATA_PROVIDER=fixture,
+with fixtures read from YF_FIXTURE_DIR. Fixtures can be recorded from Yahoo
+or generated synthetically:
+
+    python providers.py record AAPL MSFT --dir fixtures
+    python providers.py synth --count 500 --dir fixtures
+"""
+import abc
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from history_store import slice_period
+
+DATA_PROVIDER = os.getenv("YF_DATA_PROVIDER", "yfinance")
+FIXTURE_DIR = os.getenv(
+    "YF_FIXTURE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+)
+FIXTURE_LATENCY = float(os.getenv("YF_FIXTURE_LATENCY", "0"))
+
+FRAME_DATASETS = [
+    "income_stmt", "quarterly_income_stmt",
+    "balance_sheet", "quarterly_balance_sheet",
+    "cashflow", "quarterly_cashflow",
+    "recommendations",
+]
+SERIES_DATASETS = ["dividends", "splits"]
+JSON_DATASETS = ["info", "news"]
+
+
+class DataProvider(abc.ABC):
+    """Interface every market data backend implements
+
+    ticker() returns an object with the yfinance.Ticker attributes the
+    server reads: info, history(), the statement frames, dividends,
+    splits, news and recommendations.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def ticker(self, symbol: str):
+        """Get the yfinance.Ticker-like object for one symbol"""
+
+    @abc.abstractmethod
+    def download(self, symbols: List[str], period: str = "5d", interval: str = "1d") -> pd.DataFrame:
+        """Get OHLCV bars for many symbols with (field, symbol) column levels"""
+
+    @abc.abstractmethod
+    def search(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        """Get quote matches for a company name or ticker"""
+
+    def symbols(self) -> List[str]:
+        """Symbols this backend can list without a query; empty when the universe is open-ended"""
+        return []
+
+    def stats(self) -> Dict[str, Any]:
+        """Request and connection statistics; empty when the backend has none"""
+        return {}
+
+
+class YFinanceProvider(DataProvider):
+    """Live data from Yahoo Finance via yfinance, every request on one pooled session"""
+
+    name = "yfinance"
+
+    def __init__(self, session=None):
+        import yfinance
+        from http_session import PooledSession
+        self.yf = yfinance
+        self.session = session or PooledSession()
+
+    def ticker(self, symbol: str):
+        return self.yf.Ticker(symbol, session=self.session)
+
+    def download(self, symbols: List[str], period: str = "5d", interval: str = "1d") -> pd.DataFrame:
+        return self.yf.download(
+            symbols, period=period, interval=interval,
+            auto_adjust=False, progress=False, threads=True, session=self.session
+        )
+
+    def search(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        return self.yf.Search(query, max_results=max_results, session=self.session).quotes
+
+    def stats(self) -> Dict[str, Any]:
+        return {"http": self.session.stats()}
+
+
+def _as_index_time(value, tz) -> pd.Timestamp:
+    timestamp = pd.Timestamp(value)
+    if tz is None:
+        return timestamp.tz_localize(None) if timestamp.tzinfo else timestamp
+    return timestamp.tz_convert(tz) if timestamp.tzinfo else timestamp.tz_localize(tz)
+
+
+def _recorded(dataset: str, empty):
+    return property(lambda self: self._load(dataset, empty))
+
+
+class FixtureTicker:
+    """Ticker stand-in that replays one symbol's recorded datasets"""
+
+    info = _recorded("info", dict)
+    news = _recorded("news", list)
+    dividends = _recorded("dividends", lambda: pd.Series(dtype="float64"))
+    splits = _recorded("splits", lambda: pd.Series(dtype="float64"))
+    income_stmt = _recorded("income_stmt", pd.DataFrame)
+    quarterly_income_stmt = _recorded("quarterly_income_stmt", pd.DataFrame)
+    balance_sheet = _recorded("balance_sheet", pd.DataFrame)
+    quarterly_balance_sheet = _recorded("quarterly_balance_sheet", pd.DataFrame)
+    cashflow = _recorded("cashflow", pd.DataFrame)
+    quarterly_cashflow = _recorded("quarterly_cashflow", pd.DataFrame)
+    recommendations = _recorded("recommendations", pd.DataFrame)
+
+    def __init__(self, provider: "FixtureProvider", symbol: str):
+        self.provider = provider
+        self.ticker = symbol
+
+    def _load(self, dataset: str, empty):
+        self.provider.simulate_latency()
+        value = self.provider.load(self.ticker, dataset)
+        return empty() if value is None else value
+
+    def history(self, period: Optional[str] = "1mo", interval: str = "1d", start=None, end=None, **kwargs) -> pd.DataFrame:
+        self.provider.simulate_latency()
+        bars = self.provider.load(self.ticker, f"history_{interval}")
+        if bars is None:
+            return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"])
+        if start is not None:
+            bars = bars[bars.index >= _as_index_time(start, bars.index.tz)]
+        if end is not None:
+            bars = bars[bars.index < _as_index_time(end, bars.index.tz)]
+        if start is None and end is None and period:
+            bars = slice_period(bars, period)
+        return bars
+
+
+class FixtureProvider(DataProvider):
+    """Replay recorded datasets from disk, one directory per symbol
+
+    History is shifted by whole weeks so the last recorded bar falls in the
+    current week; relative periods such as 1mo or 1y then behave as live.
+    """
+
+    name = "fixture"
+
+    def __init__(self, directory: str = FIXTURE_DIR, latency: float = FIXTURE_LATENCY, align_to_today: bool = True):
+        self.directory = directory
+        self.latency = latency
+        self.align_to_today = align_to_today
+        self._loaded: Dict[tuple, Any] = {}
+        self.upstream_calls = 0
+
+    def simulate_latency(self):
+        self.upstream_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(unquote(name) for name in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, name)))
+
+    def _path(self, symbol: str, dataset: str) -> str:
+        extension = "json" if dataset in JSON_DATASETS else "pkl"
+        return os.path.join(self.directory, quote(symbol.upper(), safe=""), f"{dataset}.{extension}")
+
+    def load(self, symbol: str, dataset: str):
+        """Get a recorded dataset, or None if it was not recorded"""
+        key = (symbol.upper(), dataset)
+        if key not in self._loaded:
+            path = self._path(symbol, dataset)
+            if not os.path.exists(path):
+                value = None
+            elif dataset in JSON_DATASETS:
+                with open(path, "r") as f:
+                    value = json.load(f)
+            else:
+                value = pd.read_pickle(path)
+                if dataset.startswith("history_") and self.align_to_today and not value.empty:
+                    value = value.copy()
+                    value.index = value.index + self._week_shift(value.index[-1])
+            self._loaded[key] = value
+        value = self._loaded[key]
+        # Callers may mutate frames, so hand out copies of the cached value
+        return value.copy() if hasattr(value, "copy") else value
+
+    def _week_shift(self, last_bar: pd.Timestamp) -> pd.Timedelta:
+        today = pd.Timestamp.now(tz=last_bar.tz).normalize()
+        weeks = (today - last_bar.normalize()).days // 7
+        return pd.Timedelta(weeks=max(weeks, 0))
+
+    def ticker(self, symbol: str) -> FixtureTicker:
+        return FixtureTicker(self, symbol.upper())
+
+    def download(self, symbols: List[str], period: str = "5d", interval: str = "1d") -> pd.DataFrame:
+        self.simulate_latency()
+        frames = {}
+        for symbol in symbols:
+            bars = self.load(symbol, f"history_{interval}")
+            if bars is not None and not bars.empty:
+                frames[symbol] = slice_period(bars, period)
+        if not frames:
+            return pd.DataFrame()
+        fields = ["Open", "High", "Low", "Close", "Volume"]
+        return pd.concat(
+            {field: pd.DataFrame({symbol: bars[field].tz_localize(None) for symbol, bars in frames.items()})
+             for field in fields},
+            axis=1
+        )
+
+    def search(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        self.simulate_latency()
+        query = query.lower()
+        results = []
+        for symbol in self.symbols():
+            info = self.load(symbol, "info") or {}
+            if query in symbol.lower() or query in info.get("longName", "").lower():
+                results.append({
+                    "symbol": symbol,
+                    "longname": info.get("longName", ""),
+                    "quoteType": info.get("quoteType", "EQUITY"),
+                    "exchange": info.get("exchange", ""),
+                    "sector": info.get("sector", ""),
+                    "industry": info.get("industry", ""),
+                })
+            if len(results) >= max_results:
+                break
+        return results
+
+
+def get_provider(name: str = DATA_PROVIDER) -> DataProvider:
+    """Create the provider selected by name (yfinance or fixture)"""
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "fixture":
+        return FixtureProvider()
+    raise ValueError(f"Unknown data provider: {name} (expected yfinance or fixture)")
+
+
+def save_fixture(directory: str, symbol: str, dataset: str, value: Any):
+    """Write one dataset in the layout FixtureProvider reads"""
+    path = os.path.join(directory, quote(symbol.upper(), safe=""))
+    os.makedirs(path, exist_ok=True)
+    if dataset in JSON_DATASETS:
+        with open(os.path.join(path, f"{dataset}.json"), "w") as f:
+            json.dump(value, f, default=str)
+    else:
+        value.to_pickle(os.path.join(path, f"{dataset}.pkl"))
+
+
+def record_fixtures(symbols: List[str], directory: str = FIXTURE_DIR, intervals: tuple = ("1d",), period: str = "max"):
+    """Record every dataset the server uses for symbols from live Yahoo Finance"""
+    provider = YFinanceProvider()
+    for symbol in symbols:
+        ticker = provider.ticker(symbol)
+        for dataset in JSON_DATASETS + FRAME_DATASETS + SERIES_DATASETS:
+            value = getattr(ticker, dataset)
+            if value is not None:
+                save_fixture(directory, symbol, dataset, value)
+        for interval in intervals:
+            bars = ticker.history(period=period if interval.endswith(("d", "wk", "mo")) else "1mo", interval=interval)
+            save_fixture(directory, symbol, f"history_{interval}", bars)
+        print(f"Recorded {symbol}")
+
+
+def generate_fixtures(symbols: List[str], directory: str = FIXTURE_DIR, years: int = 10, seed: int = 0):
+    """Write synthetic fixtures with realistic shapes for offline benchmarks and load tests"""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=252 * years, tz="America/New_York", name="Date")
+    annual_periods = pd.DatetimeIndex([pd.Timestamp(year=index[-1].year - i, month=12, day=31) for i in range(1, years + 1)])
+    quarter_periods = pd.date_range(end=index[-1], periods=5, freq="QE").normalize()[::-1]
+
+    for number, symbol in enumerate(symbols):
+        close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(index))))
+        spread = close * rng.uniform(0.002, 0.02, len(index))
+        bars = pd.DataFrame({
+            "Open": close + rng.normal(0, 1, len(index)) * spread / 2,
+            "High": close + spread,
+            "Low": close - spread,
+            "Close": close,
+            "Volume": rng.integers(100_000, 50_000_000, len(index)),
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        }, index=index)
+
+        base_revenue = rng.uniform(1e9, 1e11)
+        growth = rng.normal(0.08, 0.05)
+        margin = rng.uniform(0.05, 0.35)
+        shares = rng.uniform(1e8, 5e9)
+
+        def statements(periods, scale):
+            # Periods are newest first, as yfinance returns them
+            steps = np.cumprod(1 + rng.normal(growth * scale, 0.05, len(periods)))[::-1]
+            sales = base_revenue * scale * steps
+            operating = sales * margin
+            net = operating * 0.75
+            income = pd.DataFrame({
+                "Total Revenue": sales,
+                "Cost Of Revenue": sales * 0.6,
+                "Gross Profit": sales * 0.4,
+                "Operating Income": operating,
+                "EBITDA": operating * 1.15,
+                "EBIT": operating * 1.02,
+                "Reconciled Depreciation": operating * 0.13,
+                "Interest Expense": operating * 0.04,
+                "Pretax Income": operating * 0.98,
+                "Tax Provision": operating * 0.23,
+                "Other Income Expense": operating * 0.02,
+                "Net Income": net,
+                "Basic EPS": net / shares,
+                "Diluted EPS": net / shares * 0.98,
+            }, index=periods).T
+            assets = sales * 1.5
+            balance = pd.DataFrame({
+                "Total Assets": assets,
+                "Current Assets": assets * 0.4,
+                "Current Liabilities": assets * 0.25,
+                "Total Debt": assets * rng.uniform(0.05, 0.5),
+                "Stockholders Equity": assets * 0.45,
+                "Cash And Cash Equivalents": assets * 0.1,
+                "Inventory": assets * 0.05,
+                "Net PPE": assets * 0.3,
+                "Ordinary Shares Number": np.full(len(periods), shares),
+            }, index=periods).T
+            cashflow = pd.DataFrame({
+                "Operating Cash Flow": net * 1.2,
+                "Capital Expenditure": -sales * 0.05,
+                "Free Cash Flow": net * 1.2 - sales * 0.05,
+                "Cash Dividends Paid": -net * 0.3,
+            }, index=periods).T
+            return income, balance, cashflow
+
+        annual = statements(annual_periods, 1.0)
+        quarterly = statements(quarter_periods, 0.25)
+        dividend_dates = index[::63]
+
+        save_fixture(directory, symbol, "history_1d", bars)
+        for name, frame in zip(["income_stmt", "balance_sheet", "cashflow"], annual):
+            save_fixture(directory, symbol, name, frame)
+        for name, frame in zip(["quarterly_income_stmt", "quarterly_balance_sheet", "quarterly_cashflow"], quarterly):
+            save_fixture(directory, symbol, name, frame)
+        save_fixture(directory, symbol, "dividends", pd.Series(close[::63] * 0.004, index=dividend_dates, name="Dividends"))
+        save_fixture(directory, symbol, "splits", pd.Series([2.0], index=index[len(index) // 2:len(index) // 2 + 1], name="Stock Splits"))
+        save_fixture(directory, symbol, "recommendations", pd.DataFrame({
+            "period": ["0m", "-1m", "-2m", "-3m"],
+            "strongBuy": rng.integers(0, 10, 4),
+            "buy": rng.integers(0, 20, 4),
+            "hold": rng.integers(0, 15, 4),
+            "sell": rng.integers(0, 5, 4),
+            "strongSell": rng.integers(0, 3, 4),
+        }))
+        save_fixture(directory, symbol, "info", {
+            "symbol": symbol,
+            "longName": f"{symbol} Synthetic Corp",
+            "quoteType": "EQUITY",
+            "exchange": "NMS",
+            "sector": ["Technology", "Healthcare", "Financial Services", "Energy"][number % 4],
+            "industry": "Synthetic",
+            "country": "United States",
+            "currentPrice": float(close[-1]),
+            "previousClose": float(close[-2]),
+            "marketCap": float(close[-1] * shares),
+            "sharesOutstanding": float(shares),
+            "trailingPE": float(close[-1] / (annual[0].loc["Net Income"].iloc[0] / shares)),
+            "forwardPE": float(close[-1] / (annual[0].loc["Net Income"].iloc[0] * 1.1 / shares)),
+            "priceToBook": float(rng.uniform(1, 10)),
+            "dividendYield": float(rng.uniform(0, 4)),
+            "beta": float(rng.uniform(0.5, 1.8)),
+            "fiftyTwoWeekHigh": float(close[-252:].max()),
+            "fiftyTwoWeekLow": float(close[-252:].min()),
+            "volume": int(bars["Volume"].iloc[-1]),
+            "averageVolume": int(bars["Volume"].tail(60).mean()),
+            "trailingEps": float(annual[0].loc["Basic EPS"].iloc[0]),
+            "debtToEquity": float(annual[1].loc["Total Debt"].iloc[0] / annual[1].loc["Stockholders Equity"].iloc[0] * 100),
+            "returnOnEquity": float(annual[0].loc["Net Income"].iloc[0] / annual[1].loc["Stockholders Equity"].iloc[0]),
+            "profitMargins": float(margin * 0.75),
+            "operatingMargins": float(margin),
+            "revenueGrowth": float(growth),
+            "mostRecentQuarter": int(quarter_periods[0].timestamp()),
+            "lastFiscalYearEnd": int(annual_periods[0].timestamp()),
+            "businessSummary": f"{symbol} is a synthetic company generated for offline testing.",
+        })
+        save_fixture(directory, symbol, "news", [
+            {"title": f"{symbol} headline {i}", "publisher": "Synthetic Wire",
+             "link": f"https://example.com/{symbol}/{i}", "providerPublishTime": int(time.time()) - i * 3600}
+            for i in range(10)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or generate fixtures for the fixture data provider")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record = subparsers.add_parser("record", help="Record live Yahoo Finance data")
+    record.add_argument("symbols", nargs="+")
+    record.add_argument("--dir", default=FIXTURE_DIR)
+    record.add_argument("--intervals", nargs="+", default=["1d"])
+    synth = subparsers.add_parser("synth", help="Generate synthetic data")
+    synth.add_argument("symbols", nargs="*")
+    synth.add_argument("--count", type=int, default=0, help="Generate SYM0..SYMn-1 instead of named symbols")
+    synth.add_argument("--years", type=int, default=10)
+    synth.add_argument("--dir", default=FIXTURE_DIR)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record_fixtures(args.symbols, args.dir, args.intervals)
+    else:
+        symbols = args.symbols + [f"SYM{i}" for i in range(args.count)]
+        generate_fixtures(symbols, args.dir, args.years)
+        print(f"Generated {len(symbols)} symbols in {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
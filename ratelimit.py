@@ -0,0 +1,172 @@
+"""Client-side token-bucket rate limit shared by every upstream call
+
+Requests spend one token each; tokens refill at RATE_LIMIT per second up to
+RATE_BURST. When the bucket is empty, callers queue by priority (interactive
+lookups ahead of bulk statement pulls, background refreshes last) and FIFO
+within a priority, so the server sends upstream a steady stream instead of
+bursts that end in HTTP 429. A 429 from upstream empties the bucket and holds
+refills back for RATE_LIMIT_COOLDOWN seconds.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+RATE_LIMIT = float(os.getenv("YF_RATE_LIMIT", "5"))
+RATE_BURST = int(os.getenv("YF_RATE_BURST", "10"))
+RATE_LIMIT_COOLDOWN = float(os.getenv("YF_RATE_LIMIT_COOLDOWN", "5"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk", PRIORITY_BACKGROUND: "background"}
+
+# Tools not listed here are interactive
+TOOL_PRIORITY = {
+    "get_financials": PRIORITY_BULK,
+    "get_earnings": PRIORITY_BULK,
+    "run_screener": PRIORITY_BULK,
+    "fundamentals_refresh": PRIORITY_BACKGROUND,
+}
+
+RATE_LIMIT_MARKERS = ("too many requests", "rate limit", "ratelimit")
+RATE_LIMIT_STATUS = re.compile(r"\b(?:http|status|error)\D{0,12}429\b")
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an upstream error says we are being throttled"""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in RATE_LIMIT_MARKERS) or RATE_LIMIT_STATUS.search(text) is not None
+
+
+class RateLimiter:
+    """Token bucket with a priority queue of waiting callers (rate <= 0 disables limiting)"""
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT,
+        burst: int = RATE_BURST,
+        cooldown: float = RATE_LIMIT_COOLDOWN,
+        priorities: Optional[Dict[str, int]] = None,
+    ):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.cooldown = cooldown
+        self.priorities = dict(TOOL_PRIORITY if priorities is None else priorities)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._drainer: Optional[asyncio.Task] = None
+        self.granted = 0
+        self.throttled = 0
+        self.max_queue_depth = 0
+        # Per priority: [requests that queued, total seconds waited, longest wait]
+        self._waits = {priority: [0, 0.0, 0.0] for priority in PRIORITY_NAMES}
+
+    def _refill(self, now: float):
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self._tokens = min(float(self.burst), self._tokens + (now - start) * self.rate)
+            self._updated = now
+
+    def _take(self, now: float) -> bool:
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _delay(self, now: float) -> float:
+        """Seconds until the next token is available"""
+        return max(self._paused_until - now, 0.0) + (1 - self._tokens) / self.rate
+
+    async def _drain(self):
+        """Hand out tokens to queued callers, highest priority first, as they refill"""
+        while self._queue:
+            waiter = self._queue[0][2]
+            if waiter.done():
+                heapq.heappop(self._queue)
+                continue
+            now = time.monotonic()
+            if self._take(now):
+                heapq.heappop(self._queue)
+                waiter.set_result(None)
+            else:
+                await asyncio.sleep(self._delay(now))
+        self._drainer = None
+
+    def _start_drainer(self, loop: asyncio.AbstractEventLoop):
+        if self._drainer is not None and not self._drainer.done() and self._drainer.get_loop() is loop:
+            return
+        # Waiters left behind by a closed event loop can never be woken
+        self._queue = [entry for entry in self._queue if entry[2].get_loop() is loop]
+        heapq.heapify(self._queue)
+        self._drainer = loop.create_task(self._drain())
+
+    async def acquire(self, tool: str) -> float:
+        """Wait for a token behind every queued call of the same or higher priority; returns seconds waited"""
+        if self.rate <= 0:
+            self.granted += 1
+            return 0.0
+        priority = self.priorities.get(tool, PRIORITY_INTERACTIVE)
+        start_time = time.monotonic()
+        if not self._queue and self._take(start_time):
+            self.granted += 1
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        self._start_drainer(loop)
+        await waiter
+
+        waited = time.monotonic() - start_time
+        self.granted += 1
+        waits = self._waits[priority]
+        waits[0] += 1
+        waits[1] += waited
+        waits[2] = max(waits[2], waited)
+        return waited
+
+    def throttle(self, seconds: Optional[float] = None):
+        """Upstream rate-limited us: spend every token and hold refills back for the cooldown"""
+        self.throttled += 1
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = min(self._tokens, 0.0)
+        self._paused_until = max(self._paused_until, now + (self.cooldown if seconds is None else seconds))
+
+    def queue_depth(self) -> Dict[str, int]:
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, waiter in self._queue:
+            if not waiter.done():
+                depth[PRIORITY_NAMES[priority]] += 1
+        return depth
+
+    def stats(self) -> Dict[str, Any]:
+        """Get rate limit, queue depth and wait time statistics"""
+        if self.rate > 0:
+            self._refill(time.monotonic())
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tokens_available": round(self._tokens, 2),
+            "granted": self.granted,
+            "throttled_by_upstream": self.throttled,
+            "queue_depth": self.queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+            "waits": {
+                PRIORITY_NAMES[priority]: {
+                    "queued": count,
+                    "avg_wait_ms": round(total / count * 1000, 1) if count else 0,
+                    "max_wait_ms": round(longest * 1000, 1),
+                }
+                for priority, (count, total, longest) in self._waits.items()
+            },
+        }
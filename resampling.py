@@ -0,0 +1,87 @@
+"""Server-side reduction of OHLCV bars: calendar resampling and LTTB downsampling
+
+Both run on bars already held locally, so a chart-sized view of a long
+window costs no extra upstream request and only the reduced bars are
+serialized.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from options import RESAMPLE_RULES
+
+# Approximate bar length used to reject resampling to a finer interval than the source
+INTERVAL_SECONDS = {
+    "1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "90m": 5400, "1h": 3600,
+    "1d": 86400, "5d": 5 * 86400, "1wk": 7 * 86400, "1mo": 31 * 86400, "3mo": 92 * 86400,
+}
+
+# Coarse intervals that can be derived from stored daily bars instead of fetched
+DAILY_DERIVED = ("1wk", "1mo", "3mo")
+
+OHLCV_AGGREGATION = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def resample_bars(df: pd.DataFrame, interval: str, source_interval: str = "1d") -> pd.DataFrame:
+    """Aggregate bars into coarser interval buckets (open first, high max, low min, close last, volume sum)"""
+    if interval not in RESAMPLE_RULES:
+        raise ValueError(f"Cannot resample to {interval} (expected one of {', '.join(RESAMPLE_RULES)})")
+    if INTERVAL_SECONDS[interval] < INTERVAL_SECONDS.get(source_interval, 0):
+        raise ValueError(f"Cannot resample {source_interval} bars to the finer interval {interval}")
+    if df.empty:
+        return df
+    rule = RESAMPLE_RULES[interval]
+    weekly = rule.startswith("W-")
+    aggregation = {column: how for column, how in OHLCV_AGGREGATION.items() if column in df}
+    bars = df.resample(rule, label="left", closed="left" if weekly else None).agg(aggregation)
+    # Buckets with no trades (weekends, holidays, overnight) are not bars
+    return bars[bars["Close"].notna()]
+
+
+def lttb_indices(values: np.ndarray, points: int) -> np.ndarray:
+    """Positions of the points Largest-Triangle-Three-Buckets keeps from a series
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    kept point and the mean of the next bucket. Each bucket is scored with
+    numpy, so only the bucket loop runs in Python.
+    """
+    count = len(values)
+    if points >= count:
+        return np.arange(count)
+    if points < 3:
+        raise ValueError("points must be at least 3")
+    x = np.arange(count, dtype="float64")
+    y = np.nan_to_num(np.asarray(values, dtype="float64"))
+    edges = np.linspace(1, count - 1, points - 1).astype(int)
+    kept = np.empty(points, dtype=int)
+    kept[0], kept[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        following = slice(end, edges[bucket + 2] if bucket + 2 < len(edges) else count)
+        next_x, next_y = x[following].mean(), y[following].mean()
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def downsample_bars(df: pd.DataFrame, points: int, column: str = "Close") -> pd.DataFrame:
+    """Keep at most points bars, chosen by LTTB on column so the shape of the series survives"""
+    if len(df) <= points:
+        return df
+    return df.iloc[lttb_indices(df[column].to_numpy(), points)]
+
+
+def reduce_bars(df: pd.DataFrame, source_interval: str, resample: Optional[str] = None, points: Optional[int] = None) -> pd.DataFrame:
+    """Apply the optional resample interval, then the optional LTTB point budget"""
+    if resample and resample != source_interval:
+        df = resample_bars(df, resample, source_interval)
+    if points:
+        df = downsample_bars(df, points)
+    return df
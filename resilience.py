@@ -0,0 +1,188 @@
+"""Retries, deadlines and a circuit breaker around upstream data calls
+
+Transient failures (timeouts, dropped connections, rate limiting, 5xx) are
+retried with jittered exponential backoff within the call's deadline. After
+BREAKER_FAILURES calls in a row fail, the breaker opens and calls fail fast
+for BREAKER_RESET seconds, so callers can serve stale data instead of
+queueing behind a degraded upstream; then a single probe call decides
+whether it closes again.
+"""
+import asyncio
+import contextlib
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, Optional
+
+from dispatch import ToolTimeoutError
+
+RETRY_ATTEMPTS = int(os.getenv("YF_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("YF_RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = 4.0
+BREAKER_FAILURES = int(os.getenv("YF_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("YF_BREAKER_RESET", "30"))
+
+TRANSIENT_MARKERS = ("timed out", "timeout", "temporarily", "connection", "too many requests", "rate limit")
+# HTTP 429 and 5xx statuses, without matching numbers that are part of a symbol
+TRANSIENT_STATUS = re.compile(r"\b(?:http|status|error)\D{0,12}(?:429|5\d\d)\b")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open"""
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether an upstream error is worth retrying (and may be answered with stale data)"""
+    if isinstance(error, (CircuitOpenError, ToolTimeoutError, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    # yfinance and its HTTP clients raise their own exception types; match on name and message
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in TRANSIENT_MARKERS) or TRANSIENT_STATUS.search(text) is not None
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker: closed -> open -> half-open probe -> closed"""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; in half-open state only one probe at a time may"""
+        with self._lock:
+            if self.state == "open" and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = self._clock()
+
+    def retry_in(self) -> float:
+        return max(0.0, self.reset_timeout - (self._clock() - self.opened_at))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "retry_in_seconds": round(self.retry_in(), 1) if self.state == "open" else 0,
+        }
+
+
+class Resilience:
+    """Deadline, retry and circuit breaker policy shared by every upstream call"""
+
+    def __init__(
+        self,
+        breaker: Optional[CircuitBreaker] = None,
+        attempts: int = RETRY_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.breaker = breaker or CircuitBreaker()
+        self.attempts = max(attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.stale_served = 0
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential delay before retry number attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def call(self, attempt: Callable[[], Awaitable[Any]], deadline: float,
+                   admit: Optional[Callable[[], Awaitable[Any]]] = None,
+                   slot: Optional[Callable[[], AsyncContextManager]] = None) -> Any:
+        """Await attempt(), retrying transient failures until it succeeds or deadline seconds have passed
+
+        admit, if given, is awaited before every attempt (e.g. for a rate limit
+        token), and slot, if given, is held around it (e.g. a worker slot).
+        Time spent waiting for either before the first attempt, or for the slot
+        before later ones, is not charged to the deadline, so local queueing is
+        not mistaken for an upstream failure.
+        """
+        if not self.breaker.allow():
+            self.short_circuits += 1
+            raise CircuitOpenError(
+                f"Upstream unavailable after {self.breaker.failures} consecutive failures; "
+                f"retrying in {self.breaker.retry_in():.0f}s"
+            )
+        self.calls += 1
+        start_time = None
+        queued = 0.0
+        number = 1
+        while True:
+            wait_start = time.monotonic()
+            async with slot() if slot is not None else contextlib.nullcontext():
+                if start_time is not None:
+                    queued += time.monotonic() - wait_start
+                if admit is not None:
+                    await admit()
+                if start_time is None:
+                    start_time = time.monotonic()
+                remaining = deadline - (time.monotonic() - start_time - queued)
+                try:
+                    value = await asyncio.wait_for(attempt(), timeout=max(remaining, 0.001))
+                except Exception as e:
+                    error = e
+                else:
+                    self.breaker.record_success()
+                    return value
+            if isinstance(error, asyncio.TimeoutError):
+                error = ToolTimeoutError(f"Upstream call exceeded its {deadline:.1f}s deadline")
+            if not is_transient(error):
+                # Upstream answered; the request itself was bad
+                self.breaker.record_success()
+                raise error
+            delay = self.backoff(number)
+            if number >= self.attempts or time.monotonic() - start_time - queued + delay >= deadline:
+                self.failures += 1
+                self.breaker.record_failure()
+                raise error
+            self.retries += 1
+            number += 1
+            await self._sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get retry and circuit breaker statistics"""
+        return {
+            "circuit_breaker": self.breaker.stats(),
+            "calls": self.calls,
+            "retries": self.retries,
+            "failed_calls": self.failures,
+            "short_circuited": self.short_circuits,
+            "stale_served": self.stale_served,
+        }
@@ -0,0 +1,529 @@
+"""Stock screener over a columnar fundamentals table
+
+Queries use the field names in constants.SCREENER_PARAMS and the operators in
+constants.SCREENER_OPERATORS, for example:
+
+    Return on equity > 15 AND Debt to equity < 0.5
+    (Sales - Material cost) / Sales * 100 > 40 OR Dividend yield > 3
+
+A query is parsed once into an AST and compiled into nested closures that
+evaluate every operator on whole numpy columns, so a screen costs a handful
+of array operations regardless of how many symbols are in the universe.
+"""
+import difflib
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from constants import SCREENER_PARAMS
+from derived_metrics import PRICE_METRICS, STATEMENT_METRICS, DerivedMetrics
+
+# Every documented screener field, keyed by lower-case name for case-insensitive lookup
+SCREENER_FIELDS = {name.lower(): name for group in SCREENER_PARAMS.values() for name in group}
+
+# Fields read from quote info: field -> (info key, scale to screener units)
+INFO_FIELDS = {
+    "Current price": ("currentPrice", 1),
+    "Market Capitalization": ("marketCap", 1),
+    "Enterprise Value": ("enterpriseValue", 1),
+    "Number of equity shares": ("sharesOutstanding", 1),
+    "Price to Earning": ("trailingPE", 1),
+    "Price to book value": ("priceToBook", 1),
+    "Dividend yield": ("dividendYield", 1),
+    "Return on equity": ("returnOnEquity", 100),
+    "Return on assets": ("returnOnAssets", 100),
+    "Debt to equity": ("debtToEquity", 0.01),
+    "Book value": ("bookValue", 1),
+    "Quick ratio": ("quickRatio", 1),
+    "Promoter holding": ("heldPercentInsiders", 100),
+    "Volume": ("volume", 1),
+    "High price": ("fiftyTwoWeekHigh", 1),
+    "Low price": ("fiftyTwoWeekLow", 1),
+    "DMA 50": ("fiftyDayAverage", 1),
+    "DMA 200": ("twoHundredDayAverage", 1),
+}
+
+# Statement line items and the field-name suffixes that select a period, newest first
+INCOME_ITEMS = {
+    "Sales": "Total Revenue",
+    "Material cost": "Cost Of Revenue",
+    "Gross profit": "Gross Profit",
+    "Operating profit": "Operating Income",
+    "Other income": "Other Income Expense",
+    "EBIDT": "EBITDA",
+    "Depreciation": "Reconciled Depreciation",
+    "EBIT": "EBIT",
+    "Interest": "Interest Expense",
+    "Profit before tax": "Pretax Income",
+    "Tax": "Tax Provision",
+    "Profit after tax": "Net Income",
+    "Net profit": "Net Income",
+    "Extraordinary items": "Total Unusual Items",
+    "EPS": "Diluted EPS",
+}
+BALANCE_ITEMS = {
+    "Debt": "Total Debt",
+    "Net worth": "Stockholders Equity",
+    "Equity capital": "Capital Stock",
+    "Reserves": "Retained Earnings",
+    "Total Assets": "Total Assets",
+    "Balance sheet total": "Total Assets",
+    "Current assets": "Current Assets",
+    "Current liabilities": "Current Liabilities",
+    "Net block": "Net PPE",
+    "Gross block": "Gross PPE",
+    "Accumulated depreciation": "Accumulated Depreciation",
+    "Capital work in progress": "Construction In Progress",
+    "Investments": "Investments And Advances",
+    "Inventory": "Inventory",
+    "Trade receivables": "Accounts Receivable",
+    "Trade Payables": "Accounts Payable",
+    "Lease liabilities": "Capital Lease Obligations",
+    "Cash": "Cash And Cash Equivalents",
+    "Cash Equivalents": "Cash And Cash Equivalents",
+    "Number of equity shares": "Ordinary Shares Number",
+}
+CASHFLOW_ITEMS = {
+    "Cash from operations": "Operating Cash Flow",
+    "Free cash flow": "Free Cash Flow",
+    "Cash from investing": "Investing Cash Flow",
+    "Cash from financing": "Financing Cash Flow",
+    "Net cash flow": "Changes In Cash",
+    "Cash beginning of": "Beginning Cash Position",
+    "Cash end of": "End Cash Position",
+    "Dividends paid": "Cash Dividends Paid",
+}
+ANNUAL_SUFFIXES = {"": 0, " last year": 0, " preceding year": 1}
+QUARTER_SUFFIXES = {
+    " latest quarter": 0,
+    " preceding quarter": 1,
+    " 2quarters back": 2,
+    " 3quarters back": 3,
+    " preceding year quarter": 4,
+}
+YEARS_BACK_SUFFIXES = {f" {years}Years back": years for years in (3, 5, 7, 10)}
+
+
+def _statement_fields() -> Dict[str, Tuple[str, str, int]]:
+    fields = {}
+    for prefix, item in INCOME_ITEMS.items():
+        for suffix, offset in ANNUAL_SUFFIXES.items():
+            fields[prefix + suffix] = ("income_stmt", item, offset)
+        for suffix, offset in QUARTER_SUFFIXES.items():
+            fields[prefix + suffix] = ("quarterly_income_stmt", item, offset)
+    for prefix, item in BALANCE_ITEMS.items():
+        for suffix, offset in {**ANNUAL_SUFFIXES, **YEARS_BACK_SUFFIXES}.items():
+            fields[prefix + suffix] = ("balance_sheet", item, offset)
+    for prefix, item in CASHFLOW_ITEMS.items():
+        for suffix, offset in ANNUAL_SUFFIXES.items():
+            fields[prefix + suffix] = ("cashflow", item, offset)
+    return fields
+
+
+# Fields read from statements: field -> (statement, line item, periods back)
+STATEMENT_FIELDS = _statement_fields()
+STATEMENTS = sorted({statement for statement, _, _ in STATEMENT_FIELDS.values()})
+
+
+def _derived_fields() -> Dict[str, str]:
+    fields = {
+        "Current Tax": "Tax",
+        "Dividend last year": "-Dividends paid last year",
+        "Dividend preceding year": "-Dividends paid preceding year",
+        "Earnings yield": "EPS / Current price * 100",
+        "Return on capital employed": "EBIT / (Total Assets - Current liabilities) * 100",
+        "Return on capital employed preceding year":
+            "EBIT preceding year / (Total Assets preceding year - Current liabilities preceding year) * 100",
+        "Return on assets preceding year": "Net profit preceding year / Total Assets preceding year * 100",
+        "Return on equity preceding year": "Net profit preceding year / Net worth preceding year * 100",
+        "Book value preceding year": "Net worth preceding year / Number of equity shares preceding year",
+        "Asset Turnover Ratio": "Sales / Total Assets",
+        "Financial leverage": "Total Assets / Net worth",
+        "Inventory turnover ratio": "Sales / Inventory",
+        "Debtor days": "Trade receivables / Sales * 365",
+        "Days Receivable Outstanding": "Trade receivables / Sales * 365",
+        "Days Inventory Outstanding": "Inventory / Material cost * 365",
+        "Days Payable Outstanding": "Trade Payables / Material cost * 365",
+        "Cash Conversion Cycle":
+            "Days Receivable Outstanding + Days Inventory Outstanding - Days Payable Outstanding",
+        "Working Capital Days": "Working capital / Sales * 365",
+        "Sales growth": "(Sales latest quarter / Sales preceding quarter - 1) * 100",
+        "Profit growth": "(Net profit latest quarter / Net profit preceding quarter - 1) * 100",
+        "YOY Quarterly sales growth": "(Sales latest quarter / Sales preceding year quarter - 1) * 100",
+        "YOY Quarterly profit growth": "(Net profit latest quarter / Net profit preceding year quarter - 1) * 100",
+        "Operating profit growth":
+            "(Operating profit latest quarter / Operating profit preceding year quarter - 1) * 100",
+    }
+    for suffix in [*ANNUAL_SUFFIXES, *QUARTER_SUFFIXES]:
+        fields[f"OPM{suffix}"] = f"Operating profit{suffix} / Sales{suffix} * 100"
+        fields[f"NPM{suffix}"] = f"Net profit{suffix} / Sales{suffix} * 100"
+        fields[f"GPM{suffix}"] = f"Gross profit{suffix} / Sales{suffix} * 100"
+    for suffix in [*ANNUAL_SUFFIXES, *YEARS_BACK_SUFFIXES]:
+        fields[f"Working capital{suffix}"] = f"Current assets{suffix} - Current liabilities{suffix}"
+    for suffix in YEARS_BACK_SUFFIXES:
+        fields[f"Market Capitalization{suffix}"] = f"Price{suffix} * Number of equity shares{suffix}"
+    return fields
+
+
+# Fields defined in the screener language itself over other fields
+DERIVED_FIELDS = _derived_fields()
+
+# Stored columns of the fundamentals table; metric columns are filled by derived_metrics
+TABLE_COLUMNS = list(dict.fromkeys([*STATEMENT_FIELDS, *INFO_FIELDS, *STATEMENT_METRICS, *PRICE_METRICS]))
+
+KNOWN_FIELDS = {
+    name.lower(): name for name in [*SCREENER_FIELDS.values(), *TABLE_COLUMNS, *DERIVED_FIELDS]
+}
+
+def _divide(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    # A ratio over a zero denominator is undefined, not infinitely large
+    return np.where(right == 0, np.nan, np.true_divide(left, right))
+
+
+COMPARISONS = {">": np.greater, "<": np.less, ">=": np.greater_equal, "<=": np.less_equal, "=": np.equal}
+ARITHMETIC = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": _divide}
+LOGICAL = {"AND": np.logical_and, "OR": np.logical_or}
+
+TOKEN_PATTERN = re.compile(
+    r"(?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?![\w.%]))|(?P<op>>=|<=|[-+*/<>=()])|(?P<word>[\w.%]+)"
+)
+
+# AST nodes: ("number", value) | ("field", name) | ("negate", node) | ("binary", op, left, right)
+Node = Tuple[Any, ...]
+
+
+def tokenize(expression: str) -> List[Tuple[str, str, int]]:
+    """Split an expression into (kind, text, position) tokens"""
+    tokens = []
+    position = 0
+    while position < len(expression):
+        if expression[position].isspace():
+            position += 1
+            continue
+        match = TOKEN_PATTERN.match(expression, position)
+        if not match:
+            raise ValueError(f"Unexpected character {expression[position]!r} at position {position}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "word" and text.upper() in LOGICAL:
+            kind, text = "op", text.upper()
+        tokens.append((kind, text, position))
+        position = match.end()
+    return tokens
+
+
+def resolve_field(name: str) -> str:
+    """Map a field name to its canonical spelling, suggesting close matches when unknown"""
+    key = " ".join(name.split()).lower()
+    if key in KNOWN_FIELDS:
+        return KNOWN_FIELDS[key]
+    suggestions = difflib.get_close_matches(key, KNOWN_FIELDS, n=3, cutoff=0.6)
+    hint = f" (did you mean {', '.join(repr(KNOWN_FIELDS[item]) for item in suggestions)}?)" if suggestions else ""
+    raise ValueError(f"Unknown screener field {name!r}{hint}")
+
+
+class _Parser:
+    """Recursive-descent parser; precedence from low to high is OR, AND, comparison, + -, * /, unary -"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.position = 0
+
+    def peek(self) -> Optional[Tuple[str, str, int]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def accept(self, *ops: str) -> Optional[str]:
+        token = self.peek()
+        if token and token[0] == "op" and token[1] in ops:
+            self.position += 1
+            return token[1]
+        return None
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise ValueError("Empty screener query")
+        node = self.parse_or()
+        token = self.peek()
+        if token:
+            raise ValueError(f"Unexpected {token[1]!r} at position {token[2]}")
+        return node
+
+    def parse_or(self) -> Node:
+        node = self.parse_and()
+        while self.accept("OR"):
+            node = ("binary", "OR", node, self.parse_and())
+        return node
+
+    def parse_and(self) -> Node:
+        node = self.parse_comparison()
+        while self.accept("AND"):
+            node = ("binary", "AND", node, self.parse_comparison())
+        return node
+
+    def parse_comparison(self) -> Node:
+        node = self.parse_sum()
+        op = self.accept(*COMPARISONS)
+        if op:
+            node = ("binary", op, node, self.parse_sum())
+        return node
+
+    def parse_sum(self) -> Node:
+        node = self.parse_term()
+        while True:
+            op = self.accept("+", "-")
+            if not op:
+                return node
+            node = ("binary", op, node, self.parse_term())
+
+    def parse_term(self) -> Node:
+        node = self.parse_unary()
+        while True:
+            op = self.accept("*", "/")
+            if not op:
+                return node
+            node = ("binary", op, node, self.parse_unary())
+
+    def parse_unary(self) -> Node:
+        if self.accept("-"):
+            return ("negate", self.parse_unary())
+        return self.parse_atom()
+
+    def parse_atom(self) -> Node:
+        token = self.peek()
+        if token is None:
+            raise ValueError("Unexpected end of screener query")
+        if self.accept("("):
+            node = self.parse_or()
+            if not self.accept(")"):
+                raise ValueError(f"Missing ')' for '(' at position {token[2]}")
+            return node
+        if token[0] == "op":
+            raise ValueError(f"Unexpected {token[1]!r} at position {token[2]}")
+
+        # Field names span several words ("Return on equity"), so an operand
+        # is the whole run of words up to the next operator
+        words = []
+        while self.peek() and self.peek()[0] != "op":
+            words.append(self.peek())
+            self.position += 1
+        if len(words) == 1 and words[0][0] == "number":
+            return ("number", float(words[0][1]))
+        return ("field", resolve_field(" ".join(text for _, text, _ in words)))
+
+
+def parse(expression: str) -> Node:
+    """Parse a screener expression into an AST"""
+    return _Parser(expression).parse()
+
+
+def _truth(values: np.ndarray) -> np.ndarray:
+    if values.dtype == bool:
+        return values
+    return np.nan_to_num(values) != 0
+
+
+class CompiledQuery:
+    """A screener expression compiled to a vectorized function over a fundamentals table"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.ast = parse(expression)
+        # Fields named in the expression, and the stored columns they are computed from
+        self.fields: Set[str] = set()
+        self.inputs: Set[str] = set()
+        self.is_condition = self.ast[0] == "binary" and (self.ast[1] in COMPARISONS or self.ast[1] in LOGICAL)
+        self._evaluate = self._compile(self.ast)
+
+    def _compile(self, node: Node) -> Callable[[pd.DataFrame], np.ndarray]:
+        kind = node[0]
+        if kind == "number":
+            value = node[1]
+            return lambda table: np.full(len(table), value)
+        if kind == "field":
+            name = node[1]
+            self.fields.add(name)
+            if name in DERIVED_FIELDS:
+                derived = compile_query(DERIVED_FIELDS[name])
+                self.inputs.update(derived.inputs)
+                return derived._evaluate
+            self.inputs.add(name)
+            return lambda table: (
+                table[name].to_numpy(dtype="float64") if name in table else np.full(len(table), np.nan)
+            )
+        if kind == "negate":
+            operand = self._compile(node[1])
+            return lambda table: -operand(table).astype("float64")
+
+        _, op, left_node, right_node = node
+        left = self._compile(left_node)
+        right = self._compile(right_node)
+        if op in LOGICAL:
+            func = LOGICAL[op]
+            return lambda table: func(_truth(left(table)), _truth(right(table)))
+        func = COMPARISONS.get(op) or ARITHMETIC[op]
+        return lambda table: func(left(table).astype("float64"), right(table).astype("float64"))
+
+    def evaluate(self, table: pd.DataFrame) -> np.ndarray:
+        """Evaluate over every row of table; NaN inputs never satisfy a comparison"""
+        with np.errstate(all="ignore"):
+            return self._evaluate(table)
+
+    def mask(self, table: pd.DataFrame) -> np.ndarray:
+        """Boolean mask of the rows matching this query"""
+        if not self.is_condition:
+            raise ValueError(f"Screener query must be a condition such as 'Return on equity > 15', got {self.expression!r}")
+        return _truth(self.evaluate(table))
+
+
+@lru_cache(maxsize=256)
+def compile_query(expression: str) -> CompiledQuery:
+    """Compile an expression once; repeated screens reuse the compiled closures"""
+    return CompiledQuery(expression)
+
+
+def _as_float(value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float, np.number)):
+        return np.nan
+    return float(value)
+
+
+def quote_snapshot(info: Dict[str, Any]) -> Dict[str, float]:
+    """Keep the numeric quote info keys the screener reads"""
+    snapshot = {}
+    for key, _ in INFO_FIELDS.values():
+        value = _as_float((info or {}).get(key))
+        if not np.isnan(value):
+            snapshot[key] = value
+    return snapshot
+
+
+def build_table(tables: Dict[str, pd.DataFrame], quotes: pd.DataFrame) -> pd.DataFrame:
+    """Build the screener table, one row per symbol, from warehouse statement tables and quote snapshots
+
+    Statement tables are indexed by (symbol, period_end). Ranking each
+    symbol's periods newest first turns "N periods back" into one row
+    selection per offset across the whole universe at once.
+    """
+    columns = {}
+    for statement in STATEMENTS:
+        table = tables.get(statement)
+        if table is None or table.empty:
+            continue
+        table = table.sort_index(level=["symbol", "period_end"], ascending=[True, False])
+        offsets = table.groupby(level="symbol").cumcount().to_numpy()
+        fields = [(field, item, offset) for field, (source, item, offset) in STATEMENT_FIELDS.items() if source == statement]
+        for offset in sorted({offset for _, _, offset in fields}):
+            selected = table[offsets == offset].droplevel("period_end")
+            for field, item, field_offset in fields:
+                if field_offset == offset and item in selected:
+                    columns[field] = selected[item]
+    for field, (key, scale) in INFO_FIELDS.items():
+        if key in quotes:
+            columns[field] = quotes[key] * scale
+    return pd.DataFrame(columns).reindex(columns=TABLE_COLUMNS).astype("float64")
+
+
+class FundamentalsTable:
+    """Columnar screener table over a fundamentals warehouse, rebuilt only when the warehouse changes"""
+
+    def __init__(self, store, metrics: Optional[DerivedMetrics] = None):
+        self.store = store
+        self.metrics = metrics or DerivedMetrics()
+        self._frame: Optional[pd.DataFrame] = None
+        self._version = -1
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.build_seconds = 0.0
+
+    def frame(self, symbols: Optional[List[str]] = None, history=None) -> pd.DataFrame:
+        """The table as a DataFrame indexed by symbol, optionally restricted to symbols
+
+        With a history store, price metrics are filled in from each symbol's
+        stored daily bars.
+        """
+        with self._lock:
+            if self._frame is None or self._version != self.store.version:
+                start_time = time.perf_counter()
+                version = self.store.version
+                tables = {statement: self.store.table(statement) for statement in STATEMENTS}
+                frame = build_table(tables, self.store.quotes())
+                # Quote-only checks bump version but leave the statement metrics memoized
+                metrics = self.metrics.statements(self.store.statements_version, lambda: tables)
+                frame[list(metrics.columns)] = metrics.reindex(frame.index)
+                self._frame = frame
+                self._version = version
+                self.builds += 1
+                self.build_seconds = time.perf_counter() - start_time
+            frame = self._frame
+        if symbols is None and history is None:
+            return frame
+        frame = frame.reindex(symbols if symbols is not None else frame.index)
+        if history is not None:
+            prices = self.metrics.prices(
+                lambda symbol: history.series_version(symbol, "1d"), list(frame.index), lambda symbol: history.read(symbol, "1d")
+            )
+            frame[list(prices.columns)] = prices.reindex(frame.index)
+        return frame
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "symbols": 0 if self._frame is None else len(self._frame),
+            "columns": len(TABLE_COLUMNS),
+            "builds": self.builds,
+            "last_build_ms": round(self.build_seconds * 1000, 2),
+            "derived_metrics": self.metrics.stats(),
+        }
+
+
+def run_screen(
+    table: pd.DataFrame,
+    query: str,
+    sort_by: Optional[str] = None,
+    ascending: bool = False,
+    limit: int = 50,
+) -> Dict[str, Any]:
+    """Screen table with query and return the matching symbols with the fields the query uses"""
+    compiled = compile_query(query)
+    order = compile_query(sort_by) if sort_by else None
+
+    # Work on just the columns the query and sort key read
+    inputs = compiled.inputs | (order.inputs if order is not None else set())
+    table = table.reindex(columns=sorted(inputs))
+    mask = compiled.mask(table)
+    matches = table[mask]
+
+    columns = {name: compile_query(name).evaluate(matches) for name in sorted(compiled.fields)}
+    if order is not None:
+        key = order.evaluate(matches).astype("float64")
+        if order.expression not in columns:
+            columns[order.expression] = key
+        # NaN keys sort last in either direction
+        positions = np.lexsort((key if ascending else -key, np.isnan(key)))
+    else:
+        positions = np.arange(len(matches))
+    positions = positions[:limit]
+
+    results = []
+    for position in positions:
+        record = {"symbol": matches.index[position]}
+        for name, values in columns.items():
+            value = values[position]
+            record[name] = None if np.isnan(value) else float(value)
+        results.append(record)
+
+    populated = table.notna().any()
+    unavailable = sorted(name for name in compiled.inputs if not populated[name])
+    return {
+        "query": query,
+        "universe": len(table),
+        "matched": int(mask.sum()),
+        "results": results,
+        "count": len(results),
+        "unavailable_fields": unavailable,
+    }
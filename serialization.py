@@ -0,0 +1,183 @@
+import base64
+import datetime
+import json
+import math
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from options import DEFAULT_RESPONSE_FORMAT, HISTORY_PAGE_SIZE, RESPONSE_FORMATS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HISTORY_FIELDS = ["date", "open", "high", "low", "close", "volume"]
+
+
+def format_dates(index: pd.Index, unit: str = "D") -> List[str]:
+    """Format a whole DatetimeIndex as ISO strings in local exchange time
+
+    numpy formats the whole array in C; DatetimeIndex.strftime formats
+    element by element and is over ten times slower on large frames.
+    """
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return np.datetime_as_string(index.to_numpy(), unit=unit).tolist()
+
+
+def history_columns(hist: pd.DataFrame) -> Dict[str, List[Any]]:
+    """Convert OHLCV bars to column lists of plain Python values"""
+    if "Volume" in hist:
+        volume = hist["Volume"].fillna(0).to_numpy(dtype="int64").tolist()
+    else:
+        volume = [0] * len(hist)
+    return {
+        "date": format_dates(hist.index),
+        "open": hist["Open"].to_numpy(dtype="float64").tolist(),
+        "high": hist["High"].to_numpy(dtype="float64").tolist(),
+        "low": hist["Low"].to_numpy(dtype="float64").tolist(),
+        "close": hist["Close"].to_numpy(dtype="float64").tolist(),
+        "volume": volume,
+    }
+
+
+def history_records(hist: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convert OHLCV bars to one dict per bar, built from the column lists"""
+    columns = history_columns(hist)
+    return [dict(zip(HISTORY_FIELDS, row)) for row in zip(*(columns[field] for field in HISTORY_FIELDS))]
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """Pack paging state into an opaque URL-safe token"""
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, **expected: Any) -> Dict[str, Any]:
+    """Unpack a token from encode_cursor, checking it was issued for the same request"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(state, dict) or any(state.get(key) != value for key, value in expected.items()):
+        raise ValueError("Cursor does not belong to this request")
+    return state
+
+
+def statement_to_dict(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Convert a financial statement frame to {period: {line item: value}} with JSON-safe keys"""
+    if df is None or df.empty:
+        return {}
+    df = df.copy()
+    if isinstance(df.columns, pd.DatetimeIndex):
+        df.columns = format_dates(df.columns)
+    else:
+        df.columns = [str(column) for column in df.columns]
+    df.index = [str(item) for item in df.index]
+    return df.astype(object).where(df.notna(), None).to_dict()
+
+
+def records_to_columns(value: Any) -> Any:
+    """Turn every list of same-keyed dicts in a result into a dict of column lists"""
+    if isinstance(value, dict):
+        return {key: records_to_columns(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        keys = list(value[0])
+        if all(list(item) == keys for item in value):
+            return {key: [item[key] for item in value] for key in keys}
+    return value
+
+
+def _is_table(value: Any) -> bool:
+    if isinstance(value, list):
+        return bool(value) and all(isinstance(item, dict) for item in value)
+    if isinstance(value, dict) and value:
+        items = list(value.values())
+        return all(isinstance(item, dict) for item in items) or (
+            all(isinstance(item, list) for item in items) and len({len(item) for item in items}) == 1
+        )
+    return False
+
+
+def to_csv_text(result: Dict[str, Any]) -> str:
+    """Render a tool result as CSV: scalars become '# key: value' lines, tables become CSV sections"""
+    header = []
+    sections = []
+    for key, value in result.items():
+        if _is_table(value):
+            if isinstance(value, list) or all(isinstance(item, list) for item in value.values()):
+                table = pd.DataFrame(value).to_csv(index=False)
+            else:
+                table = pd.DataFrame(value).to_csv()
+            sections.append(f"# {key}\n{table}")
+        elif isinstance(value, (dict, list)):
+            header.append(f"# {key}: {json.dumps(value, default=str, separators=(',', ':'))}")
+        else:
+            header.append(f"# {key}: {value}")
+
+    if not sections:
+        # Flat results such as get_stock_info read best as field,value rows
+        rows = pd.DataFrame({"field": list(result), "value": [
+            json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+            for value in result.values()
+        ]})
+        return rows.to_csv(index=False)
+    return "\n".join(header + sections)
+
+
+def _json_default(value: Any) -> Any:
+    """Encode what the standard library cannot the way orjson does: numpy values natively, dates as ISO strings"""
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    if type(value) in (datetime.datetime, datetime.date, datetime.time):
+        return value.isoformat()
+    return str(value)
+
+
+def _finite(value: Any) -> Any:
+    """Replace NaN and infinities with None throughout value, as orjson writes them"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    if isinstance(value, (np.generic, np.ndarray)):
+        return _finite(value.tolist())
+    return value
+
+
+def dumps(value: Any, indent: bool = False) -> str:
+    """Encode JSON with orjson when it is installed, falling back to the standard library
+
+    Both give the same text; in particular NaN and infinities become null
+    rather than the NaN tokens json.dumps would write, which are not JSON.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(value, default=str, option=option).decode()
+    options = {"indent": 2} if indent else {"separators": (",", ":")}
+    try:
+        return json.dumps(value, default=_json_default, ensure_ascii=False, allow_nan=False, **options)
+    except ValueError:
+        # Only payloads holding NaN or infinities pay for the extra walk
+        return json.dumps(_finite(value), default=_json_default, ensure_ascii=False, allow_nan=False, **options)
+
+
+def render(result: Dict[str, Any], fmt: str = DEFAULT_RESPONSE_FORMAT) -> str:
+    """Serialize a tool result in one of RESPONSE_FORMATS"""
+    if fmt == "pretty":
+        return dumps(result, indent=True)
+    if fmt == "compact":
+        return dumps(result)
+    if fmt == "columnar":
+        return dumps(records_to_columns(result))
+    if fmt == "csv":
+        return to_csv_text(result)
+    raise ValueError(f"Unknown format: {fmt} (expected one of {', '.join(RESPONSE_FORMATS)})")
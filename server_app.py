@@ -0,0 +1,593 @@
+"""MCP front end: answers the handshake, list_tools and list_prompts without the data stack
+
+MCP clients start a server process per session, and importing pandas and
+yfinance takes longer than the rest of startup combined. This module serves
+the tool schemas and prompt templates on its own and imports afinance_server
+(the data tools) on a worker thread: in the background as soon as the server
+starts (unless YF_PREWARM=0), or at the latest when the first tool is called.
+
+Run it with `python afinance_server.py` (or `python server_app.py`).
+"""
+import asyncio
+import importlib
+import logging
+import os
+import time
+from types import ModuleType
+from typing import Any, Dict, List, Optional
+
+import mcp.types as types
+from mcp.server import Server
+import mcp.server.stdio
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from logging_config import configure_logging
+from options import DEFAULT_INDICATORS, DEFAULT_RESPONSE_FORMAT, HISTORY_PAGE_SIZE, RESAMPLE_RULES, RESPONSE_FORMATS
+
+# Import the data stack in the background right after startup instead of on the first tool call
+PREWARM = os.getenv("YF_PREWARM", "1") != "0"
+
+logger = logging.getLogger(__name__)
+
+server = Server("yfinance-server")
+
+# The data tools module once imported, shared by every tool call
+_backend: Optional[asyncio.Task] = None
+
+async def import_backend() -> ModuleType:
+    start_time = time.perf_counter()
+    # On a worker thread, so the event loop keeps answering the client meanwhile
+    backend = await asyncio.get_running_loop().run_in_executor(None, importlib.import_module, "afinance_server")
+    backend.start()
+    logger.info("Loaded data tools in %.2fs", time.perf_counter() - start_time)
+    return backend
+
+def forget_failed_backend(task: asyncio.Task):
+    """Drop a failed load so the next tool call tries again instead of re-raising its error forever"""
+    global _backend
+    if task.cancelled() or task.exception() is not None:
+        if _backend is task:
+            _backend = None
+        if not task.cancelled():
+            logger.error("Loading data tools failed: %s: %s", type(task.exception()).__name__, task.exception())
+
+def load_backend() -> asyncio.Task:
+    """Start importing the data tools once; await the returned task for the module"""
+    global _backend
+    if _backend is None:
+        _backend = asyncio.ensure_future(import_backend())
+        _backend.add_done_callback(forget_failed_backend)
+    return _backend
+
+@server.list_prompts()
+async def list_prompts() -> List[types.Prompt]:
+    """List available prompt templates for stock analysis"""
+    return [
+        types.Prompt(
+            name="stock_analysis",
+            description="Get comprehensive analysis for a US stock",
+            arguments=[
+                types.PromptArgument(
+                    name="symbol",
+                    description="Stock ticker symbol (e.g., AAPL, GOOGL, MSFT)",
+                    required=True
+                )
+            ]
+        ),
+        types.Prompt(
+            name="market_comparison",
+            description="Compare multiple US stocks",
+            arguments=[
+                types.PromptArgument(
+                    name="symbols",
+                    description="Comma-separated stock symbols (e.g., AAPL,GOOGL,MSFT)",
+                    required=True
+                )
+            ]
+        ),
+        types.Prompt(
+            name="sp500_analysis",
+            description="Analyze S&P 500 index and major components",
+            arguments=[
+                types.PromptArgument(
+                    name="timeframe",
+                    description="Analysis timeframe (e.g., 1mo, 3mo, 1y)",
+                    required=False
+                )
+            ]
+        )
+    ]
+
+@server.get_prompt()
+async def get_prompt(name: str, arguments: Dict[str, str] | None) -> types.GetPromptResult:
+    """Get specific prompt template"""
+    
+    if name == "stock_analysis":
+        symbol = arguments.get("symbol", "AAPL") if arguments else "AAPL"
+        
+        return types.GetPromptResult(
+            description=f"Comprehensive analysis for {symbol}",
+            messages=[
+                types.PromptMessage(
+                    role="user",
+                    content=types.TextContent(
+                        type="text",
+                        text=f"Please provide a comprehensive analysis of {symbol} including:\n\n" +
+                            "- Current stock information (price, market cap, P/E ratio)\n" +
+                            "- Financial statements (income statement, balance sheet, cash flow)\n" +
+                            "- Recent earnings data\n" +
+                            "- Dividend history (if applicable)\n" +
+                            "- Recent news and analyst recommendations\n" +
+                            "- Year-to-date performance"
+                    )
+                )
+            ]
+        )
+    
+    elif name == "market_comparison":
+        symbols = arguments.get("symbols", "AAPL,GOOGL,MSFT") if arguments else "AAPL,GOOGL,MSFT"
+        symbol_list = [s.strip() for s in symbols.split(',')]
+        
+        return types.GetPromptResult(
+            description=f"Compare stocks: {symbols}",
+            messages=[
+                types.PromptMessage(
+                    role="user",
+                    content=types.TextContent(
+                        type="text",
+                        text=f"Please compare these stocks: {', '.join(symbol_list)}\n\n" +
+                            "Include comparison of:\n" +
+                            "- Current prices and market caps\n" +
+                            "- P/E ratios and valuation metrics\n" +
+                            "- Dividend yields\n" +
+                            "- Year-to-date performance\n" +
+                            "- Financial health indicators\n" +
+                            "- Recent news sentiment\n\n" +
+                            "get_portfolio_analytics returns returns, volatility, beta, drawdowns and correlations for all of them in one call."
+                    )
+                )
+            ]
+        )
+    
+    elif name == "sp500_analysis":
+        timeframe = arguments.get("timeframe", "1y") if arguments else "1y"
+        
+        return types.GetPromptResult(
+            description=f"S&P 500 analysis over {timeframe}",
+            messages=[
+                types.PromptMessage(
+                    role="user",
+                    content=types.TextContent(
+                        type="text",
+                        text=f"Please analyze the S&P 500 index (^GSPC) over the past {timeframe}:\n\n" +
+                            "- Historical price performance\n" +
+                            "- Current level and trends\n" +
+                            "- Major gainers and losers (if available)\n" +
+                            "- Recent market news\n" +
+                            "- Key support and resistance levels (get_indicators can compute levels, moving averages and RSI)"
+                    )
+                )
+            ]
+        )
+    
+    else:
+        raise ValueError(f"Unknown prompt: {name}")
+
+# Shared by every tool; the default comes from YF_RESPONSE_FORMAT
+FORMAT_PROPERTY = {
+    "type": "string",
+    "enum": RESPONSE_FORMATS,
+    "description": "Response format: pretty (indented JSON), compact (minified JSON), columnar (lists of records as column arrays) or csv",
+    "default": DEFAULT_RESPONSE_FORMAT
+}
+
+@server.list_tools()
+async def list_tools() -> List[types.Tool]:
+    return [
+        types.Tool(
+            name="get_stock_info",
+            description="Get comprehensive stock information for US stocks including current price, market cap, P/E ratios, and key financial metrics",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string", 
+                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT, TSLA, ^GSPC for S&P 500)"
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbol"]
+            }
+        ),
+        types.Tool(
+            name="get_historical_data",
+            description="Get historical stock price data with flexible time periods and intervals",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string", 
+                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT)"
+                    },
+                    "period": {
+                        "type": "string",
+                        "description": "Time period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max",
+                        "default": "1mo"
+                    },
+                    "interval": {
+                        "type": "string",
+                        "description": "Data interval: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo",
+                        "default": "1d"
+                    },
+                    "resample": {
+                        "type": "string",
+                        "enum": list(RESAMPLE_RULES),
+                        "description": "Aggregate the bars into this coarser interval on the server (e.g. 1wk over 5y of daily bars)"
+                    },
+                    "points": {
+                        "type": "integer",
+                        "minimum": 3,
+                        "description": "Downsample to at most this many bars with LTTB, keeping the shape of the close series (for charts)"
+                    },
+                    "page_size": {
+                        "type": "integer",
+                        "description": f"Maximum bars per response (at most {HISTORY_PAGE_SIZE}); longer windows return the newest bars first, with next_cursor for older ones",
+                        "default": HISTORY_PAGE_SIZE
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "next_cursor from the previous page, to get the bars just before it in the same request"
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbol"]
+            }
+        ),
+        types.Tool(
+            name="get_financials",
+            description="Get financial statements (income statement, balance sheet, cash flow) for US companies",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string", 
+                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT)"
+                    },
+                    "quarterly": {
+                        "type": "boolean",
+                        "description": "Get quarterly data if true, annual if false",
+                        "default": False
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbol"]
+            }
+        ),
+        types.Tool(
+            name="get_earnings",
+            description="Get earnings data (annual and quarterly) for US companies",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string", 
+                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT)"
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbol"]
+            }
+        ),
+        types.Tool(
+            name="get_dividends",
+            description="Get dividend payment history for US stocks",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string", 
+                        "description": "US stock ticker symbol (e.g., AAPL, MSFT, JNJ)"
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbol"]
+            }
+        ),
+        types.Tool(
+            name="get_splits",
+            description="Get stock split history for US stocks",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string", 
+                        "description": "US stock ticker symbol (e.g., AAPL, TSLA, NVDA)"
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbol"]
+            }
+        ),
+        types.Tool(
+            name="get_news",
+            description="Get recent news articles for a US stock",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string", 
+                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT)"
+                    },
+                    "count": {
+                        "type": "integer",
+                        "description": "Number of news articles to return (default: 10)",
+                        "default": 10
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbol"]
+            }
+        ),
+        types.Tool(
+            name="get_recommendations",
+            description="Get analyst recommendations and ratings for US stocks",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string", 
+                        "description": "US stock ticker symbol (e.g., AAPL, GOOGL, MSFT)"
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbol"]
+            }
+        ),
+        types.Tool(
+            name="search_stocks",
+            description="Search for US stocks by company name or ticker symbol",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Search query - company name or ticker (e.g., 'Apple', 'MSFT', 'Tesla')"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of results (default: 10)",
+                        "default": 10
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["query"]
+            }
+        ),
+        types.Tool(
+            name="get_multiple_quotes",
+            description="Get current quotes for multiple US stocks at once",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbols": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "List of US stock ticker symbols (e.g., ['AAPL', 'GOOGL', 'MSFT'])"
+                    },
+                    "include_fundamentals": {
+                        "type": "boolean",
+                        "description": "Also return name, market cap and P/E ratios. Prices for every symbol come from a single batch request; this adds one upstream lookup per symbol, so leave it off for large lists",
+                        "default": False
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbols"]
+            }
+        ),
+        types.Tool(
+            name="get_indicators",
+            description="Get technical indicators (SMA, EMA, RSI, MACD, Bollinger bands, ATR, volatility, drawdown, "
+                        "support/resistance levels) for one or more stocks, computed on the server from cached price history",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbols": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "List of stock ticker symbols"
+                    },
+                    "indicators": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Indicators as name or name:params, e.g. sma:50, ema:20, rsi:14, macd:12,26,9, "
+                                       "bollinger:20,2, atr:14, volatility:20, drawdown, levels:20 (rolling support/resistance)",
+                        "default": DEFAULT_INDICATORS
+                    },
+                    "period": {
+                        "type": "string",
+                        "description": "History the indicators are computed over: 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max",
+                        "default": "1y"
+                    },
+                    "interval": {
+                        "type": "string",
+                        "description": "Bar interval: 1m, 5m, 15m, 30m, 60m, 1h, 1d, 1wk, 1mo",
+                        "default": "1d"
+                    },
+                    "points": {
+                        "type": "integer",
+                        "description": "Trailing values to return per indicator; 1 returns only the latest value",
+                        "default": 1
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbols"]
+            }
+        ),
+        types.Tool(
+            name="get_portfolio_analytics",
+            description="Compare many stocks in one call from a single bulk download: return, volatility, Sharpe ratio, "
+                        "beta against a benchmark, max drawdown, and correlation/covariance matrices of their returns",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbols": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "List of stock ticker symbols"
+                    },
+                    "period": {
+                        "type": "string",
+                        "description": "Return window: 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max",
+                        "default": "1y"
+                    },
+                    "interval": {
+                        "type": "string",
+                        "description": "Return frequency: 1d, 1wk, 1mo",
+                        "default": "1d"
+                    },
+                    "benchmark": {
+                        "type": "string",
+                        "description": "Symbol betas are measured against (empty string for none)",
+                        "default": "^GSPC"
+                    },
+                    "risk_free_rate": {
+                        "type": "number",
+                        "description": "Annual risk-free rate in percent, used by the Sharpe ratios",
+                        "default": 0
+                    },
+                    "weights": {
+                        "type": "object",
+                        "additionalProperties": {"type": "number"},
+                        "description": "Optional portfolio weights by symbol (normalized to sum to 1) for portfolio return and volatility"
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["symbols"]
+            }
+        ),
+        types.Tool(
+            name="run_screener",
+            description="Screen a universe of stocks with a query over fundamental and price fields, e.g. "
+                        "'Return on equity > 15 AND Sales growth 5Years > 10' "
+                        "(operators: + - * / > < >= <= = AND OR and parentheses)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Screen condition using screener field names, e.g. 'Price to Earning < 20 OR Dividend yield > 3'"
+                    },
+                    "symbols": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Universe to screen (default: every symbol the data provider can list)"
+                    },
+                    "sort_by": {
+                        "type": "string",
+                        "description": "Field or expression to order matches by (e.g. 'Market Capitalization')"
+                    },
+                    "ascending": {
+                        "type": "boolean",
+                        "description": "Sort ascending instead of descending",
+                        "default": False
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of matches to return",
+                        "default": 50
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["query"]
+            }
+        ),
+        types.Tool(
+            name="get_cache_stats",
+            description="Get data cache statistics including hit/miss/eviction counters and per-dataset TTLs",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": FORMAT_PROPERTY
+                },
+                "required": []
+            }
+        ),
+        types.Tool(
+            name="get_server_metrics",
+            description="Get per-tool latency percentiles split into upstream, transform and serialization time, plus throughput, error counts, payload sizes and concurrency",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "prometheus": {
+                        "type": "boolean",
+                        "description": "Return the Prometheus text exposition format instead of JSON",
+                        "default": False
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": []
+            }
+        ),
+        types.Tool(
+            name="set_profiling",
+            description="Turn sampled profiling of tool calls on or off; sampled calls write cProfile stats and top allocations to the profile directory",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "sample_rate": {
+                        "type": "number",
+                        "description": "Fraction of tool calls to profile, 0 (off) to 1 (every call)"
+                    },
+                    "tools": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Only profile these tools (empty list for all)"
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": []
+            }
+        ),
+        types.Tool(
+            name="clear_cache",
+            description="Clear cached data (use when you want fresh data)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string",
+                        "description": "Optional: specific symbol to clear from cache. If not provided, clears all cache."
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": []
+            }
+        )
+    ]
+
+@server.call_tool()
+async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextContent]:
+    """Hand tool calls to the data tools, importing them first if the prewarm has not finished"""
+    backend = await asyncio.shield(load_backend())
+    return await backend.call_tool(name, arguments)
+
+async def main():
+    log_listener = configure_logging()
+    if PREWARM:
+        load_backend()
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        if _backend is not None and _backend.done() and not _backend.cancelled() and _backend.exception() is None:
+            _backend.result().shutdown()
+        log_listener.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def normalize_arguments(arguments: Dict[str, Any]) -> str:
+    """Build a stable key from tool arguments, ignoring symbol case and key order"""
+    normalized = dict(arguments or {})
+    if isinstance(normalized.get("symbol"), str):
+        normalized["symbol"] = normalized["symbol"].upper()
+    if isinstance(normalized.get("symbols"), list):
+        normalized["symbols"] = [str(symbol).upper() for symbol in normalized["symbols"]]
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight task
+
+    The first caller for a key starts the work; callers arriving while it
+    runs await the same task instead of starting their own. The shared
+    task is shielded, so a cancelled caller does not cancel the others.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executed += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        """Get single-flight counters"""
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,93 @@
+import pytest
+
+from cache import DataCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttls_keys_and_hit_counts():
+    clock = FakeClock()
+    cache = DataCache(ttls={"quote": 15, "info": 60}, default_ttl=30, clock=clock, stale_max_age=0)
+    cache.put("aapl", "quote", 1)
+    cache.put("AAPL", "info", 2)
+    cache.put("AAPL", "history", 3, {"period": "1y", "interval": "1d"})
+    assert cache.get("AAPL", "quote") == (True, 1)
+    assert cache.get("AAPL", "history", {"interval": "1d", "period": "1y"}) == (True, 3)
+    assert cache.get("AAPL", "history", {"period": "5y", "interval": "1d"}) == (False, None)
+
+    clock.now += 20
+    assert cache.get("AAPL", "quote") == (False, None)
+    assert cache.get("AAPL", "info") == (True, 2) and cache.get("AAPL", "history", {"period": "1y", "interval": "1d"}) == (True, 3)
+    clock.now += 20
+    assert cache.get("AAPL", "history", {"period": "1y", "interval": "1d"}) == (False, None)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (4, 3, round(4 / 7, 4))
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = DataCache(max_entries=3, clock=FakeClock())
+    for symbol in ["A", "B", "C"]:
+        cache.put(symbol, "quote", symbol)
+    cache.get("A", "quote")
+    cache.put("D", "quote", "D")
+    assert cache.get("B", "quote") == (False, None)
+    assert [cache.get(symbol, "quote")[0] for symbol in ["A", "C", "D"]] == [True, True, True]
+    assert cache.stats()["evictions"] == 1
+
+    assert cache.invalidate("a") == 1 and len(cache) == 2
+    assert cache.invalidate() == 2 and len(cache) == 0 and cache.stats()["entries_by_dataset"] == {}
+
+
+def test_expiry_heap_tracks_active_stale_and_removed_entries():
+    clock = FakeClock()
+    cache = DataCache(ttls={"quote": 10, "info": 60}, clock=clock, stale_max_age=100)
+    for i in range(5):
+        cache.put(f"Q{i}", "quote", i)
+    cache.put("AAA", "info", "info")
+
+    clock.now += 30
+    stats = cache.stats()
+    assert (stats["active_cache_entries"], stats["expired_cache_entries"]) == (1, 5)
+    assert cache.get("Q0", "quote") == (False, None)
+    assert cache.get_stale("Q0", "quote")[:2] == (True, 0)
+
+    # Refreshing a stale entry makes it active again
+    cache.put("Q1", "quote", "fresh")
+    assert cache.stats()["active_cache_entries"] == 2
+
+    clock.now += 90
+    assert cache.clear_expired() == 4
+    assert cache.get_stale("Q0", "quote") == (False, None, 0.0)
+    stats = cache.stats()
+    assert stats["total_cache_entries"] == 2 and stats["expired_cache_entries"] == 2
+    assert stats["entries_by_dataset"] == {"quote": 1, "info": 1} and stats["expirations"] == 4
+
+    clock.now += 200
+    assert cache.clear_expired() == 2 and len(cache) == 0 and cache.stats()["entries_by_dataset"] == {}
+
+
+def test_repeated_puts_and_evictions_keep_the_heap_bounded():
+    clock = FakeClock()
+    cache = DataCache(max_entries=50, ttls={"quote": 15}, clock=clock, stale_max_age=60)
+    for round_number in range(200):
+        for i in range(100):
+            cache.put(f"S{i}", "quote", round_number)
+        clock.now += 1
+        cache.clear_expired()
+    stats = cache.stats()
+    assert stats["total_cache_entries"] == 50 and stats["evictions"] == 200 * 100 - 50
+    assert stats["expiry_heap_size"] <= 2 * 50 + 64 + 100
+    assert len(cache._stale) <= 2 * len(cache._stale_keys) + 64
+
+    cache.invalidate("S99")
+    assert cache.get("S99", "quote") == (False, None) and cache.stats()["entries_by_dataset"] == {"quote": 49}
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from derived_metrics import DerivedMetrics, compute_price_metrics, compute_statement_metrics
+from fundamentals_store import FundamentalsStore, normalize_statement
+from screener import FundamentalsTable, run_screen
+
+YEARS = pd.to_datetime([f"{year}-12-31" for year in range(2024, 2013, -1)])
+
+
+def income(symbol: str, revenue: list) -> pd.DataFrame:
+    return normalize_statement(symbol, pd.DataFrame([revenue], index=["Total Revenue"], columns=YEARS[:len(revenue)]))
+
+
+def daily_bars(closes: np.ndarray) -> pd.DataFrame:
+    index = pd.bdate_range(end="2024-12-31", periods=len(closes))
+    return pd.DataFrame({"High": closes + 1, "Low": closes - 1, "Close": closes, "Volume": 1000.0}, index=index)
+
+
+class FakeHistory:
+    def __init__(self, series: dict):
+        self.series = series
+        self.versions = {}
+        self.reads = []
+
+    def series_version(self, symbol: str, interval: str):
+        return self.versions.get(symbol, 0)
+
+    def read(self, symbol: str, interval: str):
+        self.reads.append(symbol)
+        return self.series.get(symbol)
+
+
+def test_statement_metrics_growth_and_averages():
+    # AAA grows 10% a year for ten years; BBB has only three years of history
+    revenue = [100.0 * 1.1 ** (10 - year) for year in range(11)]
+    tables = {"income_stmt": pd.concat([income("AAA", revenue), income("BBB", [120.0, 110.0, 100.0])])}
+    metrics = compute_statement_metrics(tables)
+    assert np.isclose(metrics.loc["AAA", "Sales growth 3Years"], 10.0)
+    assert np.isclose(metrics.loc["AAA", "Sales growth 10Years"], 10.0)
+    assert np.isclose(metrics.loc["AAA", "Sales growth 5years median"], 10.0)
+    # Not enough years reported: no value rather than a misleading one
+    assert np.isnan(metrics.loc["BBB", "Sales growth 3Years"])
+    assert np.isnan(metrics.loc["BBB", "Sales growth 5years median"])
+    assert np.isnan(metrics.loc["BBB", "Average Earnings 5Year"])
+
+
+def test_price_metrics_from_daily_bars():
+    closes = np.arange(1.0, 1001.0)
+    metrics = compute_price_metrics({"AAA": daily_bars(closes), "BBB": None})
+    assert np.isclose(metrics.loc["AAA", "Return over 1day"], (1000 / 999 - 1) * 100)
+    assert np.isclose(metrics.loc["AAA", "Return over 1year"], (1000 / 748 - 1) * 100)
+    assert metrics.loc["AAA", "DMA 50 previous day"] == np.mean(closes[-51:-1])
+    assert metrics.loc["AAA", "High price all time"] == 1001.0
+    assert metrics.loc["AAA", "Volume 1week average"] == 1000.0
+    # Fewer bars than the window: NaN, and a symbol with no bars gets NaN everywhere
+    assert np.isnan(metrics.loc["AAA", "Return over 5years"])
+    assert metrics.loc["BBB"].isna().all()
+
+
+def test_metrics_recompute_only_when_inputs_change(tmp_path):
+    store = FundamentalsStore(str(tmp_path / "warehouse"))
+    store.update("AAA", {"income_stmt": pd.DataFrame([[133.1, 121.0, 110.0, 100.0]], index=["Total Revenue"], columns=YEARS[:4])}, "2024-12-31")
+    history = FakeHistory({"AAA": daily_bars(np.linspace(50.0, 100.0, 300))})
+    table = FundamentalsTable(store)
+
+    result = run_screen(table.frame(["AAA"], history), "Sales growth 3Years > 9 AND Return over 1year > 0")
+    assert result["matched"] == 1
+    assert np.isclose(result["results"][0]["Sales growth 3Years"], 10.0)
+    table.frame(["AAA"], history)
+    assert table.metrics.computations == {"statements": 1, "prices": 1}
+    assert history.reads == ["AAA"]
+
+    # A quote-only check rebuilds the table but not the statement metrics
+    store.mark_checked("AAA", {"currentPrice": 101.0})
+    table.frame(["AAA"])
+    assert table.metrics.computations["statements"] == 1
+
+    history.versions["AAA"] = 1
+    table.frame(["AAA"], history)
+    assert table.metrics.computations["prices"] == 2
+
+
+def test_price_metrics_recompute_only_changed_symbols():
+    history = FakeHistory({symbol: daily_bars(np.linspace(start, 100.0, 300)) for symbol, start in [("AAA", 50.0), ("BBB", 80.0)]})
+    metrics = DerivedMetrics()
+
+    def prices(symbols):
+        return metrics.prices(lambda symbol: history.series_version(symbol, "1d"), symbols, lambda symbol: history.read(symbol, "1d"))
+
+    first = prices(["AAA", "BBB"])
+    # A write to another symbol's series leaves these rows memoized
+    history.versions["CCC"] = 1
+    assert prices(["AAA", "BBB"]).equals(first) and history.reads == ["AAA", "BBB"]
+
+    history.series["BBB"] = daily_bars(np.linspace(100.0, 50.0, 300))
+    history.versions["BBB"] = 1
+    refreshed = prices(["BBB", "AAA"])
+    assert history.reads == ["AAA", "BBB", "BBB"]
+    assert list(refreshed.index) == ["BBB", "AAA"]
+    assert refreshed.loc["AAA"].equals(first.loc["AAA"])
+    assert refreshed.loc["BBB", "Return over 1year"] < 0 < first.loc["BBB", "Return over 1year"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
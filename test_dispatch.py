@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import afinance_server
+from dispatch import Dispatcher, ToolTimeoutError
+from logging_config import request_context
+
+
+def test_per_tool_limits_cap_concurrent_calls():
+    dispatcher = Dispatcher(max_workers=8, default_concurrency=4, concurrency={"heavy": 2})
+    lock = threading.Lock()
+    running = {"heavy": 0, "light": 0}
+    peaks = {"heavy": 0, "light": 0}
+
+    def work(tool):
+        with lock:
+            running[tool] += 1
+            peaks[tool] = max(peaks[tool], running[tool])
+        time.sleep(0.05)
+        with lock:
+            running[tool] -= 1
+        return tool
+
+    async def run():
+        return await asyncio.gather(*[dispatcher.run(tool, work, tool) for tool in ["heavy", "light"] * 6])
+
+    try:
+        assert asyncio.run(run()) == ["heavy", "light"] * 6
+    finally:
+        dispatcher.shutdown()
+    assert peaks == {"heavy": 2, "light": 4}
+    assert dispatcher.stats() == {"max_workers": 8, "total_calls": 12, "timeouts": 0, "in_flight": {}}
+
+
+def test_slow_calls_time_out_and_free_their_slot():
+    dispatcher = Dispatcher(max_workers=2, default_concurrency=1, timeouts={"slow": 0.05})
+
+    async def run():
+        with pytest.raises(ToolTimeoutError, match="slow timed out after .* \\(limit 0.05s\\)"):
+            await dispatcher.run("slow", time.sleep, 0.5)
+        # The slot is released even though the worker thread is still sleeping
+        return await dispatcher.run("slow", lambda: "next")
+
+    try:
+        assert asyncio.run(run()) == "next"
+    finally:
+        dispatcher.shutdown()
+    stats = dispatcher.stats()
+    assert stats["timeouts"] == 1 and stats["total_calls"] == 2 and stats["in_flight"] == {}
+
+
+def test_pool_threads_see_the_callers_context():
+
+    async def run():
+        request_context.set({"request_id": "abc", "tool": "test"})
+        return await afinance_server.dispatcher.run("test", lambda: (request_context.get(), threading.current_thread().name))
+
+    context, thread = asyncio.run(run())
+    assert context["request_id"] == "abc" and thread.startswith("yf-dispatch")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+
+import pandas as pd
+
+import pytest
+
+import afinance_server
+from cache import DataCache
+from fundamentals_store import FundamentalsStore, denormalize_statement, normalize_statement
+from providers import DataProvider
+
+PERIODS = pd.to_datetime(["2024-12-31", "2023-12-31"])
+
+
+class ReportingTicker:
+    """Fake ticker whose statements change only when its report date moves"""
+
+    def __init__(self, provider: "ReportingProvider", symbol: str):
+        self.provider = provider
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        return {"mostRecentQuarter": self.provider.report, "returnOnEquity": 0.2, "currentPrice": 10.0}
+
+    def __getattr__(self, statement: str):
+        if statement.startswith("_"):
+            raise AttributeError(statement)
+        self.provider.statement_pulls += 1
+        return pd.DataFrame({PERIODS[0]: [100.0 + (self.provider.report or 0)], PERIODS[1]: [90.0]}, index=["Total Revenue"])
+
+
+class ReportingProvider(DataProvider):
+    name = "reporting-fake"
+
+    def __init__(self):
+        self.report = 1_700_000_000
+        self.statement_pulls = 0
+
+    def ticker(self, symbol: str):
+        return ReportingTicker(self, symbol)
+
+    def download(self, symbols, period="5d", interval="1d"):
+        return pd.DataFrame()
+
+    def search(self, query, max_results=10):
+        return []
+
+
+def test_statement_round_trip_and_persistence(tmp_path):
+    root = str(tmp_path / "warehouse")
+    statement = pd.DataFrame({PERIODS[1]: [1.0, 2.0], PERIODS[0]: [3.0, None]}, index=["Total Revenue", "EBIT"])
+    rows = normalize_statement("aapl", statement)
+    assert rows.index.names == ["symbol", "period_end"]
+    assert list(rows.index.get_level_values("symbol").unique()) == ["AAPL"]
+    assert denormalize_statement(rows).columns[0] == PERIODS[0]
+
+    store = FundamentalsStore(root)
+    store.update("AAPL", {"income_stmt": statement}, "2024-12-31")
+    store.flush(force=True)
+    reopened = FundamentalsStore(root)
+    assert reopened.has("aapl")
+    assert reopened.is_current("AAPL", "2024-12-31")
+    assert reopened.statement("AAPL", "income_stmt").loc["Total Revenue", PERIODS[0]] == 3.0
+
+
+def test_refresh_repulls_only_when_report_date_changes():
+    afinance_server.provider = provider = ReportingProvider()
+    afinance_server.data_cache = DataCache(ttls={"info": 0})
+
+    async def run():
+        await afinance_server.call_tool("get_financials", {"symbol": "AAPL"})
+        first_pulls = provider.statement_pulls
+        assert first_pulls == 6
+
+        # Same report date: the check confirms the stored statements without pulling them
+        assert await afinance_server.refresh_fundamentals("test", "AAPL") is False
+        assert provider.statement_pulls == first_pulls
+
+        provider.report += 90 * 86400
+        assert await afinance_server.refresh_fundamentals("test", "AAPL") is True
+        assert provider.statement_pulls == first_pulls * 2
+
+        result = await afinance_server.call_tool("run_screener", {"query": "Sales > 100", "symbols": ["AAPL"], "format": "compact"})
+        assert '"matched":1' in result[0].text
+
+    asyncio.run(run())
+
+
+def test_symbols_without_a_report_date_are_not_repulled_on_every_check():
+    afinance_server.provider = provider = ReportingProvider()
+    provider.report = None
+    afinance_server.data_cache = DataCache(ttls={"info": 0})
+    store = afinance_server.fundamentals_store
+
+    async def run():
+        await afinance_server.call_tool("get_financials", {"symbol": "SPY"})
+        assert provider.statement_pulls == 6
+        for _ in range(3):
+            assert await afinance_server.refresh_fundamentals("test", "SPY") is False
+        assert provider.statement_pulls == 6 and store.unchanged_checks == 3
+
+        store.unreported_ttl = 0
+        assert await afinance_server.refresh_fundamentals("test", "SPY") is True
+        assert provider.statement_pulls == 12
+
+    asyncio.run(run())
+
+
+def test_warehouse_disk_io_runs_on_the_pool(monkeypatch):
+    afinance_server.provider = ReportingProvider()
+    asyncio.run(afinance_server.call_tool("get_financials", {"symbol": "AAPL"}))
+    afinance_server.fundamentals_store.flush(force=True)
+    # A restarted server finds the warehouse on disk
+    store = afinance_server.fundamentals_store = FundamentalsStore(afinance_server.fundamentals_store.root)
+    threads = []
+    load, flush = store.load, store.flush
+
+    def recording_load():
+        if not store.loaded:
+            threads.append(("load", threading.current_thread().name))
+        load()
+
+    def recording_flush(force=False):
+        threads.append(("flush", threading.current_thread().name))
+        flush(force)
+    monkeypatch.setattr(store, "load", recording_load)
+    monkeypatch.setattr(store, "flush", recording_flush)
+
+    async def run():
+        result = await afinance_server.call_tool("get_financials", {"symbol": "AAPL", "format": "compact"})
+        assert "Total Revenue" in result[0].text
+        await afinance_server.call_tool("clear_cache", {"symbol": "AAPL"})
+
+    asyncio.run(run())
+    assert [kind for kind, _ in threads] == ["load", "flush"]
+    assert all(name.startswith("yf-dispatch") for _, name in threads)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+import afinance_server
+from history_store import HistoryStore, page_before
+
+
+def test_page_before_steps_back_from_the_newest_bar():
+    bars = pd.DataFrame({"Close": range(5)}, index=pd.date_range("2024-01-01", periods=5, tz="America/New_York"))
+    first, more = page_before(bars, None, 2)
+    assert list(first["Close"]) == [3, 4] and more
+    rest, more = page_before(bars, first.index.asi8[0], 10)
+    assert list(rest["Close"]) == [0, 1, 2] and not more
+
+
+def test_series_version_changes_only_for_the_written_series(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    bars = pd.DataFrame(
+        {"Open": 1.0, "High": 2.0, "Low": 0.5, "Close": 1.5, "Volume": 10.0},
+        index=pd.date_range("2024-01-01", periods=3, tz="America/New_York"),
+    )
+    store.write("AAA", "1d", bars)
+    aaa, bbb = store.series_version("aaa", "1d"), store.series_version("BBB", "1d")
+    store.write("BBB", "1d", bars)
+    assert store.series_version("AAA", "1d") == aaa and store.series_version("BBB", "1d") != bbb
+    store.clear("BBB")
+    assert store.series_version("AAA", "1d") != aaa
+
+
+def test_cursor_pages_cover_the_window_exactly_once():
+
+    async def call(arguments):
+        result = await afinance_server.call_tool("get_historical_data", {"symbol": "AAA", "period": "max", "format": "compact", **arguments})
+        return json.loads(result[0].text)
+
+    async def run():
+        dates = []
+        page = await call({"page_size": 100})
+        # The first page ends at the newest bar
+        assert page["end"] == (await call({"period": "5d"}))["end"]
+        while True:
+            assert page["count"] <= 100
+            assert page["start"] == page["data"][0]["date"] and page["end"] == page["data"][-1]["date"]
+            assert not dates or page["end"] < dates[0]
+            dates = [bar["date"] for bar in page["data"]] + dates
+            if page["next_cursor"] is None:
+                break
+            page = await call({"page_size": 100, "cursor": page["next_cursor"]})
+        assert dates == sorted(set(dates)) and len(dates) == page["total"] > 100
+
+        # A cursor only continues the request it was issued for
+        first = await call({"page_size": 100})
+        mismatch = await call({"period": "1y", "cursor": first["next_cursor"]})
+        assert "does not belong" in mismatch["error"]
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
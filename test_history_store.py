@@ -0,0 +1,159 @@
+import asyncio
+import json
+import time
+
+import pandas as pd
+import pytest
+
+import afinance_server
+from cache import DataCache
+from history_store import HistoryStore, adjustments_changed, merge_bars, period_covers, slice_period
+from ratelimit import RateLimiter
+
+
+def make_bars(start: str, closes, tz: str = "America/New_York") -> pd.DataFrame:
+    index = pd.date_range(start, periods=len(closes), freq="B", tz=tz, name="Date")
+    return pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 100.0}, index=index)
+
+
+def load_history(ticker, symbol: str, period: str, interval: str) -> pd.DataFrame:
+    return asyncio.run(afinance_server.load_history("get_historical_data", ticker, symbol, period, interval))
+
+
+class ScaledTicker:
+    """Fixture ticker whose upstream prices were re-adjusted, as after a split"""
+
+    def __init__(self, ticker, factor: float):
+        self.ticker = ticker
+        self.factor = factor
+
+    def history(self, **kwargs) -> pd.DataFrame:
+        bars = self.ticker.history(**kwargs)
+        bars[["Open", "High", "Low", "Close"]] *= self.factor
+        return bars
+
+
+def test_series_persist_across_restarts(tmp_path):
+    bars = make_bars("2024-01-01", [1.0, 2.0, 3.0])
+    store = HistoryStore(str(tmp_path))
+    store.write("aaa", "1d", bars, "1mo")
+
+    reopened = HistoryStore(str(tmp_path))
+    stored, meta = reopened.load("AAA", "1d")
+    pd.testing.assert_frame_equal(stored, bars, check_freq=False)
+    assert meta["period"] == "1mo" and meta["tz"] == "America/New_York" and meta["count"] == 3
+    assert reopened.disk_reads == 1 and reopened.load("AAA", "1d")[0] is stored and reopened.memory_hits == 1
+    assert reopened.load("BBB", "1d") == (None, {})
+
+
+def test_fresh_bars_win_when_merged():
+    stored = make_bars("2024-01-01", [1.0, 2.0, 3.0])
+    fresh = make_bars("2024-01-03", [30.0, 4.0])
+    merged = merge_bars(stored, fresh)
+    assert list(merged["Close"]) == [1.0, 2.0, 30.0, 4.0] and merged.index.is_monotonic_increasing
+    assert merge_bars(None, fresh) is not fresh and merge_bars(stored, fresh.iloc[:0]) is stored
+
+
+def test_adjustments_are_detected_on_settled_overlapping_bars():
+    stored = make_bars("2024-01-01", [1.0, 2.0, 3.0])
+    assert not adjustments_changed(stored, make_bars("2024-01-02", [2.0, 3.5, 4.0]))
+    assert adjustments_changed(stored, make_bars("2024-01-02", [1.0, 1.5, 2.0]))
+    # A single overlapping bar may still be forming, so it never counts
+    assert not adjustments_changed(stored, make_bars("2024-01-03", [9.0, 4.0]))
+
+
+def test_refreshes_fetch_only_the_tail_until_prices_are_readjusted():
+    afinance_server.data_cache = DataCache(ttls={"history": 0})
+    store = afinance_server.history_store
+    ticker = afinance_server.provider.ticker("AAA")
+
+    first = load_history(ticker, "AAA", "1y", "1d")
+    assert store.fetches == {"full": 1, "head": 0, "tail": 0}
+    again = load_history(ticker, "AAA", "1y", "1d")
+    pd.testing.assert_frame_equal(again, first)
+    assert store.fetches == {"full": 1, "head": 0, "tail": 1} and store.bars_fetched == len(first) + 2
+
+    split = load_history(ScaledTicker(ticker, 0.5), "AAA", "1y", "1d")
+    assert store.fetches == {"full": 2, "head": 0, "tail": 2}
+    assert list(split["Close"]) == pytest.approx(list(first["Close"] * 0.5))
+    assert list(store.read("AAA", "1d")["Close"]) == pytest.approx(list(first["Close"] * 0.5))
+
+
+def test_periods_cover_shorter_ones_and_slice_to_their_window():
+    assert period_covers("5y", "1y") and period_covers("max", "5d") and period_covers("1y", "1y")
+    assert not period_covers("1y", "5y") and not period_covers(None, "1y") and not period_covers("1y", "15m")
+
+    # Year to date is shorter than a month in early January and longer than six months by July
+    january, october = pd.Timestamp("2025-01-15"), pd.Timestamp("2025-10-15")
+    assert not period_covers("ytd", "6mo", january) and not period_covers("ytd", "1mo", january)
+    assert period_covers("ytd", "5d", january) and not period_covers("ytd", "5d", pd.Timestamp("2025-01-03"))
+    assert period_covers("ytd", "6mo", october) and period_covers("1y", "ytd", october) and not period_covers("ytd", "1y", october)
+    assert period_covers("6mo", "ytd", pd.Timestamp("2025-05-15")) and not period_covers("6mo", "ytd", october)
+
+    hourly = pd.DataFrame({"Close": range(200)}, index=pd.date_range("2024-01-01 09:30", periods=200, freq="h", tz="UTC"))
+    five_days = slice_period(hourly, "5d")
+    assert five_days.index.normalize().nunique() == 5 and five_days.index[-1] == hourly.index[-1]
+    today = pd.Timestamp.now(tz="UTC").normalize()
+    daily = pd.DataFrame({"Close": range(800)}, index=pd.date_range(end=today, periods=800, freq="D"))
+    assert slice_period(daily, "1y").index[0] == today - pd.DateOffset(years=1)
+    assert slice_period(daily, "max") is daily
+
+
+def test_one_series_serves_every_period():
+    store = afinance_server.history_store
+    ticker = afinance_server.provider.ticker("AAA")
+
+    year = load_history(ticker, "AAA", "1y", "1d")
+    two_years = load_history(ticker, "AAA", "2y", "1d")
+    # Widening the period backfills only the older bars
+    assert store.fetches == {"full": 1, "head": 1, "tail": 0} and store.bars_fetched == len(two_years)
+    assert two_years.index[-len(year):].equals(year.index) and store.meta("AAA", "1d")["period"] == "2y"
+
+    pd.testing.assert_frame_equal(load_history(ticker, "AAA", "6mo", "1d"), slice_period(two_years, "6mo"))
+    assert store.fetches == {"full": 1, "head": 1, "tail": 0}
+    # max has no calendar start, so it is fetched whole
+    load_history(ticker, "AAA", "max", "1d")
+    assert store.fetches == {"full": 2, "head": 1, "tail": 0} and store.meta("AAA", "1d")["period"] == "max"
+
+
+def test_every_upstream_fetch_takes_its_own_token():
+    afinance_server.data_cache = DataCache(ttls={"history": 0})
+    afinance_server.rate_limiter = RateLimiter(rate=1000, burst=100)
+    ticker = afinance_server.provider.ticker("AAA")
+
+    load_history(ticker, "AAA", "1y", "1d")
+    assert afinance_server.rate_limiter.granted == 1
+    # Backfilling the head and checking the tail are two requests
+    load_history(ticker, "AAA", "2y", "1d")
+    assert afinance_server.rate_limiter.granted == 3 and afinance_server.history_store.fetches["head"] == 1
+    # So are the tail check and the refetch after a re-adjustment
+    load_history(ScaledTicker(ticker, 0.5), "AAA", "2y", "1d")
+    assert afinance_server.rate_limiter.granted == 5 and afinance_server.history_store.fetches["full"] == 2
+
+
+def test_concurrent_periods_of_one_series_keep_each_others_bars(monkeypatch):
+    store = afinance_server.history_store
+    read = store.read
+
+    def slow_read(symbol, interval):
+        # Widen the gap between reading the stored series and writing the merge
+        stored = read(symbol, interval)
+        time.sleep(0.05)
+        return stored
+    monkeypatch.setattr(store, "read", slow_read)
+
+    async def call(period):
+        result = await afinance_server.call_tool("get_historical_data", {"symbol": "AAA", "period": period, "format": "compact", "page_size": 5000})
+        return json.loads(result[0].text)
+
+    async def run():
+        return await asyncio.gather(call("1y"), call("2y"))
+
+    year, two_years = asyncio.run(run())
+    stored = read("AAA", "1d")
+    assert two_years["total"] == len(slice_period(stored, "2y")) > year["total"] * 1.8
+    assert store.meta("AAA", "1d")["period"] == "2y"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,52 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_session import PooledSession
+from providers import YFinanceProvider
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_requests_reuse_pooled_connections():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    session = PooledSession(pool_size=4)
+    try:
+        for path in ["/v1/test/getcrumb", "/a", "/b", "/c", "/d"]:
+            assert session.get(url + path).status_code == 200
+    finally:
+        session.close()
+        server.shutdown()
+    stats = session.stats()
+    assert stats["requests"] == 5 and stats["errors"] == 0
+    assert stats["new_connections"] == 1 and stats["reused_connections"] == 4
+    assert stats["crumb_fetches"] == 1
+
+
+def test_yfinance_entry_points_share_the_session():
+    provider = YFinanceProvider()
+    # Constructing a ticker hands yfinance the session without touching the network
+    first = provider.ticker("AAPL")
+    second = provider.ticker("MSFT")
+    assert first._data._session is second._data._session is provider.session
+    assert provider.stats()["http"]["requests"] == 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
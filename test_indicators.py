@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import afinance_server
+from indicators import compute_indicator, parse_indicator, rsi
+
+
+def bars(closes) -> pd.DataFrame:
+    closes = np.asarray(closes, dtype="float64")
+    index = pd.bdate_range("2024-01-01", periods=len(closes))
+    return pd.DataFrame({"Open": closes, "High": closes + 1, "Low": closes - 1, "Close": closes, "Volume": 1.0}, index=index)
+
+
+def test_parse_indicator_fills_defaults_and_rejects_bad_specs():
+    assert parse_indicator("SMA:50") == ("sma", (50.0,))
+    assert parse_indicator("macd") == ("macd", (12.0, 26.0, 9.0))
+    assert parse_indicator("bollinger:20") == ("bollinger", (20.0, 2.0))
+    for spec, message in [("smaa", "Unknown indicator"), ("sma:x", "must be numbers"), ("rsi:14,2", "at most 1"), ("ema:0", "positive")]:
+        try:
+            parse_indicator(spec)
+        except ValueError as e:
+            assert message in str(e), str(e)
+        else:
+            raise AssertionError(f"{spec!r} should not parse")
+
+
+def test_indicator_values():
+    rising = bars(np.arange(1.0, 41.0))
+    assert compute_indicator(rising, "sma", (5.0,))["sma"][-1] == 38.0
+    assert np.isnan(compute_indicator(rising, "sma", (5.0,))["sma"][3])
+    assert rsi(rising["Close"]).iloc[-1] == 100.0
+
+    band = compute_indicator(bars([1.0, 3.0] * 10), "bollinger", (4.0, 2.0))
+    assert (band["middle"][-1], band["upper"][-1], band["lower"][-1]) == (2.0, 4.0, 0.0)
+
+    drawdown = compute_indicator(bars([10.0, 20.0, 15.0, 18.0]), "drawdown", ())
+    assert np.allclose(drawdown["drawdown"], [0.0, 0.0, -25.0, -10.0])
+    assert drawdown["max_drawdown"][-1] == -25.0
+
+    # High-low range is 2 and closes never gap, so ATR converges to 2
+    assert np.isclose(compute_indicator(rising, "atr", (14.0,))["atr"][-1], 2.0)
+    levels = compute_indicator(rising, "levels", (10.0,))
+    assert (levels["support"][-1], levels["resistance"][-1]) == (30.0, 41.0)
+
+
+def test_get_indicators_memoizes_per_series():
+
+    async def call(arguments):
+        result = await afinance_server.call_tool("get_indicators", {"format": "compact", **arguments})
+        return json.loads(result[0].text)
+
+    async def run():
+        first = await call({"symbols": ["AAA", "aaa", "ZZZ"], "indicators": ["sma:20", "rsi"], "points": 5})
+        assert list(first["results"]) == ["AAA"] and "ZZZ" in first["failed_symbols"]
+        report = first["results"]["AAA"]["indicators"]
+        assert set(report) == {"sma:20", "rsi:14"}
+        assert len(report["sma:20"]["series"]["sma"]) == 5 == len(report["sma:20"]["series"]["date"])
+        assert report["sma:20"]["sma"] == report["sma:20"]["series"]["sma"][-1]
+
+        hits = afinance_server.data_cache.hits
+        second = await call({"symbols": ["AAA"], "indicators": ["sma:20", "rsi"], "points": 5})
+        assert second["results"] == first["results"]
+        assert afinance_server.data_cache.hits >= hits + 2
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
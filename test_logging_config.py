@@ -0,0 +1,72 @@
+import asyncio
+import json
+import logging
+import os
+
+import pytest
+
+import afinance_server
+from logging_config import configure_logging, parse_levels, request_context
+
+
+def log_to_file(directory, emit, **options) -> str:
+    """Call emit() with logging configured to a file in directory, flush it and restore the previous setup; returns the path"""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    directory.mkdir()
+    path = os.path.join(str(directory), "server.log")
+    listener = configure_logging(path=path, stream=False, **options)
+    try:
+        emit()
+    finally:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+    return path
+
+
+def test_json_records_carry_request_ids_and_timings(tmp_path):
+
+    async def run():
+        await afinance_server.call_tool("get_historical_data", {"symbol": "AAA", "period": "1y"})
+        # Records logged on the dispatcher pool keep the request they were logged under
+        token = request_context.set({"request_id": "test-1", "tool": "test"})
+        await afinance_server.dispatcher.run("test", lambda: logging.getLogger("worker").info("on %s", "pool"))
+        request_context.reset(token)
+
+    path = log_to_file(tmp_path / "logs", lambda: asyncio.run(run()), fmt="json")
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+
+    access = [record for record in records if record["logger"] == "afinance_server.access"]
+    assert len(access) == 1 and access[0]["tool"] == "get_historical_data" and access[0]["request_id"]
+    assert access[0]["error"] is None and access[0]["bytes"] > 0 and access[0]["elapsed_ms"] >= 0
+    worker = [record for record in records if record["logger"] == "worker"]
+    assert len(worker) == 1 and worker[0]["message"] == "on pool" and worker[0]["request_id"] == "test-1"
+
+
+def test_levels_and_rotation(tmp_path):
+    assert parse_levels("yfinance=warning, a.b=DEBUG,,bad") == {"yfinance": "WARNING", "a.b": "DEBUG"}
+    quiet, chatty = logging.getLogger("test.quiet"), logging.getLogger("test.chatty")
+
+    def emit():
+        for i in range(50):
+            quiet.info("quiet %d", i)
+            chatty.debug("chatty %d %s", i, "x" * 50)
+
+    path = log_to_file(tmp_path / "logs", emit, level="INFO", levels="test.quiet=WARNING,test.chatty=DEBUG", max_bytes=500, backups=2)
+    quiet.setLevel(logging.NOTSET)
+    chatty.setLevel(logging.NOTSET)
+
+    directory = os.path.dirname(path)
+    assert sorted(os.listdir(directory)) == ["server.log", "server.log.1", "server.log.2"]
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        assert lines and all(" - test.chatty - DEBUG - chatty " in line for line in lines)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
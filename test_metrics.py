@@ -0,0 +1,72 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import afinance_server
+from metrics import CallTimer, Histogram
+
+
+def test_histogram_quantiles_and_overlapping_phases():
+    histogram = Histogram((0.01, 0.1, 1))
+    for value in [0.005] * 50 + [0.05] * 45 + [0.5] * 5:
+        histogram.observe(value)
+    assert histogram.counts == [50, 45, 5, 0]
+    assert histogram.quantile(0.5) <= 0.01 < histogram.quantile(0.95) <= 0.1
+    assert histogram.quantile(0.99) <= histogram.max == 0.5
+
+    call = CallTimer("get_multiple_quotes")
+    with call.phase("upstream"):
+        # A nested span of the same phase (a concurrent fetch) does not count twice
+        with call.phase("upstream"):
+            time.sleep(0.02)
+        time.sleep(0.01)
+    phases = call.phases(0.05)
+    assert 0.03 <= phases["upstream"] < 0.045
+    assert abs(sum(phases.values()) - 0.05) < 1e-9
+
+
+def test_tool_calls_are_timed_by_phase():
+
+    async def call(name, arguments):
+        return (await afinance_server.call_tool(name, {"format": "compact", **arguments}))[0].text
+
+    async def run():
+        await asyncio.gather(*[call("get_stock_info", {"symbol": "AAA"}) for _ in range(3)])
+        await call("get_historical_data", {"symbol": "AAA", "period": "1y"})
+        await call("get_historical_data", {"symbol": "AAA", "format": "xml"})
+        snapshot = json.loads(await call("get_server_metrics", {}))
+        text = await call("get_server_metrics", {"prometheus": True})
+        return snapshot, text
+
+    snapshot, text = asyncio.run(run())
+    info = snapshot["tools"]["get_stock_info"]
+    assert info["calls"] == 3 and info["executed"] == 1 and info["coalesced"] == 2
+    assert info["max_in_flight"] == 3 and info["payload_bytes"]["total"] > 0
+    assert info["phases_ms"]["upstream"]["count"] == 1
+
+    history = snapshot["tools"]["get_historical_data"]
+    assert history["calls"] == 2 and history["errors"] == 1
+    assert history["phases_ms"]["serialize"]["max"] > 0
+
+    assert 'yf_tool_calls_total{tool="get_stock_info"} 3' in text
+    assert 'yf_tool_latency_seconds_bucket{tool="get_historical_data",le="+Inf"} 2' in text
+    assert 'yf_tool_phase_seconds_count{tool="get_stock_info",phase="upstream"} 1' in text
+    assert 'yf_rate_limiter_queue_depth{priority="interactive"} 0' in text
+
+
+def test_upstream_time_is_recorded_once_inside_shared_fetches():
+    afinance_server.provider.latency = 0.05
+
+    async def run():
+        await afinance_server.call_tool("get_historical_data", {"symbol": "AAA", "period": "1mo"})
+        return afinance_server.metrics.snapshot()["tools"]["get_historical_data"]
+
+    history = asyncio.run(run())
+    upstream = history["phases_ms"]["upstream"]
+    assert upstream["count"] == 1 and 50 <= upstream["max"] <= history["latency_ms"]["max"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import afinance_server
+from portfolio import max_drawdowns, pairwise_covariance, portfolio_analytics
+from providers import FixtureProvider, generate_fixtures
+
+
+def make_closes() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    market = rng.normal(0.0005, 0.01, 300)
+    returns = {"^GSPC": market, "LEVERED": 2 * market, "OTHER": rng.normal(0, 0.02, 300)}
+    closes = pd.DataFrame({symbol: 100 * np.cumprod(1 + r) for symbol, r in returns.items()},
+                          index=pd.bdate_range("2023-01-02", periods=300))
+    # A late listing only shortens its own pairs
+    closes.iloc[:150, closes.columns.get_loc("OTHER")] = np.nan
+    return closes
+
+
+def test_pairwise_covariance_matches_pandas():
+    returns = make_closes().pct_change(fill_method=None).iloc[1:]
+    pairs = pairwise_covariance(returns.to_numpy())
+    assert np.allclose(pairs["covariance"], returns.cov().to_numpy())
+    assert np.allclose(pairs["correlation"], returns.corr().to_numpy())
+    assert pairs["count"][2, 0] == 149
+    assert np.allclose(max_drawdowns(np.array([[10.0], [20.0], [15.0], [18.0]])), [-25.0])
+
+
+def test_beta_sharpe_and_weighted_portfolio():
+    result = portfolio_analytics(make_closes(), ["LEVERED", "OTHER"], "^GSPC", weights={"LEVERED": 1, "^GSPC": 1})
+    assert result["symbols"] == ["LEVERED", "OTHER", "^GSPC"]
+    assert result["stats"]["^GSPC"]["beta"] == 1.0
+    assert result["stats"]["LEVERED"]["beta"] == 2.0
+    assert result["correlation"]["LEVERED"]["^GSPC"] == 1.0
+    assert result["stats"]["OTHER"]["observations"] == 149
+    assert result["stats"]["LEVERED"]["max_drawdown"] < result["stats"]["^GSPC"]["max_drawdown"] < 0
+    assert result["portfolio"]["weights"] == {"LEVERED": 0.5, "^GSPC": 0.5}
+    # Half 2x, half 1x the market: 1.5x its volatility
+    assert np.isclose(result["portfolio"]["annual_volatility"], 1.5 * result["stats"]["^GSPC"]["annual_volatility"], rtol=1e-3)
+
+
+def test_get_portfolio_analytics_uses_one_download(tmp_path):
+    fixtures = str(tmp_path / "portfolio")
+    generate_fixtures(["AAA", "BBB", "^GSPC"], fixtures, years=2)
+    provider = FixtureProvider(fixtures)
+    downloads = []
+    download = provider.download
+    provider.download = lambda symbols, **kwargs: downloads.append(symbols) or download(symbols, **kwargs)
+    afinance_server.provider = provider
+
+    async def run():
+        arguments = {"symbols": ["AAA", "bbb", "ZZZ"], "period": "1y", "format": "compact"}
+        result = json.loads((await afinance_server.call_tool("get_portfolio_analytics", arguments))[0].text)
+        assert result["symbols"] == ["AAA", "BBB", "ZZZ", "^GSPC"]
+        assert result["missing_symbols"] == ["ZZZ"]
+        assert result["stats"]["AAA"]["observations"] > 200
+        assert -1 <= result["correlation"]["AAA"]["BBB"] <= 1
+        await afinance_server.call_tool("get_portfolio_analytics", arguments)
+        assert downloads == [["AAA", "BBB", "ZZZ", "^GSPC"]]
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("benchmark", [None, ""])
+def test_get_portfolio_analytics_without_a_benchmark(tmp_path, benchmark):
+    fixtures = str(tmp_path / "portfolio")
+    generate_fixtures(["AAA", "BBB"], fixtures, years=1)
+    afinance_server.provider = FixtureProvider(fixtures)
+
+    arguments = {"symbols": ["AAA", "BBB"], "benchmark": benchmark, "period": "6mo", "format": "compact"}
+    result = json.loads(asyncio.run(afinance_server.call_tool("get_portfolio_analytics", arguments))[0].text)
+    assert "error" not in result
+    assert result["symbols"] == ["AAA", "BBB"] and result["stats"]["AAA"]["beta"] is None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import afinance_server
+import profiling
+from profiling import Profiler
+
+
+def test_sampled_calls_write_rotating_profiles(tmp_path):
+    directory = str(tmp_path / "captures")
+    afinance_server.profiler = profiler = Profiler(sample_rate=0, directory=directory, keep=2)
+
+    async def call(name, arguments):
+        return json.loads((await afinance_server.call_tool(name, {"format": "compact", **arguments}))[0].text)
+
+    async def run():
+        await call("get_historical_data", {"symbol": "AAA", "period": "1y"})
+        assert profiler.captured == 0
+
+        config = await call("set_profiling", {"sample_rate": 1, "tools": ["get_historical_data"]})
+        assert config["sample_rate"] == 1 and config["tools"] == ["get_historical_data"]
+        await call("get_stock_info", {"symbol": "AAA"})
+        for period in ["6mo", "2y", "max"]:
+            await call("get_historical_data", {"symbol": "AAA", "period": period})
+
+        error = await call("set_profiling", {"sample_rate": 2})
+        assert "between 0 and 1" in error["error"]
+
+    asyncio.run(run())
+    assert profiler.captured == 3
+    # Only the newest two captures are kept
+    names = profiler.captures()
+    assert len(names) == 2 and all(name.endswith("get_historical_data") for name in names)
+    assert sorted(os.listdir(directory)) == sorted(f"{name}{extension}" for name in names for extension in (".prof", ".txt"))
+
+    with open(os.path.join(directory, names[-1] + ".txt"), encoding="utf-8") as f:
+        report = f.read()
+    assert '"period": "max"' in report
+    # Work done on the dispatcher pool is merged into the profile
+    assert "worker thread calls: 0" not in report and "load_history" in report
+    assert "allocations still alive" in report
+
+
+@pytest.mark.parametrize("thread_profiles", [True, False])
+def test_every_call_sampled_still_answers(monkeypatch, tmp_path, thread_profiles):
+    # Python 3.12+ takes the single-profiler path; exercise both on any version
+    monkeypatch.setattr(profiling, "THREAD_PROFILES", thread_profiles)
+    afinance_server.profiler = profiler = Profiler(sample_rate=1.0, directory=str(tmp_path))
+
+    async def run():
+        calls = [
+            ("get_stock_info", {"symbol": "AAA"}),
+            ("get_historical_data", {"symbol": "AAA"}),
+            ("get_indicators", {"symbols": ["AAA"]}),
+        ]
+        return [
+            json.loads((await afinance_server.call_tool(name, {"format": "compact", **arguments}))[0].text)
+            for name, arguments in calls
+        ]
+
+    results = asyncio.run(run())
+    assert all("error" not in result for result in results)
+    assert profiler.captured == 3 and len(profiler.captures()) == 3
+    for name in profiler.captures():
+        with open(os.path.join(str(tmp_path), name + ".txt"), encoding="utf-8") as f:
+            assert "worker thread calls: 0" not in f.read()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from providers import DataProvider, FixtureProvider, generate_fixtures, get_provider
+
+
+class TickerOnlyProvider(DataProvider):
+    name = "partial"
+
+    def ticker(self, symbol: str):
+        return None
+
+
+def test_partial_providers_fail_at_construction():
+    with pytest.raises(TypeError, match="download"):
+        TickerOnlyProvider()
+    with pytest.raises(TypeError):
+        DataProvider()
+    with pytest.raises(ValueError, match="Unknown data provider"):
+        get_provider("nope")
+
+
+def test_fixture_provider_replays_history_download_and_search(tmp_path):
+    generate_fixtures(["AAA", "BBB"], str(tmp_path / "replay"), years=2)
+    provider = FixtureProvider(str(tmp_path / "replay"))
+    assert provider.symbols() == ["AAA", "BBB"]
+
+    year = provider.ticker("aaa").history(period="1y")
+    assert not year.empty and year.index[0] >= year.index[-1] - pd.DateOffset(years=1)
+    # Aligned to the current week, so relative periods behave as live
+    assert (pd.Timestamp.now(tz=year.index.tz) - year.index[-1]).days < 7
+    start = year.index[-10]
+    assert list(provider.ticker("AAA").history(start=start).index) == list(year.index[-10:])
+
+    bars = provider.download(["AAA", "BBB", "MISSING"], period="5d")
+    assert list(bars["Close"].columns) == ["AAA", "BBB"] and len(bars) <= 5
+    assert [match["symbol"] for match in provider.search("bb")] == ["BBB"]
+    assert provider.ticker("MISSING").history().empty
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
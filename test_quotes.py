@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pytest
+
+import afinance_server
+from providers import FixtureProvider, generate_fixtures
+
+
+class DownloadCountingProvider(FixtureProvider):
+    def __init__(self, directory: str, fail: bool = False):
+        super().__init__(directory)
+        self.fail = fail
+        self.downloads = []
+
+    def download(self, symbols, period="5d", interval="1d"):
+        self.downloads.append(list(symbols))
+        if self.fail:
+            raise ConnectionError("download unavailable")
+        return super().download(symbols, period, interval)
+
+
+def quotes(arguments):
+
+    async def run():
+        result = await afinance_server.call_tool("get_multiple_quotes", {"format": "compact", **arguments})
+        return json.loads(result[0].text)["quotes"]
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def provider(tmp_path):
+    generate_fixtures(["AAA", "BBB"], str(tmp_path / "quotes"), years=1)
+    afinance_server.provider = DownloadCountingProvider(str(tmp_path / "quotes"))
+    return afinance_server.provider
+
+
+def test_prices_come_from_one_bulk_download(provider):
+    result = quotes({"symbols": ["AAA", "bbb", "AAA"]})
+    # By default the download is the only upstream call; no per-symbol info is read
+    assert provider.downloads == [["AAA", "BBB", "AAA"]] and provider.upstream_calls == 1
+    closes = provider.ticker("AAA").history(period="5d")["Close"]
+    assert result["AAA"]["current_price"] == pytest.approx(closes.iloc[-1])
+    assert result["AAA"]["previous_close"] == pytest.approx(closes.iloc[-2])
+    assert set(result["BBB"]) == {"symbol", "current_price", "previous_close", "change", "change_percent"}
+
+    # Cached quotes skip the download; fundamentals still need each symbol's info
+    result = quotes({"symbols": ["AAA", "BBB"], "include_fundamentals": True})
+    assert provider.downloads == [["AAA", "BBB", "AAA"]] and result["AAA"]["name"]
+
+
+def test_a_failed_download_falls_back_to_per_symbol_info(provider):
+    provider.fail = True
+    result = quotes({"symbols": ["AAA", "BBB"]})
+    info = provider.ticker("AAA").info
+    # Retried as a transient error, then given up on
+    assert provider.downloads[0] == ["AAA", "BBB"]
+    assert result["AAA"]["current_price"] == info["currentPrice"] and result["AAA"]["previous_close"] == info["previousClose"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
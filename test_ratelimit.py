@@ -0,0 +1,77 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import afinance_server
+from ratelimit import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RateLimiter, is_rate_limited
+
+
+def test_tokens_refill_at_the_configured_rate():
+    limiter = RateLimiter(rate=50, burst=5)
+
+    async def run():
+        start_time = time.monotonic()
+        await asyncio.gather(*[limiter.acquire("get_stock_info") for _ in range(15)])
+        return time.monotonic() - start_time
+
+    # 5 from the burst, then 10 more at 50/s
+    elapsed = asyncio.run(run())
+    assert 0.18 <= elapsed < 0.5
+    stats = limiter.stats()
+    assert stats["granted"] == 15 and stats["max_queue_depth"] == 10
+    assert stats["waits"]["interactive"]["queued"] == 10
+
+
+def test_interactive_calls_jump_the_queue():
+    limiter = RateLimiter(rate=100, burst=1, priorities={"refresh": PRIORITY_BACKGROUND, "quote": PRIORITY_INTERACTIVE})
+    order = []
+
+    async def call(tool: str, label: str):
+        await limiter.acquire(tool)
+        order.append(label)
+
+    async def run():
+        await limiter.acquire("refresh")
+        background = [asyncio.create_task(call("refresh", f"refresh{i}")) for i in range(5)]
+        await asyncio.sleep(0)
+        assert limiter.queue_depth()["background"] == 5
+        quotes = [asyncio.create_task(call("quote", f"quote{i}")) for i in range(2)]
+        await asyncio.gather(*background, *quotes)
+
+    asyncio.run(run())
+    assert order[:2] == ["quote0", "quote1"]
+    assert order[2:] == [f"refresh{i}" for i in range(5)]
+
+
+def test_upstream_429_pauses_every_caller():
+    assert is_rate_limited(Exception("Too Many Requests. Rate limited. Try after a while."))
+    assert is_rate_limited(Exception("HTTP Error 429"))
+    assert not is_rate_limited(ValueError("No data found for 429.HK"))
+
+    afinance_server.rate_limiter = limiter = RateLimiter(rate=1000, burst=10, cooldown=0.3)
+    provider = afinance_server.provider
+    load = provider.load
+    responses = iter([Exception("Too Many Requests. Rate limited.")])
+
+    def throttled(symbol, dataset):
+        error = next(responses, None)
+        if error is not None:
+            raise error
+        return load(symbol, dataset)
+    provider.load = throttled
+
+    async def run():
+        start_time = time.monotonic()
+        result = await afinance_server.call_tool("get_stock_info", {"symbol": "AAA", "format": "compact"})
+        return json.loads(result[0].text), time.monotonic() - start_time
+
+    info, elapsed = asyncio.run(run())
+    # The retry waited out the cooldown instead of hammering upstream
+    assert "error" not in info and elapsed >= 0.3
+    assert limiter.throttled == 1 and afinance_server.resilience.retries == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import afinance_server
+from history_store import HistoryStore
+from resampling import downsample_bars, lttb_indices, resample_bars
+
+
+def daily_bars(days: int = 30) -> pd.DataFrame:
+    index = pd.bdate_range("2024-01-01", periods=days, tz="America/New_York")
+    closes = np.arange(1.0, days + 1)
+    return pd.DataFrame({"Open": closes, "High": closes + 1, "Low": closes - 1, "Close": closes, "Volume": 10.0}, index=index)
+
+
+def test_resample_aggregates_ohlcv_into_calendar_buckets():
+    weekly = resample_bars(daily_bars(), "1wk")
+    # 2024-01-01 is a Monday: each week is labelled with its Monday like yfinance's weekly bars
+    assert weekly.index[0] == pd.Timestamp("2024-01-01", tz="America/New_York")
+    first = weekly.iloc[0]
+    assert (first["Open"], first["High"], first["Low"], first["Close"], first["Volume"]) == (1.0, 6.0, 0.0, 5.0, 50.0)
+    monthly = resample_bars(daily_bars(), "1mo")
+    assert len(monthly) == 2 and monthly["Volume"].sum() == 300.0
+    try:
+        resample_bars(weekly, "1d", "1wk")
+    except ValueError as e:
+        assert "finer interval" in str(e)
+    else:
+        raise AssertionError("resampling to a finer interval should fail")
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    values = np.zeros(1000)
+    values[437] = 50.0
+    values[800] = -20.0
+    kept = lttb_indices(values, 20)
+    assert len(kept) == 20 and kept[0] == 0 and kept[-1] == 999
+    assert 437 in kept and 800 in kept
+    assert (np.diff(kept) > 0).all()
+    assert len(downsample_bars(daily_bars(10), 50)) == 10
+
+
+def test_coarse_intervals_come_from_stored_daily_bars():
+
+    async def call(arguments):
+        result = await afinance_server.call_tool("get_historical_data", {"symbol": "AAA", "period": "max", "format": "compact", **arguments})
+        return json.loads(result[0].text)
+
+    async def run():
+        daily = await call({"interval": "1d"})
+        fetches = afinance_server.history_store.stats()["fetches"]
+        weekly = await call({"interval": "1wk"})
+        assert afinance_server.history_store.stats()["fetches"] == fetches
+        assert weekly["source_interval"] == "1d" and weekly["source_bars"] == daily["total"]
+        assert weekly["total"] < daily["total"]
+
+        chart = await call({"interval": "1d", "points": 100})
+        assert chart["count"] == 100
+        assert chart["start"] == daily["start"] and chart["end"] == daily["end"]
+
+        for points in [2, 0, "100", 99.5, True]:
+            error = await call({"interval": "1d", "points": points})
+            assert error["error_type"] == "ValueError" and "at least 3" in error["error"]
+
+    asyncio.run(run())
+
+
+
+def test_stored_metadata_is_read_without_loading_bars():
+    async def run():
+        await afinance_server.call_tool("get_historical_data", {"symbol": "AAA", "period": "max"})
+    asyncio.run(run())
+
+    store = HistoryStore(afinance_server.history_store.root)
+    assert store.meta("AAA", "1d")["period"] == "max"
+    assert store.stats()["disk_reads"] == 0 and store.stats()["series_in_memory"] == 0
+    assert store.meta("AAA", "1wk") == {}
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import afinance_server
+from cache import DataCache
+from dispatch import Dispatcher
+from resilience import CircuitBreaker, CircuitOpenError, Resilience, is_transient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def no_sleep(delay: float):
+    pass
+
+
+def flaky(failures: int, error: Exception = ConnectionError("Connection reset by peer")):
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error
+        return "ok"
+    return attempt, calls
+
+
+def test_transient_errors_are_retried_and_others_are_not():
+    resilience = Resilience(attempts=3, sleep=no_sleep)
+    attempt, calls = flaky(2)
+    assert asyncio.run(resilience.call(attempt, deadline=5)) == "ok"
+    assert len(calls) == 3 and resilience.retries == 2
+
+    attempt, calls = flaky(1, KeyError("regularMarketPrice"))
+    try:
+        asyncio.run(resilience.call(attempt, deadline=5))
+    except KeyError:
+        pass
+    assert len(calls) == 1 and resilience.breaker.state == "closed"
+    assert is_transient(Exception("HTTP Error 503: Service Unavailable"))
+    assert not is_transient(ValueError("No data found for ZZZZ"))
+
+
+def test_breaker_opens_fails_fast_and_recovers_after_a_probe():
+    clock = FakeClock()
+    resilience = Resilience(CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock), attempts=1, sleep=no_sleep)
+    for _ in range(2):
+        attempt, _ = flaky(1)
+        try:
+            asyncio.run(resilience.call(attempt, deadline=5))
+        except ConnectionError:
+            pass
+    assert resilience.breaker.state == "open"
+
+    attempt, calls = flaky(0)
+    try:
+        asyncio.run(resilience.call(attempt, deadline=5))
+    except CircuitOpenError as e:
+        assert "retrying in 30s" in str(e)
+    assert calls == [] and resilience.short_circuits == 1
+
+    clock.now += 30
+    assert asyncio.run(resilience.call(attempt, deadline=5)) == "ok"
+    assert resilience.breaker.state == "closed"
+
+
+def test_waiting_for_a_worker_slot_is_not_an_upstream_timeout():
+    afinance_server.dispatcher.shutdown()
+    afinance_server.dispatcher = Dispatcher(max_workers=4, concurrency={"slow": 1}, timeouts={"slow": 0.25})
+
+    async def run():
+        return await asyncio.gather(*[afinance_server.call_upstream("slow", time.sleep, 0.1) for _ in range(8)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    # Each call queues behind the others for up to 0.7s, well past its 0.25s deadline, and still succeeds
+    assert results == [None] * 8
+    assert afinance_server.resilience.breaker.state == "closed" and afinance_server.resilience.failures == 0
+
+
+def test_stale_cache_is_served_and_flagged_while_upstream_is_down():
+    afinance_server.data_cache = DataCache(ttls={"info": 0})
+    afinance_server.resilience = Resilience(CircuitBreaker(failure_threshold=1), attempts=2, sleep=no_sleep)
+    provider = afinance_server.provider
+
+    async def call(name, arguments):
+        return json.loads((await afinance_server.call_tool(name, {"format": "compact", **arguments}))[0].text)
+
+    async def run():
+        fresh = await call("get_stock_info", {"symbol": "AAA"})
+        assert "stale" not in fresh
+
+        def down(symbol, dataset):
+            raise ConnectionError("Connection refused")
+        provider.load = down
+
+        stale = await call("get_stock_info", {"symbol": "AAA"})
+        assert stale["stale"] is True and "info:AAA" in stale["stale_age_seconds"]
+        assert stale["current_price"] == fresh["current_price"]
+
+        # Nothing cached to fall back on: a short, structured error instead of a traceback
+        error = await call("get_stock_info", {"symbol": "BBB"})
+        assert error["error_type"] == "CircuitOpenError" and error["retryable"] is True
+        assert "traceback" not in error
+
+        upstream = (await call("get_cache_stats", {}))["upstream"]
+        assert upstream["circuit_breaker"]["state"] == "open"
+        assert upstream["stale_served"] == 1 and upstream["short_circuited"] >= 1
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import afinance_server
+from fundamentals_store import normalize_statement
+from screener import build_table, compile_query, parse, run_screen
+
+
+def make_table() -> pd.DataFrame:
+    return pd.DataFrame({
+        "Return on equity": [25.0, 10.0, 30.0, np.nan],
+        "Debt to equity": [0.2, 0.1, 0.9, 0.1],
+        "Price to Earning": [15.0, 30.0, 25.0, 12.0],
+        "Dividend yield": [1.0, 4.0, 0.0, np.nan],
+        "Operating profit": [20.0, 5.0, 30.0, 1.0],
+        "Sales": [100.0, 50.0, 100.0, 0.0],
+        "Market Capitalization": [3e9, 1e9, 2e9, 5e8],
+    }, index=["AAA", "BBB", "CCC", "DDD"])
+
+
+def test_parse_multi_word_fields_and_precedence():
+    assert parse("Return on equity > 15 AND Debt to equity < 0.5") == (
+        "binary", "AND",
+        ("binary", ">", ("field", "Return on equity"), ("number", 15.0)),
+        ("binary", "<", ("field", "Debt to equity"), ("number", 0.5)),
+    )
+    # Case-insensitive names, numbers inside names, * before +
+    assert parse("sales growth 10years > 1 + 2 * 3") == (
+        "binary", ">",
+        ("field", "Sales growth 10Years"),
+        ("binary", "+", ("number", 1.0), ("binary", "*", ("number", 2.0), ("number", 3.0))),
+    )
+
+
+def test_parse_errors_are_descriptive():
+    for query, message in [
+        ("Retrun on equity > 15", "did you mean 'Return on equity'"),
+        ("Sales >", "Unexpected end"),
+        ("(Sales > 1", "Missing ')'"),
+        ("Sales $ 3", "Unexpected character '$'"),
+    ]:
+        try:
+            compile_query(query)
+        except ValueError as e:
+            assert message in str(e), str(e)
+        else:
+            raise AssertionError(f"{query!r} should not compile")
+
+
+def test_examples_evaluate_vectorized():
+    table = make_table()
+    assert compile_query("Return on equity > 15 AND Debt to equity < 0.5").mask(table).tolist() == [True, False, False, False]
+    assert compile_query("Price to Earning < 20 OR Dividend yield > 3").mask(table).tolist() == [True, True, False, True]
+    # Derived fields compile through their own expressions; x/0 and NaN never match
+    assert compile_query("OPM > 25").mask(table).tolist() == [False, False, True, False]
+
+
+def test_run_screen_sorts_and_reports_unavailable_fields():
+    result = run_screen(make_table(), "Debt to equity < 1 AND Piotroski score < 100 OR Sales > 0",
+                        sort_by="Market Capitalization", limit=2)
+    assert result["matched"] == 3
+    assert [row["symbol"] for row in result["results"]] == ["AAA", "CCC"]
+    assert result["unavailable_fields"] == ["Piotroski score"]
+
+
+def test_build_table_reads_statement_periods_newest_first():
+    periods = pd.to_datetime(["2022-12-31", "2024-12-31", "2023-12-31"])
+    income = pd.concat([
+        normalize_statement("AAA", pd.DataFrame([[80.0, 120.0, 100.0]], index=["Total Revenue"], columns=periods)),
+        normalize_statement("BBB", pd.DataFrame([[7.0]], index=["Total Revenue"], columns=periods[:1])),
+    ])
+    quotes = pd.DataFrame({"returnOnEquity": [0.2], "debtToEquity": [50.0]}, index=["AAA"])
+    table = build_table({"income_stmt": income}, quotes)
+    assert table.loc["AAA", "Sales"] == 120.0
+    assert table.loc["AAA", "Sales preceding year"] == 100.0
+    assert table.loc["BBB", "Sales"] == 7.0
+    assert np.isnan(table.loc["BBB", "Sales preceding year"])
+    assert table.loc["AAA", "Return on equity"] == 20.0
+    assert table.loc["AAA", "Debt to equity"] == 0.5
+
+
+def test_run_screener_screens_on_the_dispatcher_pool(monkeypatch):
+    threads = []
+    frame = afinance_server.screener_table.frame
+
+    def recording_frame(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return frame(*args, **kwargs)
+    monkeypatch.setattr(afinance_server.screener_table, "frame", recording_frame)
+
+    arguments = {"query": "Sales > 0 AND Current price > 0", "symbols": ["AAA"], "format": "compact"}
+    result = json.loads(asyncio.run(afinance_server.call_tool("run_screener", arguments))[0].text)
+    assert result["matched"] == 1
+    assert len(threads) == 1 and threads[0].startswith("yf-dispatch")
+
+
+def test_price_history_freshness_is_checked_on_the_pool(monkeypatch):
+    threads = []
+    fetched_at = afinance_server.history_store.fetched_at
+
+    def recording_fetched_at(*args):
+        threads.append(threading.current_thread().name)
+        return fetched_at(*args)
+    monkeypatch.setattr(afinance_server.history_store, "fetched_at", recording_fetched_at)
+
+    arguments = {"query": "Return over 1month > -100", "symbols": ["AAA"], "format": "compact"}
+    for _ in range(2):
+        result = json.loads(asyncio.run(afinance_server.call_tool("run_screener", arguments))[0].text)
+        assert result["matched"] == 1
+    assert threads and all(name.startswith("yf-dispatch") for name in threads)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,93 @@
+import asyncio
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import afinance_server
+import serialization
+from serialization import dumps, format_dates, history_columns, history_records, render
+
+PAYLOAD = {
+    "symbol": "AAA",
+    "name": "Société Générale",
+    "price": 12.5,
+    "pe": float("nan"),
+    "bounds": [float("inf"), -float("inf"), 0.25],
+    "volume": np.int64(1200),
+    "beta": np.float64("nan"),
+    "closes": np.array([1.5, np.nan, 2.0]),
+    "listed": np.bool_(True),
+    "as_of": datetime.datetime(2024, 1, 2, 3, 4, 5),
+    "date": datetime.date(2024, 1, 2),
+    "stamp": pd.Timestamp("2024-01-02 03:04:05"),
+    "by_year": {2024: 1.0, 2023: float("nan")},
+    "empty": {},
+    "rows": [{"a": 1, "b": None}, {"a": 2, "b": "x"}],
+}
+
+
+@pytest.mark.parametrize("indent", [False, True])
+def test_orjson_and_standard_library_agree(monkeypatch, indent):
+    pytest.importorskip("orjson")
+    fast = dumps(PAYLOAD, indent=indent)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert dumps(PAYLOAD, indent=indent) == fast
+
+
+def test_non_finite_floats_become_null(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    decoded = json.loads(dumps(PAYLOAD), parse_constant=lambda token: pytest.fail(f"{token} is not JSON"))
+    assert decoded["pe"] is None and decoded["bounds"] == [None, None, 0.25]
+    assert decoded["beta"] is None and decoded["closes"] == [1.5, None, 2.0]
+    assert decoded["by_year"] == {"2024": 1.0, "2023": None}
+    assert decoded["volume"] == 1200 and decoded["listed"] is True and decoded["as_of"] == "2024-01-02T03:04:05"
+    # Payloads without them take the single-pass path unchanged
+    assert render({"price": 1.0, "rows": [{"a": 1}]}, "compact") == '{"price":1.0,"rows":[{"a":1}]}'
+
+
+def iterrows_records(hist: pd.DataFrame):
+    """The per-row loop history_records replaced"""
+    return [{
+        "date": date.strftime("%Y-%m-%d"),
+        "open": float(row["Open"]),
+        "high": float(row["High"]),
+        "low": float(row["Low"]),
+        "close": float(row["Close"]),
+        "volume": int(row["Volume"]) if "Volume" in row else 0,
+    } for date, row in hist.iterrows()]
+
+
+def test_history_records_match_the_per_row_loop():
+    # Late-evening bars in New York fall on the next UTC day, so dates must stay in exchange time
+    index = pd.date_range("2024-03-08 20:00", periods=4, freq="D", tz="America/New_York")
+    hist = pd.DataFrame({"Open": [1.0, 2, 3, 4], "High": 5.0, "Low": 0.5, "Close": [1.5, 2.5, 3.5, 4.5], "Volume": [10, 20, 30, 40]}, index=index)
+    assert history_records(hist) == iterrows_records(hist)
+    assert history_records(hist.drop(columns="Volume")) == iterrows_records(hist.drop(columns="Volume"))
+    assert format_dates(index[:1], unit="m") == ["2024-03-08T20:00"]
+
+    columns = history_columns(hist)
+    assert columns["date"] == ["2024-03-08", "2024-03-09", "2024-03-10", "2024-03-11"]
+    assert all(type(value) is float for value in columns["close"]) and all(type(value) is int for value in columns["volume"])
+    hist.loc[index[1], "Volume"] = np.nan
+    assert history_columns(hist)["volume"] == [10, 0, 30, 40] and history_records(hist.iloc[:0]) == []
+
+
+def test_columnar_history_carries_the_same_bars():
+
+    async def call(fmt):
+        result = await afinance_server.call_tool("get_historical_data", {"symbol": "AAA", "period": "1mo", "format": fmt})
+        return json.loads(result[0].text)
+
+    async def run():
+        return await call("compact"), await call("columnar")
+
+    rows, columns = asyncio.run(run())
+    assert columns["count"] == rows["count"] > 0
+    assert [dict(zip(columns["data"], values)) for values in zip(*columns["data"].values())] == rows["data"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import afinance_server
+from providers import DataProvider
+from singleflight import SingleFlight, normalize_arguments
+
+
+class CountingTicker:
+    """Fake ticker that counts upstream info fetches and blocks like a network call"""
+
+    upstream_calls = 0
+    lock = threading.Lock()
+
+    def __init__(self, symbol: str):
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        with CountingTicker.lock:
+            CountingTicker.upstream_calls += 1
+        time.sleep(0.05)
+        return {"longName": self.ticker, "currentPrice": 10.0, "previousClose": 9.0}
+
+
+class CountingProvider(DataProvider):
+    name = "counting-fake"
+
+    def ticker(self, symbol: str):
+        return CountingTicker(symbol)
+
+    def download(self, symbols, period="5d", interval="1d"):
+        return pd.DataFrame()
+
+    def search(self, query, max_results=10):
+        return []
+
+
+@pytest.fixture
+def counting_provider():
+    afinance_server.provider = CountingProvider()
+    CountingTicker.upstream_calls = 0
+
+
+def test_concurrent_duplicate_tool_calls_share_one_fetch(counting_provider):
+
+    async def run():
+        return await asyncio.gather(*[
+            afinance_server.call_tool("get_stock_info", {"symbol": "aapl" if i % 2 else "AAPL"})
+            for i in range(10)
+        ])
+
+    results = asyncio.run(run())
+    assert CountingTicker.upstream_calls == 1
+    assert len({result[0].text for result in results}) == 1
+    assert afinance_server.tool_flight.coalesced == 9
+    assert afinance_server.tool_flight.stats()["in_flight"] == 0
+
+
+def test_different_tools_share_upstream_fetch(counting_provider):
+
+    async def run():
+        await asyncio.gather(
+            afinance_server.call_tool("get_stock_info", {"symbol": "MSFT"}),
+            afinance_server.call_tool("get_stock_info", {"symbol": "MSFT", "format": "compact"}),
+        )
+
+    asyncio.run(run())
+    assert CountingTicker.upstream_calls == 1
+    assert afinance_server.tool_flight.coalesced == 0
+    assert afinance_server.upstream_flight.coalesced == 1
+
+
+def test_errors_reach_every_waiter_and_key_is_released():
+    flight = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        results = await asyncio.gather(*[flight.do("key", fail) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        await asyncio.gather(flight.do("key", fail), return_exceptions=True)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert flight.stats() == {"executed": 2, "coalesced": 2, "in_flight": 0}
+
+
+def test_normalize_arguments_ignores_case_and_order():
+    assert normalize_arguments({"symbol": "aapl", "period": "1y"}) == normalize_arguments({"period": "1y", "symbol": "AAPL"})
+    assert normalize_arguments({"symbols": ["aapl", "msft"]}) == normalize_arguments({"symbols": ["AAPL", "MSFT"]})
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
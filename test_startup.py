@@ -0,0 +1,84 @@
+import asyncio
+import json
+import subprocess
+import sys
+
+import pytest
+
+import afinance_server
+import server_app
+
+FRONT_END_ONLY = """
+import asyncio, json, sys
+import server_app
+tools = asyncio.run(server_app.list_tools())
+prompts = asyncio.run(server_app.list_prompts())
+print(json.dumps({
+    "tools": [tool.name for tool in tools],
+    "prompts": len(prompts),
+    "loaded": [name for name in ("pandas", "numpy", "yfinance", "afinance_server") if name in sys.modules],
+}))
+"""
+
+
+def test_tools_and_prompts_are_listed_without_the_data_stack():
+    output = subprocess.check_output([sys.executable, "-c", FRONT_END_ONLY], text=True)
+    listed = json.loads(output.strip().splitlines()[-1])
+    assert listed["loaded"] == []
+    assert "get_historical_data" in listed["tools"] and listed["prompts"] == 3
+
+
+def test_first_tool_call_loads_the_data_tools():
+    server_app._backend = None
+
+    async def run():
+        result = await server_app.call_tool("get_stock_info", {"symbol": "AAA", "format": "compact"})
+        backend = server_app._backend.result()
+        backend.shutdown()
+        return json.loads(result[0].text), backend
+
+    info, backend = asyncio.run(run())
+    server_app._backend = None
+    assert info["symbol"] == "AAA" and backend.__name__ == "afinance_server"
+
+
+def test_a_failed_load_is_retried_by_the_next_call(monkeypatch):
+    server_app._backend = None
+    attempts = []
+    import_backend = server_app.import_backend
+
+    async def flaky_import():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ImportError("broken install")
+        return await import_backend()
+    monkeypatch.setattr(server_app, "import_backend", flaky_import)
+
+    async def run():
+        with pytest.raises(ImportError):
+            await server_app.call_tool("get_stock_info", {"symbol": "AAA"})
+        assert server_app._backend is None
+        result = await server_app.call_tool("get_stock_info", {"symbol": "AAA", "format": "compact"})
+        server_app._backend.result().shutdown()
+        return json.loads(result[0].text)
+
+    info = asyncio.run(run())
+    server_app._backend = None
+    assert info["symbol"] == "AAA" and len(attempts) == 2
+
+
+def test_every_listed_tool_is_handled():
+    async def run():
+        tools = await server_app.list_tools()
+        # Empty arguments fail validation inside a handler, never with "Unknown tool"
+        results = {tool.name: json.loads((await afinance_server.handle_tool(tool.name, {"format": "compact"}))[0].text) for tool in tools}
+        unknown = json.loads((await afinance_server.handle_tool("no_such_tool", {"format": "compact"}))[0].text)
+        return results, unknown
+
+    results, unknown = asyncio.run(run())
+    assert "Unknown tool" in unknown["error"]
+    assert [name for name, result in results.items() if "Unknown tool" in str(result.get("error", ""))] == []
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))